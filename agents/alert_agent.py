@@ -6,15 +6,12 @@ It handles logic for checking student absences in  specific classes and notifies
 """
 
 # === External Libraries ===
-# sqlite3 is used to connect and interact with the local SQLite database
-import sqlite3
-
 # datetime is used to generate timestamps for message records
 from datetime import datetime
 
 
-# Path to the local SQLite database used to store attendance and messaging data
-DATABASE_PATH = "attendance_system.db"
+# Pooled connections to the local SQLite database used to store attendance and messaging data
+from data_access import connect_db
 
 
 class AbsenceAlertAgent:
@@ -56,16 +53,17 @@ class AbsenceAlertAgent:
             return "❌ I couldn't detect which class you're asking about. Can you please specify the class name?"
 
         # Step 2: Connect to the database to retrieve attendance information
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
 
-            # Count how many times the student was marked 'Absent' in the detected class
+            # How many sessions of the detected class the student missed (sessions held − attended)
             cursor.execute("""
-                SELECT COUNT(*) 
-                FROM attendance 
-                WHERE enrollment = ? 
-                AND class_id = (SELECT id FROM classrooms WHERE class_name = ?)
-                AND status = 'Absent';
+                SELECT COALESCE((
+                    SELECT absent
+                    FROM attendance_summary
+                    WHERE enrollment = ?
+                    AND class_id = (SELECT id FROM classrooms WHERE class_name = ?)
+                ), 0);
             """, (student_id, detected_class))
             total_absences = cursor.fetchone()[0]  # Fetch the count result
 
@@ -126,7 +124,7 @@ class AbsenceAlertAgent:
             str: Confirmation that the message was inserted into the system.
         
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
 
             # Loop through all classes (even if there's just one)
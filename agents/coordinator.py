@@ -16,10 +16,9 @@ from agents.insights_agent import AttendanceInsightsAgent  # Provides data insig
 
 # === External Libraries ===
 from flask import session  # Flask session for tracking user-specific context across requests
-import sqlite3  # To connect and interact with the SQLite database
 
-# === Database Configuration ===
-DATABASE_PATH = "attendance_system.db"  # Path to the SQLite database file
+# === Database Access ===
+from data_access import connect_db  # Pooled connections to the shared SQLite database
 
 
 class AgentCoordinator:
@@ -183,7 +182,7 @@ class AgentCoordinator:
         class_name = self.get_class_name(class_id)
         ai_response = f"📢 Your professor for **{class_name}** has reviewed your attendance and said: **'{professor_message}'**."
 
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
 
             # Try to find the latest message from the student to link replies
@@ -222,7 +221,7 @@ class AgentCoordinator:
         Returns:
             list of tuples: Each tuple contains (class_id, class_name, professor_id).
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
 
             # Join student_classes with classrooms to get full info
@@ -247,7 +246,7 @@ class AgentCoordinator:
         Returns:
             str: The name of the class, or "Unknown Class" if not found.
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
             cursor.execute("SELECT class_name FROM classrooms WHERE id = ?;", (class_id,))
             result = cursor.fetchone()
@@ -12,7 +12,6 @@ and securely loads the OpenAI API key using environment variables.
 
 # === Standard Library ===
 import os                                  # For accessing environment variables (e.g., API key)
-import sqlite3                             # To connect and query the SQLite database
 
 # === Third-Party Libraries ===
 import pandas as pd                        # For data manipulation and tabular analysis
@@ -24,9 +23,12 @@ from openai import OpenAI                  # OpenAI API client for GPT-based sum
 # === Matplotlib Configuration ===
 matplotlib.use('Agg')                      # Use a non-GUI backend (safe for servers, macOS, etc.)
 
+# === Local Modules ===
+from data_access import connect_db         # Pooled connections to the shared SQLite database
+from attendance_bitsets import class_attendance  # Attendance bitsets of a whole class
+
 # === Environment Setup ===
 load_dotenv()                              # Load variables from .env file into environment
-DATABASE_PATH = "attendance_system.db"     # Path to the local SQLite database
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Read OpenAI key from environment variable
 
 
@@ -52,9 +54,9 @@ class AttendanceInsightsAgent:
         Returns:
             str: HTML <img> tag linking to the saved chart.
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             df = pd.read_sql_query("""
-                SELECT date, status FROM attendance WHERE enrollment = ?
+                SELECT date, status FROM session_attendance WHERE enrollment = ?
             """, conn, params=(student_id,))
 
         if df.empty:
@@ -91,20 +93,19 @@ class AttendanceInsightsAgent:
         Returns:
             str: Risk assessment message.
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
             cursor.execute("""
-                SELECT status FROM attendance
+                SELECT present, absent FROM attendance_summary
                 WHERE enrollment = ? AND class_id = ?;
             """, (student_id, class_id))
-            records = cursor.fetchall()
+            counters = cursor.fetchone()
 
-        if not records:
+        if not counters or not (counters[0] + counters[1]):
             return "❌ No attendance records found for this class."
 
-        total_sessions = len(records)
-        absences = sum(1 for r in records if r[0] == 'Absent')
-        attended = total_sessions - absences
+        attended, absences = counters
+        total_sessions = attended + absences
         current_percentage = (attended / total_sessions) * 100
 
         # Predict impact of 2 more absences
@@ -135,27 +136,16 @@ class AttendanceInsightsAgent:
         Returns:
             tuple: (pandas.DataFrame, str) — Table and HTML summary
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                SELECT s.enrollment, s.name, a.status, a.date
-                FROM attendance a
-                JOIN students s ON a.enrollment = s.enrollment
-                WHERE a.class_id = ?
-                ORDER BY s.enrollment, a.date;
-            """, (class_id,))
-            records = cursor.fetchall()
-
-        df = pd.DataFrame(records, columns=["Enrollment", "Student Name", "Status", "Date"])
-        if df.empty:
+        # One bitset per enrolled student: absences and percentages are popcounts
+        attendance = class_attendance(class_id)
+        if not attendance.sessions or not attendance.students:
             return None, "No attendance records found for this class."
 
-        summary = df.groupby(["Enrollment", "Student Name"])["Status"] \
-                    .apply(lambda x: (x == "Absent").sum()).reset_index()
-        summary.columns = ["Enrollment", "Student Name", "Total Absences"]
-
-        total_classes = df["Date"].nunique()
-        summary["Attendance %"] = ((total_classes - summary["Total Absences"]) / total_classes) * 100
+        summary = pd.DataFrame(
+            [(enrollment, name, stats["absent"], stats["rate"])
+             for enrollment, name, stats in attendance.class_stats()],
+            columns=["Enrollment", "Student Name", "Total Absences", "Attendance %"]
+        )
 
         gpt_summary = self.summarize_class_report(class_name, summary)
         return summary, gpt_summary
@@ -221,10 +211,10 @@ Generate a 2–3 sentence HTML summary:
         Returns:
             str: HTML <img> tag pointing to the saved chart.
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             df = pd.read_sql_query("""
                 SELECT a.date, a.status, c.class_name
-                FROM attendance a
+                FROM session_attendance a
                 JOIN classrooms c ON a.class_id = c.id
                 WHERE a.enrollment = ?
             """, conn, params=(student_id,))
@@ -11,9 +11,7 @@ may put them at risk of being absent again in the future.
 """
 
 # === Standard Python Libraries ===
-from datetime import datetime             # For converting date strings into weekday names
 import os                                 # To read environment variables securely
-import sqlite3                            # For accessing and reading data from the database
 
 # === Third-Party Libraries ===
 import numpy as np                        # Used for numerical operations (not used in this file yet)
@@ -21,7 +19,8 @@ from openai import OpenAI                 # To generate natural-language summari
 from dotenv import load_dotenv            # To load the API key from the .env file
 
 # === Project-Specific Import ===
-from database import connect_db           # Function to connect to the SQLite database
+from data_access import connect_db        # Pooled connections to the shared SQLite database
+from attendance_bitsets import student_attendance  # Attendance of a student in a class, from its bitset
 
 # === Environment Variable Setup ===
 load_dotenv()                             # Load variables from the .env file into the system environment
@@ -45,7 +44,7 @@ class AttendancePredictionAgent:
         Analyzes the student's attendance in a specific class. It calculates:
         - Total number of classes attended and missed
         - Attendance percentage
-        - Number of absences in the last 3 classes
+        - Number of absences in the last 3 classes (and how many latest ones in a row)
         - Whether the student frequently misses the same weekday (like Mondays)
 
         Then it sends this information to GPT, which writes a short summary message
@@ -71,36 +70,25 @@ class AttendancePredictionAgent:
 
             class_id = result[0]
 
-            # Step 2: Get all attendance records for this student in the selected class
-            cursor.execute("""
-                SELECT date, status FROM attendance
-                WHERE enrollment = ? AND class_id = ?
-                ORDER BY date ASC;
-            """, (student_id, class_id))
+            # Step 2: The student's attendance bitset for this class answers every question
+            # (sessions, absences, last 3 sessions, weekdays) with popcounts and masks
+            stats = student_attendance(student_id, class_id, recent=3)
 
-            records = cursor.fetchall()
-
-            # If no attendance records are found, we cannot analyze the student's behavior
-            if not records:
+            # If the student has no sessions in this class, we cannot analyze their behavior
+            if not stats or not stats["sessions"]:
                 return "❌ No attendance data available for this class."
 
-            total_sessions = len(records)  # Total number of class sessions
-            absences = sum(1 for r in records if r[1] == "Absent")  # Count number of absences
-            attendance_rate = round((total_sessions - absences) / total_sessions * 100, 1)  # Calculate %
+            total_sessions = stats["sessions"]  # Total number of class sessions
+            absences = stats["absent"]  # Number of absences
+            attendance_rate = stats["rate"]  # Attendance %
 
-            # Step 3: Count how many of the last 3 classes were missed
-            recent_records = records[-3:]  # Get the most recent 3 classes
-            recent_absences = sum(1 for r in recent_records if r[1] == "Absent")
+            # Step 3: How many of the last 3 classes were missed
+            recent_absences = stats["recent_absences"]
+            missed_in_a_row = max(-stats["current_streak"], 0)  # Latest sessions missed back to back
 
             # Step 4: Check if the student often misses a specific day of the week
             # For example, if they missed many Mondays
-            day_absence_count = {}  # Dictionary to store how often each weekday was missed
-
-            for record in records:
-                date_string, status = record
-                if status == "Absent":
-                    weekday = datetime.strptime(date_string, "%Y-%m-%d").strftime("%A")
-                    day_absence_count[weekday] = day_absence_count.get(weekday, 0) + 1
+            day_absence_count = stats["weekday_absences"]  # How often each weekday was missed
 
             # Find the weekday that was missed the most
             if day_absence_count:
@@ -117,6 +105,7 @@ Here is a summary of their attendance:
 - Number of absences: {absences}
 - Attendance percentage: {attendance_rate}%
 - Number of missed classes in the last 3 sessions: {recent_absences}
+- Most recent classes missed in a row: {missed_in_a_row}
 - Most frequently missed day of the week: {most_missed_day}
 
 Write a short summary (2–3 sentences) to help the student understand their attendance situation.
@@ -13,15 +13,14 @@ This agent helps coordinate responses across the entire multi-agent system.
 
 # === Third-Party and Standard Library Imports ===
 from openai import OpenAI                   # To generate and classify student messages using GPT
-import sqlite3                              # To access attendance records from the database
 from flask import session                   # To store recent user context (like last class asked about)
 import re                                   # For basic pattern detection (like class name extraction)
 import os                                   # To access environment variables securely
 from dotenv import load_dotenv              # To load API key from .env file
+from data_access import connect_db          # Pooled connections to the shared SQLite database
 
 # === Environment Setup ===
 load_dotenv()
-DATABASE_PATH = "attendance_system.db"      # Path to the local SQLite database file
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")  # Load OpenAI key from environment
 
 
@@ -144,7 +143,7 @@ Their attendance record for **{detected_class}** is:
             return f"✅ I have successfully notified your professor for **{detected_class}**."
 
         # Step 6: Save AI response to database and link it to student’s last message
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
 
             cursor.execute("""
@@ -203,18 +202,17 @@ Their attendance record for **{detected_class}** is:
         Returns:
             str: A formatted text summary (e.g., “Math101: 2 absences, 10/12 attended”).
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
             
+            # One row per class the student has missed sessions of
             cursor.execute("""
-                SELECT sc.class_name, COUNT(a.status) AS absences,
-                    (SELECT COUNT(*) FROM attendance WHERE enrollment = ? AND status = 'Present') AS attended,
-                    (SELECT COUNT(*) FROM attendance WHERE enrollment = ?) AS total
-                FROM attendance a
-                JOIN student_classes sc ON a.class_id = sc.class_id
-                WHERE a.enrollment = ? AND a.status = 'Absent'
-                GROUP BY a.class_id
-            """, (student_id, student_id, student_id))
+                SELECT c.class_name, ac.absent AS absences, ac.present AS attended,
+                    ac.sessions AS total
+                FROM attendance_summary ac
+                JOIN classrooms c ON c.id = ac.class_id
+                WHERE ac.enrollment = ? AND ac.absent > 0
+            """, (student_id,))
             
             records = cursor.fetchall()
 
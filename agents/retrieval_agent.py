@@ -8,11 +8,8 @@ a student has been marked 'Absent'.
 This agent is used when a student simply wants to know how many classes they have missed.
 """
 
-# === Standard Library ===
-import sqlite3  # To connect to and query the SQLite database
-
-# === Database Path ===
-DATABASE_PATH = "attendance_system.db"  # Local path to the SQLite attendance database
+# === Database Access ===
+from data_access import connect_db  # Pooled connections to the shared SQLite attendance database
 
 
 class AttendanceRetrievalAgent:
@@ -30,13 +27,13 @@ class AttendanceRetrievalAgent:
         Returns:
             str: A formatted message stating how many times the student has been absent.
         """
-        with sqlite3.connect(DATABASE_PATH) as conn:
+        with connect_db() as conn:
             cursor = conn.cursor()
 
-            # Count the number of 'Absent' records for the given student
+            # Sum the student's missed sessions over all their classes
             cursor.execute("""
-                SELECT COUNT(*) FROM attendance 
-                WHERE enrollment = ? AND status = 'Absent'
+                SELECT COALESCE(SUM(absent), 0) FROM attendance_summary
+                WHERE enrollment = ?
             """, (student_id,))
             
             absences = cursor.fetchone()[0]  # Retrieve the result from the query
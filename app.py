@@ -43,7 +43,7 @@ import pyttsx3
 import subprocess
 
 # Flask-SocketIO for real-time communication between client and server (WebSockets)
-from flask_socketio import SocketIO, emit
+from flask_socketio import SocketIO, emit, join_room
 from flask import current_app
 from flask import Flask, request, jsonify
 from app import socketio 
@@ -58,8 +58,41 @@ from dotenv import load_dotenv
 from agents.insights_agent import AttendanceInsightsAgent
 from agents.coordinator import AgentCoordinator  
 
+# Pluggable face detector backends (configured per deployment)
+from face_detectors import get_detector, FACE_REGISTRATION_DETECTOR
+
 # Importing custom face recognition functions (likely used for recognizing student faces)
-from recognize_student_face import recognize_student_face, recognize_faces_live
+from recognize_student_face import recognize_student_face, recognize_faces_live, get_login_kiosk, FACE_LOGIN_KIOSK, live_room
+from recognize_student_face import recognize_uploaded_face
+from face_login import FaceLoginError
+
+# Camera wrapper that always hands out the newest frame
+from camera_capture import LatestFrameGrabber
+
+# Shared memory-mapped face gallery, republished after every retraining
+from face_gallery import publish_model_file
+
+# Attendance batches from edge recognition nodes
+from attendance_ingest import ingest_attendance_batch, check_edge_token, IngestError
+
+# Versioned gallery change log and binary deltas for edge nodes
+from gallery_sync import build_delta
+
+# JPEG frames posted by networked classroom cameras
+from frame_ingest import create_ingest_session, get_ingest_session, close_ingest_session, FRAME_INGEST_MAX_BYTES
+
+# CPU-aware admission control for live sessions
+from session_scheduler import session_scheduler
+
+# Pooled SQLite connections shared by every route (sqlite3.Row rows on request)
+from data_access import connect_db
+
+# Versioned schema migrations (applied at deploy time; checked at startup)
+from migrations import check_schema
+
+# Single attendance writer: queued writes, group commit
+from attendance_writer import (submit_attendance, get_attendance_writer, MARK_PRESENT, SET_STATUS, CLEAR_STATUS,
+                               RECORD_SESSION)
 
 # Custom module for training face recognition models
 from train_model import train_face_recognition
@@ -72,18 +105,6 @@ app.secret_key = "my_attendance_secret_key"  # Secret key for encrypting session
 # Enable WebSocket support for real-time communication and allow cross-origin requests
 socketio = SocketIO(app, cors_allowed_origins="*")
 
-# Path to SQLite database file where attendance data is stored
-DATABASE_PATH = "attendance_system.db"
-
-# Function to get a connection to the SQLite database
-def get_db_connection():
-    conn = sqlite3.connect(DATABASE_PATH, check_same_thread=False)  # Connect to the database
-    conn.row_factory = sqlite3.Row  # Allows columns to be accessed by name
-    return conn
-
-# Establish initial connection to the database
-conn = get_db_connection()
-
 # Folder to store attendance records as CSV files
 ATTENDANCE_FOLDER = "Attendance_Records"
 # Check if the folder exists, create it if not
@@ -120,7 +141,7 @@ def capture_face_encoding():
         return None, None
 
     # Detect faces in the captured frame
-    face_locations = face_recognition.face_locations(frame)
+    face_locations = get_detector().detect(frame)
     if len(face_locations) == 0:
         print("⚠️ No face detected.")
         return None, None
@@ -168,6 +189,7 @@ def register_student_route():
         # Register the student in the database and retrain the face recognition model
         if register_student(name, email, enrollment, hashed_password, professor_id):
             train_face_recognition()  # Retrain the model with the new student data
+            publish_model_file()  # Swap in the new shared gallery file for the recognition workers
             flash("✅ Registration successful! You can now log in.", "success")
             return redirect(url_for("student_login"))  # Redirect to student login page
         else:
@@ -249,6 +271,52 @@ def student_login_face():
     return redirect(url_for("student_login"))
 
 
+# Route for student login with a face picture captured by the browser
+@app.route("/student-login-face-upload", methods=["POST"])
+def student_login_face_upload():
+    """
+    Authenticate a student from a JPEG uploaded by the browser.
+
+    Accepts either a multipart file field `image` or a JSON body with a
+    base64 data URL in `image`. Replies with JSON so the login page can
+    redirect or show the error.
+    """
+    if "image" in request.files:
+        image_bytes = request.files["image"].read()
+    else:
+        data = request.get_json(silent=True) or {}
+        image_data = data.get("image", "")
+        try:
+            image_bytes = base64.b64decode(image_data.split(",", 1)[-1]) if image_data else b""
+        except ValueError:
+            image_bytes = b""
+
+    try:
+        recognized_student = recognize_uploaded_face(image_bytes)
+    except FaceLoginError as e:
+        print(f"⚠️ Face login rejected: {e}")
+        return jsonify({"success": False, "error": str(e)}), e.status
+
+    if not recognized_student:
+        return jsonify({"success": False, "error": "Face not recognized. Please try again!"}), 401
+
+    # Fetch student data from the database
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT enrollment, name FROM students WHERE enrollment = ?", (recognized_student["Enrollment"],))
+        student_row = cursor.fetchone()
+
+    if not student_row:
+        return jsonify({"success": False, "error": "Face not recognized. Please try again!"}), 401
+
+    session.clear()
+    session["student_id"] = student_row[0]
+    session["student_name"] = student_row[1]
+
+    flash(f"✅ Logged in as {student_row[1]}!", "success")
+    return jsonify({"success": True, "redirect": url_for("student_dashboard")})
+
+
 # Route for admin registration
 @app.route("/admin-register", methods=["GET", "POST"])
 def admin_register():
@@ -298,7 +366,7 @@ def admin_dashboard():
         flash("⚠️ Please log in first!", "warning")
         return redirect(url_for("admin_login"))
 
-    conn = get_db_connection()
+    conn = connect_db(row_factory=sqlite3.Row)
 
     # Fetch the 10 most recent admin activities
     activities = conn.execute(
@@ -415,7 +483,7 @@ def get_students_by_professor(professor_id):
     Returns a list of students associated with a professor by ID.
     (Assumes student table includes a professor_id foreign key.)
     """
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT id, name FROM students WHERE professor_id = ?", (professor_id,))
         return cursor.fetchall()
@@ -456,7 +524,7 @@ def view_attendance():
 
     student_id = session['student_id']  # Get the student ID from session
 
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = connect_db()
     cursor = conn.cursor()
 
     # Fetch all classes the student is enrolled in
@@ -478,16 +546,17 @@ def view_attendance():
             if selected_date:  # Fetch attendance for a specific date
                 cursor.execute("""
                     SELECT a.date, a.status 
-                    FROM attendance a
+                    FROM session_attendance a
                     JOIN classrooms c ON a.class_id = c.id
                     WHERE a.enrollment = ? AND c.class_name = ? AND a.date = ?
                 """, (student_id, class_name, selected_date))
-            else:  # Fetch all attendance records for the selected class
+            else:  # Fetch all attendance records (every session of the class) for the selected class
                 cursor.execute("""
                     SELECT a.date, a.status 
-                    FROM attendance a
+                    FROM session_attendance a
                     JOIN classrooms c ON a.class_id = c.id
                     WHERE a.enrollment = ? AND c.class_name = ?
+                    ORDER BY a.date
                 """, (student_id, class_name))
 
             attendance_records = cursor.fetchall()
@@ -512,7 +581,7 @@ def student_classes():
     student_id = session['student_id']
 
     # Connect to the database and fetch the classes the student is enrolled in
-    conn = sqlite3.connect(DATABASE_PATH)
+    conn = connect_db()
     cursor = conn.cursor()
 
     # Fetch class names for the student by joining the student_classes table with classrooms table
@@ -680,11 +749,21 @@ def take_attendance(class_id):
     students = get_students_in_class(class_id)
 
     if request.method == "POST":
-        # Mark manual attendance for each student
+        # The class met today, even if nobody is marked Present
+        now = datetime.now()
+        submit_attendance(RECORD_SESSION, (class_id, now.strftime("%Y-%m-%d"),
+                                           now.strftime("%Y-%m-%d %H:%M:%S"), now.strftime("%Y-%m-%d %H:%M:%S")))
+
+        # Mark manual attendance for each student (queued; committed together)
+        last_write = None
         for student in students:
             enrollment = student[0]
             status = request.form.get(f"attendance_{enrollment}", "Absent")  # Default to "Absent" if no status
-            mark_attendance(enrollment, class_id, status, professor_id)
+            last_write = mark_attendance(enrollment, class_id, status, professor_id)
+
+        # The dashboard we redirect to must show these marks: wait for the commit
+        if last_write is not None:
+            get_attendance_writer().flush()
 
         flash("✅ Attendance marked successfully!", "success")
         return redirect(url_for("professor_dashboard"))
@@ -780,8 +859,31 @@ def add_student_to_class():
 socketio = SocketIO(app, cors_allowed_origins="*", transports=["websocket"])  # Force WebSocket only
 
 cam = None  # Stores the OpenCV camera instance
-stop_flag = False  # Controls background task stopping
 background_task = None  # Global variable to track the running task
+WEBCAM = ("camera", 0)  # The server's webcam can feed one session at a time
+
+
+def run_live_session(ticket, **kwargs):
+    """Background task body: runs the recognition loop and always gives the scheduler slot back."""
+    try:
+        recognize_faces_live(ticket=ticket, **kwargs)
+    finally:
+        ticket.release()  # No-op if the loop already released it
+
+
+def scheduler_response(ticket, payload, started_status=200):
+    """HTTP reply for a scheduler decision: started (200/201), queued (202) or rejected (503)."""
+    payload = dict(payload, scheduler=ticket.status())
+    if ticket.state == "queued":
+        payload["message"] = f"Server busy — session queued (position {ticket.status()['position']})"
+        return jsonify(payload), 202
+    if ticket.state == "rejected":
+        payload["error"] = ticket.reason
+        return jsonify(payload), 503
+    if ticket.state == "finished":  # Failed to start
+        payload["error"] = ticket.reason or "Session failed to start"
+        return jsonify(payload), 500
+    return jsonify(payload), started_status
 
 
 # Route to start live attendance using face recognition 
@@ -793,79 +895,288 @@ def start_attendance(class_id):
     - Captures faces using OpenCV.
     - Runs in the background via Flask-SocketIO to avoid blocking.
     - Automatically links the recognized students to attendance records for the given class.
+    - Goes through the session scheduler: when the server is at capacity, or
+      the webcam or this class is already in a live session, the session is
+      queued (202, starts when the other session ends) or rejected (503).
+      Starting again while this class's webcam session runs or waits returns
+      that session instead of queueing a second one.
     """
 
-    global cam, background_task, stop_flag  # Declare global variables used across routes
-
     # Ensure professor is logged in
     professor_id = session.get("professor_id")
     if not professor_id:
         return jsonify({"error": "Unauthorized"}), 403  # Return error if professor not logged in
 
-    # Attempt to access webcam
-    cam = cv2.VideoCapture(0)
-    if not cam.isOpened():
-        return jsonify({"error": "Camera failed to open"}), 500
+    # One webcam session per class: a second click reports the existing one
+    existing = session_scheduler.find_ticket(class_id, key=WEBCAM)
+    if existing is not None:
+        return scheduler_response(existing, {"message": "Live Attendance already requested"})
+
+    def start(ticket):
+        global cam, background_task
+
+        # Attempt to access webcam (read continuously on its own thread, newest frame only)
+        cam = LatestFrameGrabber(0).start()
+        if not cam.isOpened():
+            cam.release()
+            raise RuntimeError("Camera failed to open")
+
+        # Stopped through its own ticket (ticket.stop()), never through another session
+        # Launch background task to continuously perform face recognition
+        background_task = socketio.start_background_task(
+            target=run_live_session,
+            ticket=ticket,
+            app=app,
+            socketio=socketio,
+            class_id=class_id,
+            professor_id=professor_id,
+            camera=cam
+        )
 
-    stop_flag = False  # Reset stop flag before starting recognition loop
+    # Only runs while no other session uses the webcam (cam/background_task are per webcam)
+    ticket = session_scheduler.request(class_id, professor_id, start, exclusive=(WEBCAM,))
+    return scheduler_response(ticket, {"message": "Live Attendance Started"})  # Inform frontend
 
-    # Launch background task to continuously perform face recognition
-    background_task = socketio.start_background_task(
-        target=recognize_faces_live,
-        app=app,
-        socketio=socketio,
-        class_id=class_id,
-        professor_id=professor_id
-    )
 
-    return jsonify({"message": "Live Attendance Started"}), 200  # Inform frontend
+# EDGE RECOGNITION API
+# Classroom machines run recognition locally (edge_runner.py); the server only stores results.
+
+@app.route("/api/edge/gallery/changes", methods=["GET"])
+def edge_gallery_changes():
+    """
+    Gallery changes since a version, as a compact binary delta (see gallery_sync.py).
+
+    Query parameters: since (version the node has, 0 = full snapshot),
+    class_id (optional, only that class's students), dtype=float16 (optional).
+    """
+    if not check_edge_token(request.headers.get("Authorization")):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    since = request.args.get("since", 0, type=int)
+    class_id = request.args.get("class_id", None, type=int)
+    payload = build_delta(since, class_id, float16=request.args.get("dtype") == "float16")
+
+    return app.response_class(payload, mimetype="application/octet-stream")
+
+
+@app.route("/api/edge/attendance", methods=["POST"])
+def edge_attendance_ingest():
+    """
+    Receives a batch of recognized students from an edge node.
+
+    Body: {"class_id": int, "professor_id": int,
+           "events": [{"enrollment": str, "timestamp": "YYYY-MM-DD HH:MM:SS"}, ...]}
+    Header "Idempotency-Key": unique per batch, reused when the batch is retried.
+    """
+    if not check_edge_token(request.headers.get("Authorization")):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Expected a JSON object."}), 400
+
+    idempotency_key = request.headers.get("Idempotency-Key") or data.get("idempotency_key")
+    try:
+        response, replayed = ingest_attendance_batch(
+            data.get("class_id"), data.get("professor_id"), data.get("events"), idempotency_key
+        )
+    except IngestError as e:
+        return jsonify({"error": str(e)}), 400
+
+    response = dict(response, replayed=replayed)
+    return jsonify(response), 200
+
+
+# NETWORK CAMERA SESSIONS
+# Remote cameras post JPEG frames for a live session; recognition runs on this server.
+
+@app.route("/api/live-sessions", methods=["POST"])
+def create_live_session():
+    """
+    Starts a live attendance session fed by a network camera.
+
+    Returns the session id, the camera token and the URL frames must be posted to.
+    The token is only shown here; configure it in the camera client.
+    """
+    professor_id = session.get("professor_id")
+    if not professor_id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True) or request.form
+    class_id = data.get("class_id")
+    if not class_id:
+        return jsonify({"error": "class_id is required"}), 400
+
+    ingest_session = create_ingest_session(class_id, professor_id)
+
+    def start(ticket):
+        socketio.start_background_task(
+            target=run_live_session,
+            ticket=ticket,
+            app=app,
+            socketio=socketio,
+            class_id=class_id,
+            professor_id=professor_id,
+            camera=ingest_session.source
+        )
+
+    # Frames posted while the session is queued are accepted but only the newest are kept
+    ingest_session.ticket = session_scheduler.request(class_id, professor_id, start)
+    if ingest_session.ticket.state in ("rejected", "finished"):
+        close_ingest_session(ingest_session.session_id)
+        return scheduler_response(ingest_session.ticket, {})
+
+    return scheduler_response(ingest_session.ticket, {
+        "session_id": ingest_session.session_id,
+        "token": ingest_session.token,
+        "frames_url": url_for("ingest_live_frames", session_id=ingest_session.session_id, _external=True),
+    }, started_status=201)
+
+
+@app.route("/api/live-sessions/<session_id>/frames", methods=["POST"])
+def ingest_live_frames(session_id):
+    """
+    Accepts frames from a network camera.
+
+    - Single frame: body is the JPEG (Content-Type: image/jpeg), optional
+      "X-Captured-At" header with the capture time in epoch seconds.
+    - Batch: multipart/form-data with one or more "frames" files, optional
+      "captured_at" form values in the same order.
+    Authorization: "Bearer <token>" returned when the session was created.
+    """
+    ingest_session = get_ingest_session(session_id)
+    if ingest_session is None or not ingest_session.source.isOpened():
+        return jsonify({"error": "Unknown or closed session"}), 404
+
+    _, _, token = (request.headers.get("Authorization") or "").partition(" ")
+    if not ingest_session.check_token(token.strip()):
+        return jsonify({"error": "Unauthorized"}), 401
+
+    if request.files:
+        payloads = [f.read() for f in request.files.getlist("frames")]
+        timestamps = request.form.getlist("captured_at", type=float)
+    else:
+        payloads = [request.get_data()]
+        timestamps = [request.headers.get("X-Captured-At", type=float)]
+
+    accepted = 0
+    rejected = 0
+    for i, payload in enumerate(payloads):
+        captured_at = timestamps[i] if i < len(timestamps) else None
+        if payload and len(payload) <= FRAME_INGEST_MAX_BYTES and ingest_session.source.push_jpeg(payload, captured_at):
+            accepted += 1
+        else:
+            rejected += 1
+
+    return jsonify(dict(ingest_session.source.stats(), accepted=accepted, rejected=rejected)), 202
+
+
+@app.route("/api/live-sessions/<session_id>", methods=["GET"])
+def live_session_status(session_id):
+    """Queue and drop counters of a network camera session."""
+    if not session.get("professor_id"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    ingest_session = get_ingest_session(session_id)
+    if ingest_session is None:
+        return jsonify({"error": "Unknown session"}), 404
+    return jsonify(dict(ingest_session.source.stats(), class_id=ingest_session.class_id,
+                        open=ingest_session.source.isOpened(),
+                        scheduler=ingest_session.ticket.status() if ingest_session.ticket else None))
+
+
+@app.route("/api/live-sessions/<session_id>/stop", methods=["POST"])
+def stop_live_session(session_id):
+    """Ends a network camera session; its recognition loop stops on the next read."""
+    if not session.get("professor_id"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    ingest_session = close_ingest_session(session_id)
+    if ingest_session is None:
+        return jsonify({"error": "Unknown session"}), 404
+    if ingest_session.ticket is not None and ingest_session.ticket.state == "queued":
+        ingest_session.ticket.release()  # Never started; leave the queue
+    return jsonify({"message": "✅ Live session stopped", "stats": ingest_session.source.stats()}), 200
+
+
+@app.route("/api/scheduler", methods=["GET"])
+def scheduler_status():
+    """Live session capacity: measured detection cost, running and queued sessions."""
+    if not session.get("professor_id"):
+        return jsonify({"error": "Unauthorized"}), 403
+    return jsonify(session_scheduler.stats())
+
+
+@app.route("/api/scheduler/tickets/<ticket_id>", methods=["GET"])
+def scheduler_ticket_status(ticket_id):
+    """State of one session request (lets the dashboard poll a queued session)."""
+    if not session.get("professor_id"):
+        return jsonify({"error": "Unauthorized"}), 403
+
+    ticket = session_scheduler.get_ticket(ticket_id)
+    if ticket is None:
+        return jsonify({"error": "Unknown ticket"}), 404
+    return jsonify(ticket.status())
 
 
 # Route to stop live attendance
 @app.route("/stop-attendance", methods=["POST"])
 def stop_attendance():
     """
-    Forcefully stops the background attendance capture process and releases the webcam.
+    Stops a class's webcam attendance session and releases the webcam.
 
-    - Stops recognition by setting stop_flag.
-    - Closes the webcam.
-    - Attempts to kill the background thread (if needed).
+    Body (JSON or form): class_id. Without it, the running webcam session is stopped.
+
+    - Finds the class's webcam ticket in the session scheduler; only the
+      professor who started it may stop it.
+    - A queued session is cancelled (it never opens the webcam).
+    - A running session stops through its own ticket (network camera
+      sessions of other classes keep running), the webcam is closed and the
+      recognition loop gets time to close the class session.
     """
 
-    global cam, stop_flag, background_task  # Access shared control variables
+    global cam, background_task  # Access shared control variables
+
+    professor_id = session.get("professor_id")
+    if not professor_id:
+        return jsonify({"error": "Unauthorized"}), 403
+
+    data = request.get_json(silent=True) or request.form
+    ticket = session_scheduler.find_ticket(data.get("class_id"), key=WEBCAM)
+    if ticket is None:
+        return jsonify({"error": "No webcam attendance session to stop"}), 404
+    if str(ticket.professor_id) != str(professor_id):
+        return jsonify({"error": "This session was started by another professor"}), 403
 
-    print("🛑 Attempting to force stop attendance...")
+    if ticket.state == "queued":
+        ticket.stop()  # Leaves the queue; the webcam is never opened for it
+        print(f"🛑 Queued attendance session for class {ticket.class_id} cancelled")
+        return jsonify({"message": "✅ Queued attendance session cancelled"}), 200
 
-    stop_flag = True  # Signal recognition loop to stop
+    print("🛑 Attempting to stop attendance...")
 
-    try:
-        import time
-        time.sleep(1)  # ⏱ Allow thread a moment to finish
+    # Signal the running webcam session's loop to stop; a queued webcam session
+    # starts (and sets these globals again) once this one has ended
+    camera, cam = cam, None
+    task, background_task = background_task, None
+    ticket.stop()
 
+    try:
         # Safely release the camera if open
-        if cam and cam.isOpened():
+        if camera and camera.isOpened():
             print("✅ Camera is open, attempting to release...")
-            cam.release()  # 🎥 Turn off webcam
-            cam = None
+            camera.release()  # 🎥 Turn off webcam
             print("✅ Camera successfully released!")
 
         # Ensure all OpenCV windows are closed (just in case)
         cv2.destroyAllWindows()
         cv2.waitKey(1)
 
-        # Attempt to stop the thread (not ideal in Python but shown here as emergency exit)
-        if background_task is not None:
-            print("🔴 Forcefully terminating background thread...")
-
-            for thread in threading.enumerate():
-                if thread is background_task:
-                    # 🚨 This will kill the Flask process entirely — not ideal, use with caution
-                    os.kill(os.getpid(), signal.SIGKILL)
-                    break
-
-            background_task = None  # Clear thread reference
+        # Wait for the loop to finish; the process keeps serving the other live sessions
+        if task is not None and hasattr(task, "join"):
+            task.join(timeout=10)
 
-        return jsonify({"message": "✅ Attendance forcefully stopped!"}), 200  # Notify frontend
+        return jsonify({"message": "✅ Attendance stopped!"}), 200  # Notify frontend
 
     except Exception as e:
         print(f"❌ Error force stopping attendance: {str(e)}")
@@ -890,34 +1201,26 @@ def record_attendance(class_id, date, professor_id):
     student_name = result.get("name", "Unknown Student")
     enrollment = result["Enrollment"]
 
-    with connect_db() as conn:
-        cursor = conn.cursor()
+    # Insert attendance record through the attendance writer (enrolled students only)
+    current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    print(f"📌 DEBUG: Queuing attendance: Enrollment={enrollment}, Class ID={class_id}, Date={date}, Time={current_time}")
 
-        # Ensure the student is enrolled in this class
-        cursor.execute("""
-            SELECT 1 FROM student_classes WHERE enrollment = ? AND class_id = ?
-        """, (enrollment, class_id))
-        valid_class = cursor.fetchone()
-
-        if not valid_class:
-            print(f"⚠️ Student {student_name} ({enrollment}) is NOT enrolled in class {class_id}! Ignoring...")
-            return
-
-        # Insert attendance record into the database
-        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        print(f"📌 DEBUG: Inserting into database: Enrollment={enrollment}, Class ID={class_id}, Date={date}, Time={current_time}")
+    try:
+        # Wait for the commit: the row is read back right below
+        marked = submit_attendance(
+            MARK_PRESENT, (class_id, enrollment, date, current_time, professor_id), flush=True
+        ).result()
+    except Exception as e:
+        print(f"❌ ERROR: Failed to insert attendance record: {e}")
+        return
 
-        sql_query = """
-        INSERT INTO attendance (enrollment, class_id, date, status, professor_id, time_recognized)
-        VALUES (?, ?, ?, 'Present', ?, ?);
-        """
+    if not marked:
+        print(f"⚠️ Student {student_name} ({enrollment}) is NOT enrolled in class {class_id}! Ignoring...")
+        return
+    print("✅ Attendance successfully recorded.")
 
-        try:
-            cursor.execute(sql_query, (enrollment, class_id, date, professor_id, current_time))
-            conn.commit()
-            print("✅ Attendance successfully recorded.")
-        except Exception as e:
-            print(f"❌ ERROR: Failed to insert attendance record: {e}")
+    with connect_db() as conn:
+        cursor = conn.cursor()
 
         # Retrieve the last inserted row to confirm the data
         cursor.execute("SELECT * FROM attendance WHERE enrollment = ? ORDER BY id DESC LIMIT 1", (enrollment,))
@@ -932,7 +1235,7 @@ def settings():
     if "admin_id" not in session:
         return redirect(url_for("admin_login"))
 
-    conn = get_db_connection()
+    conn = connect_db(row_factory=sqlite3.Row)
     admin = conn.execute("SELECT * FROM admins WHERE id = ?", (session["admin_id"],)).fetchone()
     conn.close()
 
@@ -944,7 +1247,7 @@ def settings():
         # Hash the new password before saving it
         hashed_password = bcrypt.generate_password_hash(new_password).decode("utf-8")
 
-        conn = get_db_connection()
+        conn = connect_db(row_factory=sqlite3.Row)
         conn.execute("UPDATE admins SET email = ?, password = ? WHERE id = ?", (new_email, hashed_password, session["admin_id"]))
         conn.commit()
         conn.close()
@@ -979,7 +1282,7 @@ def update_settings():
     new_setting = request.form.get("setting_value")
 
     # Connect to the database
-    conn = get_db_connection()
+    conn = connect_db(row_factory=sqlite3.Row)
 
     # ⚙️ Update the 'some_setting' setting value in the settings table
     conn.execute("UPDATE settings SET value = ? WHERE name = 'some_setting'", (new_setting,))
@@ -1010,7 +1313,7 @@ def recent_activity():
         return redirect(url_for("admin_login"))  # Redirect if not logged in
 
     # Connect to the database
-    conn = get_db_connection()
+    conn = connect_db(row_factory=sqlite3.Row)
 
     # Query the last 10 admin actions, ordered by most recent first
     activities = conn.execute(
@@ -1027,7 +1330,7 @@ def recent_activity():
 # Route for weekly attendance report
 @app.route('/weekly-report/<int:class_id>')
 def weekly_report_for_class(class_id):
-    conn = sqlite3.connect("attendance_system.db")
+    conn = connect_db()
     cursor = conn.cursor()
 
     # Print received class_id to debug
@@ -1036,7 +1339,6 @@ def weekly_report_for_class(class_id):
     # Get past 7 days
     today = datetime.today()
     start_of_week = (today - timedelta(days=6)).strftime('%Y-%m-%d')  # Start of the week
-    last_week_dates = [(today - timedelta(days=i)).strftime('%Y-%m-%d') for i in range(7)]
 
     # Get the correct class name
     cursor.execute("SELECT class_name FROM classrooms WHERE id = ?", (class_id,))
@@ -1052,40 +1354,26 @@ def weekly_report_for_class(class_id):
     folder_path = os.path.join(os.getcwd(), folder_name)  # Save in the current directory
     os.makedirs(folder_path, exist_ok=True)
 
-    # Get all students in this class
+    # Every enrolled student in every session the class actually held this week
+    # (days without a session are not class days; no attendance row = Absent)
     cursor.execute("""
-        SELECT s.name, s.enrollment
-        FROM students s
-        JOIN student_classes cs ON s.enrollment = cs.enrollment
-        WHERE cs.class_id = ?
-    """, (class_id,))
-    
-    students = cursor.fetchall()
-
-    report = []
-
-    # Loop through every day and every student
-    for date in last_week_dates:
-        for student in students:
-            student_name, enrollment = student
-
-            # Check if this student has an attendance record for this day
-            cursor.execute("""
-                SELECT status FROM attendance 
-                WHERE class_id = ? AND enrollment = ? AND date = ?
-            """, (class_id, enrollment, date))
-
-            attendance = cursor.fetchone()
-
-            status = attendance[0] if attendance else "Absent"  # If no record, assume Absent
-
-            report.append({
-                "student_name": student_name,
-                "enrollment": enrollment,
-                "class_name": class_name,
-                "date": date,
-                "status": status
-            })
+        SELECT s.name, a.enrollment, a.date, a.status
+        FROM session_attendance a
+        JOIN students s ON s.enrollment = a.enrollment
+        WHERE a.class_id = ? AND a.date BETWEEN ? AND ?
+        ORDER BY a.date DESC, s.name
+    """, (class_id, start_of_week, today.strftime('%Y-%m-%d')))
+
+    report = [
+        {
+            "student_name": student_name,
+            "enrollment": enrollment,
+            "class_name": class_name,
+            "date": date,
+            "status": status
+        }
+        for student_name, enrollment, date, status in cursor.fetchall()
+    ]
 
     conn.close()
 
@@ -1117,7 +1405,8 @@ def export_attendance():
     Exports all attendance records from the database as a downloadable CSV file.
 
     Access should be restricted to admins or professors in future versions.
-    Joins `attendance` with `students` to fetch student names alongside attendance logs.
+    One row per class session and enrolled student (`session_attendance`), with
+    student and class names.
     """
 
     try:
@@ -1127,9 +1416,10 @@ def export_attendance():
 
             # Query attendance records joined with student names
             cursor.execute("""
-                SELECT s.name, a.enrollment, a.class_name, a.date, a.status, a.time_recognized 
-                FROM attendance a
+                SELECT s.name, a.enrollment, c.class_name, a.date, a.status, a.time_recognized 
+                FROM session_attendance a
                 LEFT JOIN students s ON a.enrollment = s.enrollment
+                LEFT JOIN classrooms c ON a.class_id = c.id
                 ORDER BY a.date DESC
             """)
 
@@ -1163,7 +1453,7 @@ def export_attendance():
 # Function to log admin activity
 def log_admin_activity(admin_id, action):
     """Logs the actions taken by the admin."""
-    conn = get_db_connection()
+    conn = connect_db(row_factory=sqlite3.Row)
     conn.execute("INSERT INTO admin_activity (admin_id, action) VALUES (?, ?)", (admin_id, action))
     conn.commit()
     conn.close()
@@ -1238,7 +1528,7 @@ def remove_professor(professor_id):
         return redirect(url_for("admin_login"))
 
     admin_id = session["admin_id"]
-    conn = get_db_connection()
+    conn = connect_db(row_factory=sqlite3.Row)
 
     # Fetch professor name before deletion
     professor = conn.execute("SELECT name FROM professors WHERE id = ?", (professor_id,)).fetchone()
@@ -1419,7 +1709,7 @@ def assign_student_to_classroom():
         flash("⚠️ Please select both a student and a classroom!", "warning")
         return redirect(url_for("admin_dashboard"))
 
-    with get_db_connection() as conn:
+    with connect_db(row_factory=sqlite3.Row) as conn:
         cursor = conn.cursor()
 
         # Fetch the enrollment number and name using student_id
@@ -1470,32 +1760,40 @@ def log_attendance(enrollment, class_id, date, status="Present"):
     with connect_db() as conn:
         cursor = conn.cursor()
 
-        # Ensure student is actually enrolled in the class
+        # Ensure student is actually enrolled in the class (and get their name and the class's professor)
         cursor.execute("""
-            SELECT 1 FROM student_classes WHERE enrollment = ? AND class_id = ?
+            SELECT sc.student_name, c.professor_id
+            FROM student_classes sc
+            JOIN classrooms c ON c.id = sc.class_id
+            WHERE sc.enrollment = ? AND sc.class_id = ?
         """, (enrollment, class_id))
         
         valid_assignment = cursor.fetchone()  # Verify student-class enrollment
         
-        if valid_assignment:
-            # Insert attendance record with selected date and status
-            cursor.execute("""
-                INSERT INTO attendance (enrollment, class_id, time_recognized, date, status)
-                VALUES (?, ?, datetime('now', 'localtime'), ?, ?)
-            """, (enrollment, class_id, date, status))
-            
-            conn.commit()  # Save attendance record
-            print(f"✅ Attendance recorded for {enrollment} on {date}")
-
-            # Emit real-time event for the new attendance (using SocketIO)
-            socketio.emit('new_attendance', {
-                'enrollment': enrollment,
-                'name': student_name,  # Student name (make sure it's defined)
-                'date': date,
-                'status': status,
-                'time': current_time,  # Include timestamp for the attendance
-                'absence_message': None  # Placeholder for any absence message
-            })
+    if valid_assignment:
+        student_name, professor_id = valid_assignment
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        # Record the session and the status for the selected date (attendance writer; Absent = no row);
+        # wait for the commit so dashboards reacting to the event read the new row
+        submit_attendance(RECORD_SESSION, (class_id, date, current_time, current_time))
+        if status == "Absent":
+            write = submit_attendance(CLEAR_STATUS, (class_id, enrollment, date), flush=True)
+        else:
+            write = submit_attendance(SET_STATUS, (class_id, enrollment, date, status, current_time, professor_id),
+                                      flush=True)
+        write.result()
+        print(f"✅ Attendance recorded for {enrollment} on {date}")
+
+        # Emit real-time event for the new attendance (using SocketIO)
+        socketio.emit('new_attendance', {
+            'enrollment': enrollment,
+            'name': student_name,
+            'date': date,
+            'status': status,
+            'time': current_time,  # Include timestamp for the attendance
+            'absence_message': None  # Placeholder for any absence message
+        })
 
 
 # Route to download CSV report 
@@ -1505,7 +1803,7 @@ def download_csv(class_id):
     today = datetime.today()
     start_of_week = (today - timedelta(days=6)).strftime('%Y-%m-%d')  # Get the start of the week
 
-    conn = sqlite3.connect("attendance_system.db")
+    conn = connect_db()
     cursor = conn.cursor()
 
     # Fetch the class name from the database
@@ -1532,7 +1830,7 @@ def download_json(class_id):
     today = datetime.today()
     start_of_week = (today - timedelta(days=6)).strftime('%Y-%m-%d')
 
-    conn = sqlite3.connect("attendance_system.db")
+    conn = connect_db()
     cursor = conn.cursor()
 
     # Fetch the class name from the database
@@ -1746,25 +2044,6 @@ def change_password():
     flash("🔐 Password updated successfully!", "success")
     return redirect(url_for('student_dashboard'))
 
-# Initialize database with default tables 
-def initialize_database():
-    """Creates necessary tables if they don't exist."""
-    with connect_db() as conn:
-        cursor = conn.cursor()
-        
-        # Create student_activities table if it doesn't exist
-        cursor.execute("""
-        CREATE TABLE IF NOT EXISTS student_activities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id TEXT NOT NULL,
-            activity TEXT NOT NULL,
-            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
-            FOREIGN KEY (student_id) REFERENCES students(enrollment)
-        );
-        """)
-        
-        conn.commit()
-
 # Chatbot Route 
 
 # Initialize the Coordinator which handles user requests
@@ -1788,17 +2067,18 @@ def chatbot_response():
 # Function to generate attendance graph 
 def generate_attendance_graph(student_id, class_name=None):
     """Generates an attendance graph for the student, optionally filtered by class."""
-    with sqlite3.connect("attendance_system.db") as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
 
         # Fetch attendance records for the student
         if class_name:
             cursor.execute("""
-                SELECT date, status FROM attendance 
+                SELECT date, status FROM session_attendance 
                 WHERE enrollment = ? AND class_id IN (SELECT id FROM classrooms WHERE class_name = ?)
+                ORDER BY date
             """, (student_id, class_name))
         else:
-            cursor.execute("SELECT date, status FROM attendance WHERE enrollment = ?", (student_id,))
+            cursor.execute("SELECT date, status FROM session_attendance WHERE enrollment = ? ORDER BY date", (student_id,))
 
         records = cursor.fetchall()
 
@@ -2078,12 +2358,14 @@ def send_absence_message():
 
         professor_id = professor[0]
 
-        # Save student message in DB (with `replied=False` and no response yet)
+        # Save student message in DB (with `replied=False` and no response yet). Written to the
+        # table itself, not the `messages` view: only a table insert sets lastrowid
         cursor.execute("""
-            INSERT INTO messages 
-            (student_enrollment, professor_id, class_id, message, seen, timestamp, sender_type, recipient_type, replied, response_to_message_id, justification_file) 
-            VALUES (?, ?, ?, ?, 0, CURRENT_TIMESTAMP, 'student', 'professor', FALSE, NULL, NULL)
-        """, (student_enrollment, professor_id, class_id, student_message))
+            INSERT INTO student_messages 
+            (student_id, professor_id, class_id, message, seen, timestamp, sender_type, recipient_type, replied, response_to_message_id, justification_file) 
+            SELECT id, ?, ?, ?, 0, CURRENT_TIMESTAMP, 'student', 'professor', FALSE, NULL, NULL
+            FROM students WHERE enrollment = ?
+        """, (professor_id, class_id, student_message, student_enrollment))
 
         message_id = cursor.lastrowid  # Get the ID of this newly inserted message
         conn.commit()
@@ -2283,10 +2565,10 @@ def professor_dashboard():
             SELECT 
                 messages.id, students.name, classrooms.class_name, messages.message, 
                 messages.timestamp, messages.seen, messages.sender_type, 
-                messages.student_enrollment, messages.class_id,
+                students.enrollment, messages.class_id,
                 messages.replied, messages.recipient_type
-            FROM messages
-            JOIN students ON messages.student_enrollment = students.enrollment
+            FROM student_messages AS messages
+            JOIN students ON messages.student_id = students.id
             JOIN classrooms ON messages.class_id = classrooms.id
             WHERE messages.professor_id = ? 
               AND (messages.sender_type = 'student' OR messages.sender_type = 'ai_agent')
@@ -2428,7 +2710,7 @@ def view_classroom(class_id):
     if not professor_id:
         return redirect(url_for('login'))  # Redirect if not logged in
 
-    conn = get_db_connection()
+    conn = connect_db(row_factory=sqlite3.Row)
     cursor = conn.cursor()
 
     # Verify Access to Classroom
@@ -2458,19 +2740,19 @@ def view_classroom(class_id):
         attendance.status, 
         COALESCE(attendance.time_recognized, '--') AS time_recognized,
         COALESCE(messages.message, '--') AS absence_message
-    FROM attendance 
+    FROM session_attendance AS attendance
     LEFT JOIN students ON students.enrollment = attendance.enrollment 
     LEFT JOIN messages ON messages.student_enrollment = attendance.enrollment 
         AND messages.class_id = attendance.class_id 
         AND DATE(messages.timestamp) = attendance.date
     WHERE attendance.class_id = ? 
-        AND attendance.professor_id = ? 
         AND attendance.date = ?
     ORDER BY attendance.status DESC, students.name
     """
+    # (The class was checked to be this professor's above; absent students have no attendance row)
     attendance_records = cursor.execute(
         attendance_query, 
-        (class_id, professor_id, attendance_date)
+        (class_id, attendance_date)
     ).fetchall()
 
     conn.close()
@@ -2484,23 +2766,41 @@ def view_classroom(class_id):
         selected_date=attendance_date
     )
 
+# Dashboard of a class: receive that class's live frames
+@socketio.on("join_class")
+def join_class(data):
+    """Adds the dashboard's socket to the class's room (live frames are only sent there)."""
+    if not session.get("professor_id"):
+        return
+    class_id = (data or {}).get("class_id")
+    if class_id is not None:
+        join_room(live_room(class_id))
+
 #  Mark Attendance When Recognized
 @socketio.on("student_recognized")
-def mark_attendance(student_enrollment, class_id):
-    """Marks a student as 'Present' when recognized."""
-    today_date = datetime.today().strftime('%Y-%m-%d')
+def mark_attendance(student_enrollment, class_id, status="Present", professor_id=None):
+    """
+    Marks a student as 'Present' when recognized, or records the status a
+    professor picked (manual attendance, when `professor_id` is given).
 
-    with connect_db() as conn:
-        cursor = conn.cursor()
+    Returns the Future of the queued write (attendance writer).
+    """
+    today_date = datetime.today().strftime('%Y-%m-%d')
 
-        # Update status from "Absent" to "Present"
-        cursor.execute("""
-            UPDATE attendance
-            SET status = 'Present'
-            WHERE enrollment = ? AND class_id = ? AND date = ?
-        """, (student_enrollment, class_id, today_date))
+    if professor_id is None:
+        # Recognized: Present (enrolled students only), recorded under the class's professor
+        with connect_db() as conn:
+            row = conn.execute("SELECT professor_id FROM classrooms WHERE id = ?", (class_id,)).fetchone()
+        if not row or row[0] is None:
+            print(f"⚠️ Class {class_id} has no professor; attendance for {student_enrollment} not recorded.")
+            return None
+        current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        return submit_attendance(MARK_PRESENT, (class_id, student_enrollment, today_date, current_time, row[0]))
 
-        conn.commit()
+    # Manual attendance: Absent removes today's row (absence is derived), any other status overwrites it
+    if status == "Absent":
+        return submit_attendance(CLEAR_STATUS, (class_id, student_enrollment, today_date))
+    return submit_attendance(SET_STATUS, (class_id, student_enrollment, today_date, status, None, professor_id))
 
 # Update Attendance in Real-Time 
 @socketio.on("update_attendance")
@@ -2519,23 +2819,20 @@ def update_attendance(data):
     recognized_students = data.get("recognized_students")  # 🧑‍🎓 List of enrollments
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")  # ⏰ Timestamp of recognition
 
-    with connect_db() as conn:
-        cursor = conn.cursor()
+    today_date = datetime.now().strftime("%Y-%m-%d")  # Attendance for today only
 
-        # Loop through each recognized student and update their status
-        for student_enrollment in recognized_students:
-            cursor.execute("""
-                UPDATE attendance 
-                SET status = 'Present', time_recognized = ? 
-                WHERE class_id = ? AND enrollment = ? AND date = ?
-            """, (
-                current_time,                    # Time the student was recognized
-                class_id,                        # Class in which they're being marked present
-                student_enrollment,              # Enrollment number
-                datetime.now().date()            # Attendance for today only
-            ))
+    # The class's professor owns the rows (recognition events carry no professor)
+    with connect_db() as conn:
+        row = conn.execute("SELECT professor_id FROM classrooms WHERE id = ?", (class_id,)).fetchone()
+    if not row or row[0] is None:
+        print(f"⚠️ Class {class_id} has no professor; recognized students not recorded.")
+        return
 
-        conn.commit()  # Save all updates to the database
+    # Mark every recognized (enrolled) student Present in one batch (attendance writer, group commit)
+    submit_attendance(MARK_PRESENT, [
+        (class_id, student_enrollment, today_date, current_time, row[0])
+        for student_enrollment in recognized_students
+    ], many=True)
 
 
 # Detect Faces and Update Attendance
@@ -2570,14 +2867,6 @@ def detect_faces(data):
 
 # Helper Functions 
 
-def connect_db():
-    """
-    Establish a connection to the SQLite database.
-    Returns:
-        sqlite3.Connection object
-    """
-    return sqlite3.connect(DATABASE_PATH)
-
 def speak_instruction(text):
     """
     Speaks a movement instruction using the system’s built-in Text-to-Speech (TTS) engine.
@@ -2625,6 +2914,7 @@ def register_student(name, email, enrollment, password, professor_id):
     os.makedirs(image_folder, exist_ok=True)
 
     # Setup
+    detector = get_detector(FACE_REGISTRATION_DETECTOR)  # "cnn" unless the deployment overrides it
     num_samples = 20
     face_encodings = []
     image_path = None
@@ -2649,7 +2939,7 @@ def register_student(name, email, enrollment, password, professor_id):
                 continue
 
             rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-            face_locations = face_recognition.face_locations(rgb_img, model="cnn")  # Use "cnn" model for accuracy
+            face_locations = detector.detect(rgb_img)  # Accurate backend ("cnn" by default)
 
             if face_locations:
                 detected = True
@@ -2826,7 +3116,7 @@ def get_student_by_email(email):
     Returns:
         tuple or None: A tuple (id, name) if the student exists, otherwise None.
     """
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
 
         # Fetch student details based on email
@@ -2881,7 +3171,7 @@ def register_admin(email, password):
     Returns:
         str: Success or error message.
     """
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
 
         # Hash password before storing
@@ -2934,7 +3224,7 @@ def get_admin_by_email(email):
     Returns:
         dict or None: A dictionary with admin details (id, email, password) if found, else None.
     """
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT id, email, password FROM admins WHERE email = ?", (email,))
         admin = cursor.fetchone()
@@ -3048,7 +3338,7 @@ def register_professor(name, email, password):
     # Hash the password before storing
     hashed_password = bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
 
-    with sqlite3.connect("attendance_system.db") as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         try:
             cursor.execute("""
@@ -3075,7 +3365,7 @@ def get_professor_by_email_and_code(email, name, professor_code):
     Returns:
         tuple or None: (id, name, email, password, professor_code) if found, else None.
     """
-    with sqlite3.connect("attendance_system.db") as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT id, name, email, password, professor_code 
@@ -3096,7 +3386,7 @@ def get_professor_by_email(email):
     Returns:
         tuple or None: (id, name, email, password) if found, else None.
     """
-    with sqlite3.connect("attendance_system.db") as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT id, name, email, password FROM professors WHERE email = ?", (email,))
         return cursor.fetchone()
@@ -3113,7 +3403,7 @@ def update_professor_password(email, new_password):
     Note:
         Ensure the password is already hashed before calling this function.
     """
-    with sqlite3.connect("attendance_system.db") as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("UPDATE professors SET password = ? WHERE email = ?", (new_password, email))
         conn.commit()
@@ -3129,7 +3419,7 @@ def get_students_in_class(class_id):
     Returns:
         list of tuples: Each tuple contains (enrollment, name).
     """
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT students.enrollment, students.name
@@ -3145,7 +3435,7 @@ def get_classes_for_professor(professor_id):
     Retrieve all classroom IDs and names owned by the professor.
     Output: List of tuples (id, class_name)
     """
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("SELECT id, class_name FROM classrooms WHERE professor_id = ?", (professor_id,))
         return cursor.fetchall()
@@ -3156,7 +3446,7 @@ def get_attendance_for_professor(professor_id):
     Return all attendance entries recorded by this professor.
     Output: List of (enrollment, name, status, date)
     """
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT students.enrollment, students.name, attendance.status, attendance.date
@@ -3175,7 +3465,7 @@ def get_messages_for_professor(professor_id):
     - Message content
     - Timestamp
     """
-    with sqlite3.connect(DATABASE_PATH) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         cursor.execute("""
             SELECT students.name, messages.message, messages.timestamp
@@ -3236,35 +3526,29 @@ def retrieve_attendance(class_id):
 
     students = []
 
-    with sqlite3.connect("attendance_system.db") as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
 
         print(f"📌 DEBUG: Fetching attendance for class_id={class_id} on date={selected_date}")
 
-        # Optimize database performance and ensure latest data is read
-        cursor.execute("PRAGMA synchronous = OFF")
-        cursor.execute("PRAGMA cache_size = -2000")
-
         # Fetch attendance entries for this class on the selected date
         cursor.execute("""
             SELECT 
                 a.enrollment, 
-                sc.student_name, 
+                s.name, 
                 a.status, 
                 COALESCE(a.time_recognized, 'N/A'), 
-                sc.class_name, 
-                (
-                    SELECT COUNT(*) 
-                    FROM attendance 
-                    WHERE class_id = ? AND enrollment = a.enrollment AND status = 'Absent'
-                )
-            FROM attendance a
-            INNER JOIN student_classes sc 
-                ON a.enrollment = sc.enrollment 
-                AND sc.class_id = a.class_id
+                c.class_name, 
+                COALESCE((  -- Absences in this class (sessions held − attended)
+                    SELECT ac.absent FROM attendance_summary ac
+                    WHERE ac.student_id = a.student_id AND ac.class_id = a.class_id
+                ), 0)
+            FROM session_attendance a
+            INNER JOIN students s ON s.id = a.student_id
+            INNER JOIN classrooms c ON c.id = a.class_id
             WHERE a.class_id = ? AND a.date = ?
             ORDER BY a.time_recognized DESC
-        """, (class_id, class_id, selected_date))
+        """, (class_id, selected_date))
 
         fetched_records = cursor.fetchall()
         print(f"📌 DEBUG: Retrieved {len(fetched_records)} records")
@@ -3383,4 +3667,11 @@ def generate_report():
     )
 
 if __name__ == '__main__':
+    # The schema is migrated at deploy time (python migrations.py); warn if that step was skipped
+    check_schema()
+
+    # Login kiosk: open the camera and load the face models before the first login
+    if FACE_LOGIN_KIOSK:
+        get_login_kiosk()
+
     socketio.run(app, debug=True)
@@ -0,0 +1,388 @@
+"""
+attendance_bitsets.py
+Per-Student Attendance Bitsets
+
+Purpose:
+Attendance percentages, "absences in the last 3 sessions", streaks and
+weekday patterns used to be computed by fetching every session row of a
+student (or of a whole class) and looping over it in Python. Here the
+attendance of a student in a class is one bitset: bit i is set when the
+student was Present at the class's i-th session (sessions ordered by date).
+Every question becomes a popcount or a mask:
+
+- attended = popcount(bits), absences = sessions − attended
+- absences in the last k sessions = popcount(~bits & last-k mask)
+- absences per weekday = popcount(~bits & weekday mask), one mask per weekday
+- current streak = sessions − bit length of the bits that differ from the last session
+
+🔧 Key Features:
+- Sessions are counted like the `attendance_summary` view: a live session
+  that is still running today does not count yet, one left open on an
+  earlier day does.
+- Kept in memory: `class_attendance(class_id)` returns the bitsets of the
+  whole class, cached per process. A cached class costs one primary-key
+  lookup (its version) per call and is rebuilt only when it changed.
+- Versioned by triggers: every write to attendance_marks, class_sessions or
+  class_enrollments bumps the class's row in `attendance_bitset_versions`,
+  whatever the write path (writer thread, edge ingest, DB tools). Marks of
+  a running session do not (they don't count until it ends, and ending it
+  bumps the version).
+- Stored: after a rebuild the bitsets are written to `attendance_bitsets`
+  (one BLOB per student and class, little-endian bit order) through the
+  attendance writer, so the next process loads a class with one indexed read
+  instead of scanning its attendance. Every row carries the version and day
+  it was built for; only rows of the current version and day are used.
+
+Configuration (environment variables):
+- ATTENDANCE_BITSET_CACHE → classes kept in memory per process (default 256)
+"""
+
+# IMPORTS
+import os  # Configuration
+import calendar  # Weekday names
+import threading  # Cache lock
+from collections import OrderedDict  # Least recently used classes first
+from datetime import date  # Weekdays of session dates and today's date
+
+from data_access import connect_db, execute_script  # Pooled connections to the attendance database
+from attendance_writer import submit_attendance  # Stored bitsets are written by the attendance writer
+
+# CACHE CONFIGURATION
+ATTENDANCE_BITSET_CACHE = int(os.getenv("ATTENDANCE_BITSET_CACHE", "256"))
+
+WEEKDAY_NAMES = list(calendar.day_name)  # Monday first (day_name formats the name on every lookup)
+
+# Sessions that count: all but a live session still running today (see attendance_summary)
+COUNTED_SESSIONS = """
+    SELECT date FROM class_sessions
+    WHERE class_id = ? AND NOT (date >= ? AND ended_at IS NULL)
+    ORDER BY date
+"""
+
+
+# TABLES AND TRIGGERS
+
+def ensure_bitset_tables(cursor):
+    """Creates the stored bitsets, the per-class versions and the triggers that bump them (run by migrations.py)."""
+    execute_script(cursor, """
+        CREATE TABLE IF NOT EXISTS attendance_bitset_versions (
+            class_id INTEGER PRIMARY KEY,
+            version INTEGER NOT NULL DEFAULT 0,   -- Bumped by every change to the class's attendance
+            built_version INTEGER,                -- Version of the last complete set of stored bitsets
+            built_for TEXT,                       -- Day it was built on (running sessions depend on it)
+            sessions INTEGER,                     -- Sessions (bits) in it
+            students INTEGER                      -- Rows in it
+        );
+
+        CREATE TABLE IF NOT EXISTS attendance_bitsets (
+            class_id INTEGER NOT NULL,
+            student_id INTEGER NOT NULL,
+            version INTEGER NOT NULL,             -- Class version and day this row was built for
+            built_for TEXT NOT NULL,
+            present BLOB NOT NULL,                -- Bit i = Present at the class's i-th counted session
+            PRIMARY KEY (class_id, student_id)
+        ) WITHOUT ROWID;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_mark_added AFTER INSERT ON attendance_marks
+        WHEN NOT EXISTS (
+            SELECT 1 FROM class_sessions running
+            WHERE running.class_id = NEW.class_id AND running.date = NEW.date
+              AND running.date >= DATE('now', 'localtime') AND running.ended_at IS NULL
+        )
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version) VALUES (NEW.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_mark_changed AFTER UPDATE ON attendance_marks
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version)
+            SELECT changed.class_id, 1
+            FROM (SELECT OLD.class_id AS class_id, OLD.date AS date
+                  UNION SELECT NEW.class_id, NEW.date) changed
+            WHERE NOT EXISTS (
+                SELECT 1 FROM class_sessions running
+                WHERE running.class_id = changed.class_id AND running.date = changed.date
+                  AND running.date >= DATE('now', 'localtime') AND running.ended_at IS NULL
+            )
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_mark_removed AFTER DELETE ON attendance_marks
+        WHEN NOT EXISTS (
+            SELECT 1 FROM class_sessions running
+            WHERE running.class_id = OLD.class_id AND running.date = OLD.date
+              AND running.date >= DATE('now', 'localtime') AND running.ended_at IS NULL
+        )
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version) VALUES (OLD.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+
+        -- A session added, opened, closed or moved shifts the ordinals of the class
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_session_added AFTER INSERT ON class_sessions
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version) VALUES (NEW.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_session_changed AFTER UPDATE ON class_sessions
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version)
+            SELECT class_id, 1 FROM (SELECT OLD.class_id AS class_id UNION SELECT NEW.class_id) WHERE true
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_session_removed AFTER DELETE ON class_sessions
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version) VALUES (OLD.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+
+        -- Enrolling or dropping a student changes the class's roster of bitsets
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_enrolled AFTER INSERT ON class_enrollments
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version) VALUES (NEW.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_enrollment_changed AFTER UPDATE ON class_enrollments
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version)
+            SELECT class_id, 1 FROM (SELECT OLD.class_id AS class_id UNION SELECT NEW.class_id) WHERE true
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_bitsets_unenrolled AFTER DELETE ON class_enrollments
+        BEGIN
+            INSERT INTO attendance_bitset_versions (class_id, version) VALUES (OLD.class_id, 1)
+            ON CONFLICT (class_id) DO UPDATE SET version = version + 1;
+        END;
+    """)
+
+
+# BITSETS OF ONE CLASS
+
+class ClassAttendance:
+    """
+    The attendance bitsets of one class: one integer per enrolled student,
+    bit i set when the student was Present at the i-th counted session.
+    """
+
+    def __init__(self, class_id, version, today, dates, students):
+        self.class_id = class_id
+        self.version = version
+        self.today = today
+        self.dates = dates  # Counted session dates, oldest first (bit 0)
+        self.sessions = len(dates)
+        self.held = (1 << self.sessions) - 1  # One bit per counted session
+
+        # enrollment → (student id, name, bits)
+        self.students = students
+
+        # Sessions held on each weekday (Monday = 0)
+        self.weekday_masks = [0] * 7
+        for ordinal, day in enumerate(dates):
+            self.weekday_masks[date.fromisoformat(day).weekday()] |= 1 << ordinal
+
+    def bits(self, enrollment):
+        """Present bits of a student (None if not enrolled in the class)."""
+        entry = self.students.get(enrollment)
+        return entry[2] if entry else None
+
+    def recent_mask(self, count):
+        """Bits of the last `count` counted sessions."""
+        count = min(max(count, 0), self.sessions)
+        return self.held ^ ((1 << (self.sessions - count)) - 1)
+
+    def stats(self, enrollment, recent=3):
+        """
+        Attendance of one student in this class, from their bitset:
+
+        sessions, present, absent, rate (% present, None before the first session),
+        recent_absences (in the last `recent` sessions), current_streak
+        (consecutive latest sessions with the same status; positive = present,
+        negative = absent), longest_absence_streak and weekday_absences
+        ({"Monday": n, ...}, weekdays with at least one absence).
+
+        Returns None if the student is not enrolled in the class.
+        """
+        present_bits = self.bits(enrollment)
+        if present_bits is None:
+            return None
+        absent_bits = self.held & ~present_bits
+        present = present_bits.bit_count()
+
+        # Current streak: the latest sessions up to the first one with the other status
+        current_streak = 0
+        if self.sessions:
+            if present_bits >> (self.sessions - 1) & 1:
+                current_streak = self.sessions - absent_bits.bit_length()
+            else:
+                current_streak = -(self.sessions - present_bits.bit_length())
+
+        # Longest run of absences: each `runs & (runs >> 1)` shortens every run by one
+        longest_absence_streak = 0
+        runs = absent_bits
+        while runs:
+            runs &= runs >> 1
+            longest_absence_streak += 1
+
+        weekday_absences = {}
+        for weekday, mask in enumerate(self.weekday_masks):
+            missed = (absent_bits & mask).bit_count()
+            if missed:
+                weekday_absences[WEEKDAY_NAMES[weekday]] = missed
+
+        return {
+            "sessions": self.sessions,
+            "present": present,
+            "absent": self.sessions - present,
+            "rate": round(present / self.sessions * 100, 1) if self.sessions else None,
+            "recent_absences": (absent_bits & self.recent_mask(recent)).bit_count(),
+            "current_streak": current_streak,
+            "longest_absence_streak": longest_absence_streak,
+            "weekday_absences": weekday_absences,
+        }
+
+    def class_stats(self, recent=3):
+        """`stats()` of every enrolled student, by enrollment: [(enrollment, name, stats), ...]."""
+        return [(enrollment, self.students[enrollment][1], self.stats(enrollment, recent))
+                for enrollment in sorted(self.students)]
+
+
+# BUILDING AND LOADING
+
+def _today():
+    return date.today().isoformat()
+
+
+def _load_stored(cursor, class_id, version, today, sessions, count):
+    """The stored bitsets of a class at `version` and `today` (None if incomplete: rebuild)."""
+    cursor.execute(COUNTED_SESSIONS, (class_id, today))
+    dates = [row[0] for row in cursor.fetchall()]
+    if len(dates) != sessions:
+        return None
+
+    cursor.execute("""
+        SELECT s.enrollment, s.id, s.name, b.present
+        FROM attendance_bitsets b JOIN students s ON s.id = b.student_id
+        WHERE b.class_id = ? AND b.version = ? AND b.built_for = ?
+    """, (class_id, version, today))
+    rows = cursor.fetchall()
+    if len(rows) != count:
+        return None  # Overwritten by a newer build, or a student was deleted since
+
+    students = {enrollment: (student_id, name, int.from_bytes(present, "little"))
+                for enrollment, student_id, name, present in rows}
+    return ClassAttendance(class_id, version, today, dates, students)
+
+
+def _build(cursor, class_id, version, today):
+    """Bitsets of a class from its sessions, roster and Present marks (one pass over the marks)."""
+    cursor.execute(COUNTED_SESSIONS, (class_id, today))
+    dates = [row[0] for row in cursor.fetchall()]
+    ordinals = {day: ordinal for ordinal, day in enumerate(dates)}
+
+    cursor.execute("""
+        SELECT s.enrollment, s.id, s.name
+        FROM class_enrollments e JOIN students s ON s.id = e.student_id
+        WHERE e.class_id = ?
+    """, (class_id,))
+    roster = cursor.fetchall()
+
+    bits = {student_id: 0 for _, student_id, _ in roster}
+    cursor.execute("""
+        SELECT student_id, date FROM attendance_marks
+        WHERE class_id = ? AND status = 'Present'
+    """, (class_id,))
+    for student_id, day in cursor.fetchall():
+        ordinal = ordinals.get(day)  # None: a running session, not counted yet
+        if ordinal is not None and student_id in bits:
+            bits[student_id] |= 1 << ordinal
+
+    students = {enrollment: (student_id, name, bits[student_id]) for enrollment, student_id, name in roster}
+    return ClassAttendance(class_id, version, today, dates, students)
+
+
+def _store(attendance):
+    """
+    Queues the bitsets of a class on the attendance writer (readers don't wait for
+    the write lock). The bitsets of a version and day are always the same, so rows
+    of concurrent rebuilds can interleave; older rows never replace newer ones, and
+    the version row is stamped after the rows, only while the version is current.
+    """
+    key = (attendance.class_id, attendance.version, attendance.today)
+    size = (attendance.sessions + 7) // 8
+    rows = [key[:1] + (student_id,) + key[1:] + (present.to_bytes(size, "little"),)
+            for student_id, _, present in attendance.students.values()]
+
+    if rows:
+        submit_attendance("""
+            INSERT INTO attendance_bitsets (class_id, student_id, version, built_for, present)
+            VALUES (?, ?, ?, ?, ?)
+            ON CONFLICT (class_id, student_id) DO UPDATE SET
+                version = excluded.version, built_for = excluded.built_for, present = excluded.present
+            WHERE (excluded.version, excluded.built_for)
+                  >= (attendance_bitsets.version, attendance_bitsets.built_for)
+        """, rows, many=True)
+    # Students no longer enrolled
+    submit_attendance("""
+        DELETE FROM attendance_bitsets WHERE class_id = ?1 AND (version, built_for) < (?2, ?3)
+    """, key)
+    submit_attendance("""
+        INSERT INTO attendance_bitset_versions (class_id, version, built_version, built_for, sessions, students)
+        VALUES (?1, ?2, ?2, ?3, ?4, ?5)
+        ON CONFLICT (class_id) DO UPDATE SET
+            built_version = excluded.built_version, built_for = excluded.built_for,
+            sessions = excluded.sessions, students = excluded.students
+        WHERE attendance_bitset_versions.version = excluded.built_version  -- Still current
+    """, key + (attendance.sessions, len(rows)))
+
+
+_cache = OrderedDict()  # class_id → ClassAttendance, least recently used first
+_cache_lock = threading.Lock()
+
+
+def class_attendance(class_id):
+    """
+    The attendance bitsets of a class (ClassAttendance), from the process cache
+    when still current, else from the stored bitsets, else rebuilt (and stored).
+    """
+    today = _today()
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        cursor.execute("BEGIN")  # One snapshot: the version and the rows it describes
+        cursor.execute("""
+            SELECT version, built_version, built_for, sessions, students
+            FROM attendance_bitset_versions WHERE class_id = ?
+        """, (class_id,))
+        version, built_version, built_for, sessions, count = cursor.fetchone() or (0, None, None, None, None)
+
+        with _cache_lock:
+            cached = _cache.get(class_id)
+            if cached is not None and cached.version == version and cached.today == today:
+                _cache.move_to_end(class_id)
+                return cached
+
+        attendance = None
+        if built_version == version and built_for == today:
+            attendance = _load_stored(cursor, class_id, version, today, sessions, count)
+        stored = attendance is not None
+        if attendance is None:
+            attendance = _build(cursor, class_id, version, today)
+
+    if not stored:
+        _store(attendance)
+
+    with _cache_lock:
+        _cache[class_id] = attendance
+        _cache.move_to_end(class_id)
+        while len(_cache) > ATTENDANCE_BITSET_CACHE:
+            _cache.popitem(last=False)
+    return attendance
+
+
+def student_attendance(enrollment, class_id, recent=3):
+    """`ClassAttendance.stats()` of one student in one class (None if not enrolled)."""
+    return class_attendance(class_id).stats(enrollment, recent)
@@ -0,0 +1,158 @@
+"""
+attendance_ingest.py
+Batched, Idempotent Attendance Ingest for Edge Recognition Nodes
+
+Purpose:
+Classroom machines run face recognition locally (see edge_runner.py) and
+send the central server only what they recognized: batches of enrollments
+with the time each student was seen. This module writes such a batch into
+the attendance table.
+
+🔧 Key Features:
+- One transaction per batch: either every event of a batch is stored or none.
+- Idempotency keys: every batch carries a key chosen by the edge node. The
+  key and the server's reply are stored in the same transaction as the
+  attendance rows, so a batch retried after a network blip is recognized
+  and answered with the original reply instead of being applied twice.
+- Events are upserted like live attendance (`mark_attendance_in_db`):
+  the student becomes Present and `time_recognized` keeps the latest sighting.
+- Students not enrolled in the class are reported back and ignored.
+- The class session of each day is recorded by a trigger on attendance
+  (migrations.py), so ingested days count towards absences like live ones.
+
+Configuration (environment variables):
+- EDGE_API_TOKEN → shared secret edge nodes send as "Authorization: Bearer <token>"
+"""
+
+# IMPORTS
+import os  # API token configuration
+import json  # Stored replies of processed batches
+import hmac  # Constant-time token comparison
+from datetime import datetime  # Timestamp parsing
+
+from data_access import transaction  # Pooled connections to the attendance database
+
+# Shared secret for edge nodes (ingest is disabled while unset)
+EDGE_API_TOKEN = os.getenv("EDGE_API_TOKEN", "")
+
+MAX_EVENTS_PER_BATCH = 5000  # Larger batches are rejected; edge nodes flush far more often
+
+
+class IngestError(Exception):
+    """Raised for malformed batches; the message is returned to the edge node."""
+
+
+def check_edge_token(authorization_header):
+    """True if the request carries the configured edge API token."""
+    if not EDGE_API_TOKEN or not authorization_header:
+        return False
+    scheme, _, token = authorization_header.partition(" ")
+    return scheme.lower() == "bearer" and hmac.compare_digest(token.strip(), EDGE_API_TOKEN)
+
+
+def ensure_ingest_table(cursor):
+    """Creates the table that remembers processed batches (idempotency keys; run by migrations.py)."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS ingest_batches (
+            idempotency_key TEXT PRIMARY KEY,
+            class_id INTEGER NOT NULL,
+            received_at TEXT NOT NULL,
+            event_count INTEGER NOT NULL,
+            response TEXT NOT NULL
+        )
+    """)
+
+
+def _parse_events(events):
+    """
+    Validates the events and keeps the latest sighting per (enrollment, date).
+
+    Each event is `{"enrollment": str, "timestamp": "YYYY-MM-DD HH:MM:SS"}`
+    (ISO 8601 with a "T" is accepted as well).
+    """
+    if not isinstance(events, list):
+        raise IngestError("'events' must be a list.")
+    if len(events) > MAX_EVENTS_PER_BATCH:
+        raise IngestError(f"Too many events in one batch (max {MAX_EVENTS_PER_BATCH}).")
+
+    latest = {}
+    for event in events:
+        try:
+            enrollment = str(event["enrollment"]).strip()
+            seen_at = datetime.fromisoformat(str(event["timestamp"]))
+        except (KeyError, TypeError, ValueError):
+            raise IngestError(f"Invalid event: {event!r}")
+
+        key = (enrollment, seen_at.strftime("%Y-%m-%d"))
+        timestamp = seen_at.strftime("%Y-%m-%d %H:%M:%S")
+        if key not in latest or timestamp > latest[key]:
+            latest[key] = timestamp
+    return latest
+
+
+def ingest_attendance_batch(class_id, professor_id, events, idempotency_key):
+    """
+    Applies one batch of recognized students in a single transaction.
+
+    Returns:
+        (response dict, replayed) — `replayed` is True when the batch had
+        already been applied and the stored response is returned unchanged.
+    Raises IngestError for malformed batches (nothing is written).
+    """
+    if not idempotency_key or len(idempotency_key) > 128:
+        raise IngestError("A batch needs an idempotency key (at most 128 characters).")
+    try:
+        class_id = int(class_id)
+        professor_id = int(professor_id)
+    except (TypeError, ValueError):
+        raise IngestError("'class_id' and 'professor_id' must be integers.")
+
+    sightings = _parse_events(events)
+
+    # Take the write lock first, so two deliveries of the same batch cannot both pass the check
+    with transaction(immediate=True) as conn:
+        cursor = conn.cursor()
+
+        cursor.execute("SELECT response FROM ingest_batches WHERE idempotency_key = ?", (idempotency_key,))
+        previous = cursor.fetchone()
+        if previous:
+            print(f"🔁 Batch {idempotency_key} already ingested — returning the stored response.")
+            return json.loads(previous[0]), True
+
+        cursor.execute("SELECT enrollment FROM student_classes WHERE class_id = ?", (class_id,))
+        enrolled_students = {row[0] for row in cursor.fetchall()}
+
+        rows = []
+        ignored = set()
+        for (enrollment, date), timestamp in sightings.items():
+            if enrollment in enrolled_students:
+                rows.append((class_id, enrollment, date, timestamp, professor_id))
+            else:
+                ignored.add(enrollment)
+
+        # Same upsert as live attendance; keep the latest time a student was seen
+        cursor.executemany("""
+            INSERT INTO attendance_marks (class_id, student_id, date, status, time_recognized, professor_id)
+            SELECT ?1, s.id, ?3, 'Present', ?4, ?5
+            FROM students s WHERE s.enrollment = ?2
+            ON CONFLICT(class_id, student_id, date)
+            DO UPDATE SET
+                status = 'Present',
+                time_recognized = MAX(COALESCE(attendance_marks.time_recognized, ''), excluded.time_recognized);
+        """, rows)
+
+        response = {
+            "status": "ok",
+            "class_id": class_id,
+            "events": len(events),
+            "marked_present": len(rows),
+            "ignored_not_enrolled": sorted(ignored),
+        }
+        cursor.execute("""
+            INSERT INTO ingest_batches (idempotency_key, class_id, received_at, event_count, response)
+            VALUES (?, ?, ?, ?, ?)
+        """, (idempotency_key, class_id, datetime.now().strftime("%Y-%m-%d %H:%M:%S"), len(events), json.dumps(response)))
+
+    print(f"📥 Ingested batch {idempotency_key}: {len(rows)} present, {len(ignored)} ignored (class {class_id})")
+    return response, False
+
@@ -0,0 +1,338 @@
+"""
+attendance_writer.py
+Write-Behind Attendance Queue with Group Commit
+
+Purpose:
+Live recognition, the attendance socket handlers, manual attendance and
+the single-student recognition path each used to commit their own small
+transaction. With many classrooms running at once, every one of those
+commits waits for its own WAL sync and for the write lock, and the
+commit rate — not recognition — becomes the bottleneck. Instead, callers
+now put attendance writes on an in-process queue and return immediately;
+one writer thread applies them in groups.
+
+🔧 Key Features:
+- Single writer: one thread owns one connection and is the only attendance
+  writer of the process, so writers no longer queue on the SQLite lock.
+  The connection is its own (data_access.open_connection()), not a pooled
+  one, so its synchronous setting never reaches other users.
+- Group commit: the writer collects events for up to
+  ATTENDANCE_COMMIT_INTERVAL_MS (or until ATTENDANCE_COMMIT_BATCH events
+  are waiting) and applies them in one BEGIN IMMEDIATE transaction — one
+  commit for the whole group instead of one per event.
+- Durability: an event's Future completes only after the transaction that
+  contains it has committed. With the default synchronous=NORMAL (WAL) a
+  committed group survives an application crash; ATTENDANCE_SYNCHRONOUS=FULL
+  makes every group commit survive power loss too (one fsync per group).
+- Isolation between events: each event runs under its own SAVEPOINT, so one
+  failing statement fails only its own Future, not the rest of the group.
+  Any error (not only SQLite's) fails the event or group it came from; the
+  writer thread keeps running.
+- Back-pressure: the queue is bounded (ATTENDANCE_QUEUE_SIZE). When the
+  writer falls behind, `submit()` blocks, and raises AttendanceQueueFull
+  after ATTENDANCE_ENQUEUE_TIMEOUT seconds instead of growing without limit.
+- Read-your-writes: `submit()` returns a concurrent.futures.Future. Callers
+  that read back what they wrote submit with `flush=True` (their group
+  commits without waiting out the interval) and call `.result()`; events are
+  applied in submission order, so waiting on the last one covers the
+  earlier ones.
+- Pending events are flushed when the process exits.
+
+Configuration (environment variables):
+- ATTENDANCE_COMMIT_INTERVAL_MS → longest time an event waits for its group (default 100)
+- ATTENDANCE_COMMIT_BATCH → events that close a group early (default 500)
+- ATTENDANCE_QUEUE_SIZE → events allowed to wait before submitters block (default 10000)
+- ATTENDANCE_ENQUEUE_TIMEOUT → seconds a submitter blocks on a full queue (default 5)
+- ATTENDANCE_SYNCHRONOUS → NORMAL (default) or FULL for the writer's connection
+"""
+
+# IMPORTS
+import os  # Configuration and process id
+import time  # Group deadlines and statistics
+import queue  # Bounded event queue
+import atexit  # Flush pending events on exit
+import sqlite3  # Error types
+import threading  # Writer thread
+from concurrent.futures import Future  # Completion of queued writes
+
+from data_access import open_connection  # Dedicated (non-pooled) connection to the attendance database
+
+
+# WRITER CONFIGURATION
+ATTENDANCE_COMMIT_INTERVAL_MS = float(os.getenv("ATTENDANCE_COMMIT_INTERVAL_MS", "100"))
+ATTENDANCE_COMMIT_BATCH = int(os.getenv("ATTENDANCE_COMMIT_BATCH", "500"))
+ATTENDANCE_QUEUE_SIZE = int(os.getenv("ATTENDANCE_QUEUE_SIZE", "10000"))
+ATTENDANCE_ENQUEUE_TIMEOUT = float(os.getenv("ATTENDANCE_ENQUEUE_TIMEOUT", "5"))
+ATTENDANCE_SYNCHRONOUS = os.getenv("ATTENDANCE_SYNCHRONOUS", "NORMAL").upper()
+
+
+# STATEMENTS
+
+# Statements address students by enrollment and store the integer key (students.id)
+
+# Recognized student → Present (enrolled students only); already Present → newer timestamp.
+# Parameters: (class_id, enrollment, date, time_recognized, professor_id)
+MARK_PRESENT = """
+    INSERT INTO attendance_marks (class_id, student_id, date, status, time_recognized, professor_id)
+    SELECT ?1, s.id, ?3, 'Present', ?4, ?5
+    FROM students s
+    WHERE s.enrollment = ?2
+      AND EXISTS (SELECT 1 FROM class_enrollments e WHERE e.class_id = ?1 AND e.student_id = s.id)
+    ON CONFLICT(class_id, student_id, date)
+    DO UPDATE SET
+        status = 'Present',
+        time_recognized = excluded.time_recognized
+"""
+
+# Manual attendance: the status a professor picked for one student and day
+# Parameters: (class_id, enrollment, date, status, time_recognized, professor_id)
+SET_STATUS = """
+    INSERT INTO attendance_marks (class_id, student_id, date, status, time_recognized, professor_id)
+    SELECT ?1, s.id, ?3, ?4, ?5, ?6
+    FROM students s
+    WHERE s.enrollment = ?2
+    ON CONFLICT(class_id, student_id, date)
+    DO UPDATE SET
+        status = excluded.status,
+        time_recognized = COALESCE(excluded.time_recognized, attendance_marks.time_recognized)
+"""
+
+# Manual attendance: Absent is the absence of a row (derived from class_sessions and the roster)
+# Parameters: (class_id, enrollment, date)
+CLEAR_STATUS = """
+    DELETE FROM attendance_marks
+    WHERE class_id = ? AND student_id = (SELECT id FROM students WHERE enrollment = ?) AND date = ?
+"""
+
+# Live session started (class_id, date, started_at); a second run the same day reopens the session
+OPEN_SESSION = """
+    INSERT INTO class_sessions (class_id, date, started_at, ended_at)
+    VALUES (?, ?, ?, NULL)
+    ON CONFLICT(class_id, date) DO UPDATE SET ended_at = NULL
+"""
+
+# Live session stopped (ended_at, class_id, date)
+CLOSE_SESSION = """
+    UPDATE class_sessions SET ended_at = ? WHERE class_id = ? AND date = ?
+"""
+
+# Manual attendance taken (class_id, date, started_at, ended_at); leaves a running live session open
+RECORD_SESSION = """
+    INSERT INTO class_sessions (class_id, date, started_at, ended_at)
+    VALUES (?, ?, ?, ?)
+    ON CONFLICT(class_id, date) DO NOTHING
+"""
+
+
+class AttendanceQueueFull(Exception):
+    """Raised when the writer is so far behind that the queue stayed full for the whole enqueue timeout."""
+
+
+class _Event:
+    __slots__ = ("sql", "params", "many", "flush", "future", "submitted_at")
+
+    def __init__(self, sql, params, many, flush):
+        self.sql = sql
+        self.params = params
+        self.many = many
+        self.flush = flush
+        self.future = Future()
+        self.submitted_at = time.monotonic()
+
+
+_STOP = object()
+
+
+class AttendanceWriter:
+    """The single attendance writer of a process: a bounded queue drained by one thread in groups."""
+
+    def __init__(self, interval_ms=ATTENDANCE_COMMIT_INTERVAL_MS, batch_size=ATTENDANCE_COMMIT_BATCH,
+                 queue_size=ATTENDANCE_QUEUE_SIZE, enqueue_timeout=ATTENDANCE_ENQUEUE_TIMEOUT,
+                 synchronous=ATTENDANCE_SYNCHRONOUS):
+        self.interval = interval_ms / 1000.0
+        self.batch_size = max(batch_size, 1)
+        self.enqueue_timeout = enqueue_timeout
+        self.synchronous = synchronous
+        self.pid = os.getpid()
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._stopped = False
+        self._thread = threading.Thread(target=self._run, name="attendance-writer", daemon=True)
+
+        # Statistics (submitted is counted by the submitting threads, the rest by the writer)
+        self._submitted_lock = threading.Lock()
+        self.submitted = 0
+        self.committed = 0
+        self.failed = 0
+        self.groups = 0
+        self.largest_group = 0
+        self.max_wait_ms = 0.0
+
+        self._thread.start()
+
+    # Producer side
+
+    def submit(self, sql, params=(), many=False, flush=False):
+        """
+        Queues one write (`many=True`: one statement over a list of parameter rows).
+
+        `flush=True` is for callers about to wait on the result: the group that
+        contains this event commits as soon as the event is collected, instead of
+        waiting for the rest of the commit interval.
+
+        Returns a Future whose result is the statement's rowcount once its group
+        has committed (or whose exception is the error it failed with).
+        """
+        if self._stopped:
+            raise RuntimeError("Attendance writer is stopped.")
+        event = _Event(sql, list(params) if many else params, many, flush)
+        try:
+            self._queue.put(event, timeout=self.enqueue_timeout)
+        except queue.Full:
+            raise AttendanceQueueFull(
+                f"{self._queue.qsize()} attendance writes are waiting; the database cannot keep up."
+            ) from None
+        with self._submitted_lock:
+            self.submitted += 1
+        return event.future
+
+    def flush(self, timeout=None):
+        """Waits until everything submitted so far is committed."""
+        self.submit("SELECT 1", flush=True).result(timeout)
+
+    # Writer thread
+
+    def _run(self):
+        conn = open_connection()  # Kept for the life of the writer; closed (not pooled) at the end
+        conn.execute(f"PRAGMA synchronous = {self.synchronous}")
+
+        stopping = False
+        while not stopping:
+            first = self._queue.get()
+            if first is _STOP:
+                break
+
+            # Collect a group: until the interval since the first event ends, the batch is full,
+            # or someone is waiting on an event of the group
+            group = [first]
+            deadline = time.monotonic() + self.interval
+            while len(group) < self.batch_size and not group[-1].flush:
+                remaining = deadline - time.monotonic()
+                try:
+                    event = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+                except queue.Empty:
+                    break
+                if event is _STOP:
+                    stopping = True
+                    break
+                group.append(event)
+
+            self._commit(conn, group)
+
+        # Stopped: apply whatever was still queued
+        leftover = []
+        while True:
+            try:
+                event = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if event is not _STOP:
+                leftover.append(event)
+        for start in range(0, len(leftover), self.batch_size):
+            self._commit(conn, leftover[start:start + self.batch_size])
+        conn.close()
+
+    def _commit(self, conn, group):
+        """Applies a group in one transaction, one savepoint per event; completes the futures after COMMIT."""
+        # A submitter that cancelled its Future gets no write; the rest can no longer be cancelled
+        group = [event for event in group if event.future.set_running_or_notify_cancel()]
+        if not group:
+            return
+        results = []
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            for event in group:
+                conn.execute("SAVEPOINT attendance_event")
+                try:
+                    if event.many:
+                        cursor = conn.executemany(event.sql, event.params)
+                    else:
+                        cursor = conn.execute(event.sql, event.params)
+                    results.append((cursor.rowcount, None))
+                    conn.execute("RELEASE attendance_event")
+                except Exception as e:  # Bad parameters too, not only SQLite errors
+                    conn.execute("ROLLBACK TO attendance_event")
+                    conn.execute("RELEASE attendance_event")
+                    results.append((None, e))
+            conn.commit()
+        except Exception as e:
+            # The group did not commit: none of its events are durable
+            try:
+                conn.rollback()
+            except sqlite3.Error:
+                pass
+            print(f"❌ Attendance group of {len(group)} writes failed to commit: {e}")
+            self.failed += len(group)
+            for event in group:
+                event.future.set_exception(e)
+            return
+
+        now = time.monotonic()
+        self.groups += 1
+        self.largest_group = max(self.largest_group, len(group))
+        self.max_wait_ms = max(self.max_wait_ms, (now - group[0].submitted_at) * 1000)
+        for event, (rowcount, error) in zip(group, results):
+            if error is None:
+                self.committed += 1
+                event.future.set_result(rowcount)
+            else:
+                self.failed += 1
+                print(f"❌ Attendance write failed: {error}")
+                event.future.set_exception(error)
+
+    # Lifecycle and status
+
+    def stop(self, timeout=10):
+        """Flushes pending events and ends the writer thread."""
+        if self._stopped:
+            return
+        self._stopped = True
+        self._queue.put(_STOP)
+        self._thread.join(timeout)
+
+    def stats(self):
+        return {
+            "queued": self._queue.qsize(),
+            "submitted": self.submitted,
+            "committed": self.committed,
+            "failed": self.failed,
+            "groups": self.groups,
+            "average_group": round(self.committed / self.groups, 1) if self.groups else 0,
+            "largest_group": self.largest_group,
+            "max_wait_ms": round(self.max_wait_ms, 1),
+        }
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_attendance_writer():
+    """The writer of this process (started on first use; a forked child starts its own)."""
+    global _writer
+
+    with _writer_lock:
+        if _writer is None or _writer.pid != os.getpid():
+            _writer = AttendanceWriter()
+        return _writer
+
+
+def submit_attendance(sql, params=(), many=False, flush=False):
+    """Queues an attendance write on this process's writer; returns its Future."""
+    return get_attendance_writer().submit(sql, params, many, flush)
+
+
+@atexit.register
+def _flush_on_exit():
+    if _writer is not None and _writer.pid == os.getpid():
+        _writer.stop()
@@ -0,0 +1,206 @@
+"""
+attendance_stats.py
+Attendance Statistics: Row Loops vs. Per-Student Bitsets
+
+Purpose:
+Builds a fresh database with the schema migrations (migrations.py), fills it
+with classes, students and past sessions, and computes every student's
+attendance (sessions, absences, rate, absences in the last 3 sessions,
+absences per weekday) in two ways:
+
+- "rows" → one session_attendance query per student and a Python loop over
+  the rows, as `AttendancePredictionAgent.predict_absenteeism` used to do
+- "bitsets" → attendance_bitsets.class_attendance(), timed as a rebuild from
+  the attendance marks, a load of the stored BLOBs (new process), a cached
+  read, and the popcounts for the whole class
+
+Both must give the same numbers for every student (exit status 1 otherwise).
+It also checks that a write to an ended session invalidates the cached bitsets
+and that marks of a running session do not.
+
+Usage:
+    python -m benchmarks.attendance_stats --classes 10 --students 60 --sessions 120
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import atexit  # Remove the scratch database
+import os  # Scratch database path
+import random  # Synthetic attendance
+import shutil  # Remove the scratch database
+import sys  # Exit status
+import tempfile  # Scratch directory
+import time  # Timing
+from datetime import date, datetime, timedelta  # Session dates
+
+# data_access reads DATABASE_PATH at import: point it at a scratch file first
+SCRATCH_DIR = tempfile.mkdtemp(prefix="attendance-stats-")
+atexit.register(shutil.rmtree, SCRATCH_DIR, ignore_errors=True)
+os.environ["DATABASE_PATH"] = os.path.join(SCRATCH_DIR, "stats.db")
+
+from data_access import connect_db  # noqa: E402
+from migrations import migrate  # noqa: E402
+from attendance_writer import get_attendance_writer, submit_attendance, MARK_PRESENT, OPEN_SESSION  # noqa: E402
+import attendance_bitsets  # noqa: E402
+
+
+def seed(conn, classes, students, sessions, rate):
+    """Classes meeting on weekdays over the last `sessions` weekdays; each student Present with probability `rate`."""
+    rng = random.Random(0)
+    days, day = [], date.today() - timedelta(days=1)
+    while len(days) < sessions:
+        if day.weekday() < 5:
+            days.append(day.isoformat())
+        day -= timedelta(days=1)
+
+    conn.executemany("INSERT INTO classrooms (id, class_name, professor_id) VALUES (?, ?, 1)",
+                     [(c, f"Class {c}") for c in range(1, classes + 1)])
+    conn.executemany("INSERT INTO students (enrollment, name, email, password) VALUES (?1, ?1, ?1, '')",
+                     [(f"S{s:05d}",) for s in range(classes * students)])
+    conn.executemany("""
+        INSERT INTO class_enrollments (student_id, class_id)
+        SELECT id, ? FROM students WHERE enrollment = ?
+    """, [(c, f"S{(c - 1) * students + s:05d}") for c in range(1, classes + 1) for s in range(students)])
+    conn.executemany("INSERT INTO class_sessions (class_id, date, started_at, ended_at) VALUES (?1, ?2, ?2, ?2)",
+                     [(c, d) for c in range(1, classes + 1) for d in days])
+    conn.executemany("""
+        INSERT INTO attendance_marks (student_id, class_id, date, status, professor_id, time_recognized)
+        SELECT id, ?, ?, 'Present', 1, ? FROM students WHERE enrollment = ?
+    """, [(c, d, f"{d} 09:00:00", f"S{(c - 1) * students + s:05d}")
+          for c in range(1, classes + 1) for s in range(students) for d in days if rng.random() < rate])
+
+
+def stats_from_rows(cursor, enrollment, class_id):
+    """The old way: every session row of the student, counted in Python."""
+    cursor.execute("""
+        SELECT date, status FROM session_attendance
+        WHERE enrollment = ? AND class_id = ?
+        ORDER BY date ASC;
+    """, (enrollment, class_id))
+    records = cursor.fetchall()
+    total_sessions = len(records)
+    absences = sum(1 for r in records if r[1] == "Absent")
+    weekday_absences = {}
+    for date_string, status in records:
+        if status == "Absent":
+            weekday = datetime.strptime(date_string, "%Y-%m-%d").strftime("%A")
+            weekday_absences[weekday] = weekday_absences.get(weekday, 0) + 1
+    return {
+        "sessions": total_sessions,
+        "absent": absences,
+        "rate": round((total_sessions - absences) / total_sessions * 100, 1) if total_sessions else None,
+        "recent_absences": sum(1 for r in records[-3:] if r[1] == "Absent"),
+        "weekday_absences": weekday_absences,
+    }
+
+
+def timed(function, repeat, setup=None):
+    """Median milliseconds of `repeat` calls (`setup` runs untimed before each)."""
+    samples = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return sorted(samples)[len(samples) // 2]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Attendance statistics from row loops vs. per-student bitsets.")
+    parser.add_argument("--classes", type=int, default=10, help="Classes")
+    parser.add_argument("--students", type=int, default=60, help="Students per class")
+    parser.add_argument("--sessions", type=int, default=120, help="Past sessions per class")
+    parser.add_argument("--rate", type=float, default=0.85, help="Probability a student attended a session")
+    parser.add_argument("--repeat", type=int, default=5, help="Timed runs per measurement")
+    args = parser.parse_args()
+
+    migrate()
+    with connect_db() as conn:
+        seed(conn, args.classes, args.students, args.sessions, args.rate)
+
+    failures = []
+    timings = {"rows": [], "rebuild": [], "stored": [], "cached": [], "class_stats": []}
+    writer = get_attendance_writer()
+
+    for class_id in range(1, args.classes + 1):
+        with connect_db() as conn:
+            cursor = conn.cursor()
+            cursor.execute("""
+                SELECT s.enrollment FROM class_enrollments e JOIN students s ON s.id = e.student_id
+                WHERE e.class_id = ?
+            """, (class_id,))
+            roster = [row[0] for row in cursor.fetchall()]
+
+            expected = {}
+
+            def rows():
+                for enrollment in roster:
+                    expected[enrollment] = stats_from_rows(cursor, enrollment, class_id)
+            timings["rows"].append(timed(rows, args.repeat))
+
+        def forget_stored():
+            writer.flush()  # Stored BLOBs of the previous rebuild
+            attendance_bitsets._cache.clear()
+            with connect_db() as conn:
+                conn.execute("UPDATE attendance_bitset_versions SET built_version = NULL WHERE class_id = ?",
+                             (class_id,))
+
+        def forget_cached():
+            writer.flush()
+            attendance_bitsets._cache.clear()
+
+        load = lambda: attendance_bitsets.class_attendance(class_id)  # noqa: E731
+        timings["rebuild"].append(timed(load, args.repeat, forget_stored))
+        timings["stored"].append(timed(load, args.repeat, forget_cached))
+
+        attendance = attendance_bitsets.class_attendance(class_id)
+        timings["cached"].append(timed(load, args.repeat))
+        timings["class_stats"].append(timed(attendance.class_stats, args.repeat))
+
+        for enrollment, _, stats in attendance.class_stats():
+            got = {key: stats[key] for key in expected[enrollment]}
+            if got != expected[enrollment]:
+                failures.append(f"class {class_id}, {enrollment}: bitsets {got} ≠ rows {expected[enrollment]}")
+
+    # A mark in an ended session invalidates; marks of a running session do not count yet
+    enrollment = "S00000"
+    before = attendance_bitsets.student_attendance(enrollment, 1)
+    with connect_db() as conn:
+        absent_day = conn.execute("""
+            SELECT cs.date FROM class_sessions cs
+            WHERE cs.class_id = 1 AND NOT EXISTS (
+                SELECT 1 FROM attendance_marks a JOIN students s ON s.id = a.student_id
+                WHERE a.class_id = 1 AND a.date = cs.date AND s.enrollment = ?
+            )
+        """, (enrollment,)).fetchone()
+    today = date.today().isoformat()
+    submit_attendance(OPEN_SESSION, (1, today, f"{today} 08:00:00"))
+    submit_attendance(MARK_PRESENT, (1, enrollment, today, f"{today} 08:01:00", 1), flush=True).result()
+    running = attendance_bitsets.student_attendance(enrollment, 1)
+    if running["sessions"] != before["sessions"] or running["present"] != before["present"]:
+        failures.append(f"running session counted: {before} → {running}")
+    if absent_day:
+        submit_attendance(MARK_PRESENT, (1, enrollment, absent_day[0], f"{absent_day[0]} 09:00:00", 1),
+                          flush=True).result()
+        after = attendance_bitsets.student_attendance(enrollment, 1)
+        if after["present"] != before["present"] + 1 or after["absent"] != before["absent"] - 1:
+            failures.append(f"write to an ended session not seen: {before} → {after}")
+    writer.stop()
+
+    print(f"\n{args.classes} classes × {args.students} students × {args.sessions} sessions "
+          f"(median ms per class, all students)")
+    print(f"{'method':<14}{'ms':>10}")
+    for name, values in timings.items():
+        print(f"{name:<14}{sorted(values)[len(values) // 2]:>10.3f}")
+
+    if failures:
+        print("\n❌ Bitset statistics differ from the row loop:")
+        for failure in failures[:20]:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("\n✅ Bitset statistics match the row loop for every student.")
+
+
+if __name__ == "__main__":
+    main()
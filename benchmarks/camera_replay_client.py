@@ -0,0 +1,167 @@
+"""
+camera_replay_client.py
+Network Camera Stub Client (Load Test)
+
+Purpose:
+Replays a video file as one or more networked classroom cameras, posting
+JPEG frames to live sessions created with `POST /api/live-sessions`
+(see frame_ingest.py). Use it to check how many classrooms one
+recognition server can serve: it reports the send rate, request latency
+and how many frames the server had to drop from each session's queue.
+
+Usage:
+    # One camera, 10 fps, frames sent one per request
+    python -m benchmarks.camera_replay_client --video class.mp4 \\
+        --session http://server:5000/api/live-sessions/<id>/frames <token>
+
+    # Three classrooms, batches of 5 frames, for 2 minutes
+    python -m benchmarks.camera_replay_client --video class.mp4 --fps 15 --batch 5 --duration 120 \\
+        --session URL1 TOKEN1 --session URL2 TOKEN2 --session URL3 TOKEN3 --json replay.json
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import json  # Server replies and machine-readable results
+import threading  # One sender per simulated camera
+import time  # Pacing and latency
+import uuid  # Multipart boundaries
+import urllib.request  # HTTP client (standard library only)
+import urllib.error  # HTTP errors
+
+import cv2  # Video decoding and JPEG encoding
+import numpy as np  # Latency percentiles
+
+
+def load_jpegs(video_path, width, quality, max_frames):
+    """Decodes the video once and keeps the frames as JPEG bytes, so encoding cost is not measured."""
+    cap = cv2.VideoCapture(video_path)
+    frames = []
+    while len(frames) < max_frames:
+        ret, frame = cap.read()
+        if not ret:
+            break
+        if width and frame.shape[1] != width:
+            height = int(frame.shape[0] * width / frame.shape[1])
+            frame = cv2.resize(frame, (width, height))
+        ok, jpeg = cv2.imencode(".jpg", frame, [cv2.IMWRITE_JPEG_QUALITY, quality])
+        if ok:
+            frames.append(jpeg.tobytes())
+    cap.release()
+    return frames
+
+
+def build_request(url, token, jpegs, timestamps):
+    """A single-frame (image/jpeg) or batched (multipart) frame upload."""
+    headers = {"Authorization": f"Bearer {token}"}
+    if len(jpegs) == 1:
+        headers["Content-Type"] = "image/jpeg"
+        headers["X-Captured-At"] = f"{timestamps[0]:.3f}"
+        return urllib.request.Request(url, data=jpegs[0], method="POST", headers=headers)
+
+    boundary = uuid.uuid4().hex
+    parts = []
+    for i, (jpeg, captured_at) in enumerate(zip(jpegs, timestamps)):
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"frames\"; filename=\"{i}.jpg\"\r\n"
+            f"Content-Type: image/jpeg\r\n\r\n".encode() + jpeg + b"\r\n"
+        )
+        parts.append(
+            f"--{boundary}\r\nContent-Disposition: form-data; name=\"captured_at\"\r\n\r\n{captured_at:.3f}\r\n".encode()
+        )
+    parts.append(f"--{boundary}--\r\n".encode())
+    headers["Content-Type"] = f"multipart/form-data; boundary={boundary}"
+    return urllib.request.Request(url, data=b"".join(parts), method="POST", headers=headers)
+
+
+def replay_camera(url, token, jpegs, fps, batch, duration, result):
+    """Sends frames at `fps` (in batches of `batch`) until `duration` seconds have passed."""
+    latencies = []
+    sent = accepted = errors = 0
+    last_reply = {}
+
+    start = time.perf_counter()
+    index = 0
+    while time.perf_counter() - start < duration:
+        # Pace by batch: a batch of N frames covers N / fps seconds of video
+        batch_due = start + sent / fps
+        delay = batch_due - time.perf_counter()
+        if delay > 0:
+            time.sleep(delay)
+
+        chunk = [jpegs[(index + i) % len(jpegs)] for i in range(batch)]
+        now = time.time()
+        timestamps = [now - (batch - 1 - i) / fps for i in range(batch)]
+        index += batch
+
+        request_start = time.perf_counter()
+        try:
+            with urllib.request.urlopen(build_request(url, token, chunk, timestamps), timeout=10) as response:
+                last_reply = json.loads(response.read().decode("utf-8"))
+            accepted += last_reply.get("accepted", 0)
+        except (urllib.error.URLError, OSError) as e:
+            errors += 1
+            if isinstance(e, urllib.error.HTTPError) and e.code == 404:
+                print(f"🛑 Session closed by the server: {url}")
+                break
+        latencies.append((time.perf_counter() - request_start) * 1000)
+        sent += batch
+
+    elapsed = time.perf_counter() - start
+    values = np.array(latencies) if latencies else np.zeros(1)
+    result.update({
+        "url": url,
+        "frames_sent": sent,
+        "frames_accepted": accepted,
+        "request_errors": errors,
+        "send_fps": round(sent / elapsed, 2) if elapsed else 0,
+        "request_p50_ms": round(float(np.percentile(values, 50)), 1),
+        "request_p95_ms": round(float(np.percentile(values, 95)), 1),
+        "server_frames_dropped": last_reply.get("frames_dropped"),
+        "server_queue_depth": last_reply.get("queue_depth"),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a video file as networked classroom cameras.")
+    parser.add_argument("--video", required=True, help="Video file to replay (looped)")
+    parser.add_argument("--session", nargs=2, action="append", metavar=("FRAMES_URL", "TOKEN"), required=True,
+                        help="Frames URL and camera token of a live session (repeat for more cameras)")
+    parser.add_argument("--fps", type=float, default=10.0, help="Frames per second per camera")
+    parser.add_argument("--batch", type=int, default=1, help="Frames per request")
+    parser.add_argument("--duration", type=float, default=60.0, help="Seconds to run")
+    parser.add_argument("--width", type=int, default=1280, help="Resize frames to this width (0 = keep)")
+    parser.add_argument("--quality", type=int, default=80, help="JPEG quality")
+    parser.add_argument("--max-frames", type=int, default=600, help="Frames of the video kept in memory")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    jpegs = load_jpegs(args.video, args.width, args.quality, args.max_frames)
+    if not jpegs:
+        print(f"❌ Could not read frames from {args.video}")
+        return
+    print(f"🎞️ Loaded {len(jpegs)} frames ({sum(map(len, jpegs)) / len(jpegs) / 1024:.0f} KB/frame avg)")
+
+    results = [{} for _ in args.session]
+    threads = [
+        threading.Thread(target=replay_camera, args=(url, token, jpegs, args.fps, args.batch, args.duration, result))
+        for (url, token), result in zip(args.session, results)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    for result in results:
+        print(f"📡 {result['url']}: sent {result['frames_sent']} @ {result['send_fps']} fps, "
+              f"accepted {result['frames_accepted']}, server dropped {result['server_frames_dropped']}, "
+              f"request p50 {result['request_p50_ms']} ms / p95 {result['request_p95_ms']} ms, "
+              f"errors {result['request_errors']}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"fps": args.fps, "batch": args.batch, "cameras": results}, f, indent=4)
+        print(f"✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
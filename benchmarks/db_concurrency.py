@@ -0,0 +1,231 @@
+"""
+db_concurrency.py
+SQLite Reader / Writer Concurrency Benchmark
+
+Purpose:
+During a live session the recognition thread writes attendance several
+times per second while dashboards and chatbot agents read the same file.
+This benchmark replays that mix against two connection profiles and shows
+what the shared connection settings (data_access.CONNECTION_PRAGMAS: WAL,
+synchronous=NORMAL, busy timeout, mmap, cache) change:
+
+- "default" → what every connection used to get: rollback journal,
+  synchronous=FULL, 5 s timeout, default cache, no mmap
+- "tuned" → the pragmas every pooled connection gets now
+
+Workload per profile, on a fresh database seeded with `--days` of history:
+- `--writers` threads upserting 5 recognized students per transaction
+  (like `mark_attendance_in_db()`)
+- `--readers` threads running the attendance dashboard query (join +
+  absence counts, like `retrieve_attendance()`)
+
+It reports operations/s, latency percentiles and "database is locked"
+errors for readers and writers.
+
+Usage:
+    python -m benchmarks.db_concurrency --readers 8 --writers 2 --duration 10 --json concurrency.json
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import json  # Machine-readable results
+import os  # Database paths
+import random  # Workload choices
+import sqlite3  # Database under test
+import tempfile  # Scratch databases
+import threading  # Concurrent readers and writers
+import time  # Timing
+from datetime import date, timedelta  # Seed history
+
+import numpy as np  # Percentiles
+
+from data_access import CONNECTION_PRAGMAS
+
+PROFILES = {
+    "default": {"timeout": 5.0, "pragmas": ()},
+    "tuned": {"timeout": 30.0, "pragmas": CONNECTION_PRAGMAS},
+}
+
+READ_QUERY = """
+    SELECT a.enrollment, sc.student_name, a.status, COALESCE(a.time_recognized, 'N/A'), sc.class_name,
+           (SELECT COUNT(*) FROM attendance
+            WHERE class_id = ? AND enrollment = a.enrollment AND status = 'Absent')
+    FROM attendance a
+    INNER JOIN student_classes sc ON a.enrollment = sc.enrollment AND sc.class_id = a.class_id
+    WHERE a.class_id = ? AND a.date = ?
+    ORDER BY a.time_recognized DESC
+"""
+
+WRITE_QUERY = """
+    INSERT INTO attendance (class_id, enrollment, date, status, time_recognized, professor_id, absences)
+    VALUES (?, ?, ?, 'Present', ?, 1, 0)
+    ON CONFLICT(class_id, enrollment, date)
+    DO UPDATE SET status = 'Present', time_recognized = excluded.time_recognized
+"""
+
+
+def open_connection(path, profile):
+    conn = sqlite3.connect(path, timeout=profile["timeout"], check_same_thread=False)
+    for name, value in profile["pragmas"]:
+        conn.execute(f"PRAGMA {name} = {value}")
+    return conn
+
+
+def seed_database(path, classes, students_per_class, days):
+    """Schema the attendance code expects, plus `days` of attendance history."""
+    conn = sqlite3.connect(path)
+    conn.executescript("""
+        CREATE TABLE student_classes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            enrollment TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            student_name TEXT,
+            class_name TEXT
+        );
+        CREATE TABLE attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            enrollment TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            status TEXT NOT NULL,
+            time_recognized TEXT,
+            professor_id INTEGER NOT NULL,
+            absences INTEGER DEFAULT 0,
+            UNIQUE (class_id, enrollment, date)
+        );
+    """)
+    rng = random.Random(0)
+    roster = [(f"S{c:02d}{s:04d}", c) for c in range(1, classes + 1) for s in range(students_per_class)]
+    conn.executemany("INSERT INTO student_classes (enrollment, class_id, student_name, class_name) VALUES (?, ?, ?, ?)",
+                     [(e, c, f"Student {e}", f"Class {c}") for e, c in roster])
+    start = date.today() - timedelta(days=days)
+    rows = []
+    for d in range(days):
+        day = (start + timedelta(days=d)).isoformat()
+        for enrollment, class_id in roster:
+            present = rng.random() < 0.85
+            rows.append((class_id, enrollment, day, "Present" if present else "Absent",
+                         f"{day} 09:{rng.randint(0, 59):02d}:00" if present else None, 1, 0 if present else 1))
+    conn.executemany("""
+        INSERT INTO attendance (class_id, enrollment, date, status, time_recognized, professor_id, absences)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """, rows)
+    conn.commit()
+    conn.close()
+    return roster
+
+
+def run_worker(kind, path, profile, roster, classes, days, stop, result):
+    """One reader or writer thread; records per-operation latency and lock errors."""
+    conn = open_connection(path, profile)
+    rng = random.Random(threading.get_ident())
+    latencies = []
+    locked = 0
+    today = date.today().isoformat()
+    by_class = {}
+    for enrollment, class_id in roster:
+        by_class.setdefault(class_id, []).append(enrollment)
+
+    while not stop.is_set():
+        start = time.perf_counter()
+        try:
+            if kind == "writer":
+                class_id = rng.randint(1, classes)
+                students = rng.sample(by_class[class_id], 5)  # Recognized in this frame
+                now = time.strftime("%Y-%m-%d %H:%M:%S")
+                conn.executemany(WRITE_QUERY, [(class_id, e, today, now) for e in students])
+                conn.commit()
+            else:
+                class_id = rng.randint(1, classes)
+                day = (date.today() - timedelta(days=rng.randint(0, days))).isoformat()
+                conn.execute(READ_QUERY, (class_id, class_id, day)).fetchall()
+        except sqlite3.OperationalError as e:
+            if "locked" not in str(e):
+                raise
+            locked += 1
+            conn.rollback()
+            continue
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    conn.close()
+    result.append((latencies, locked))
+
+
+def summarize(results, duration):
+    latencies = [l for worker_latencies, _ in results for l in worker_latencies]
+    values = np.array(latencies) if latencies else np.zeros(1)
+    return {
+        "ops": len(latencies),
+        "ops_per_sec": round(len(latencies) / duration, 1),
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+        "locked_errors": sum(locked for _, locked in results),
+    }
+
+
+def benchmark_profile(name, args, scratch):
+    path = os.path.join(scratch, f"{name}.db")
+    roster = seed_database(path, args.classes, args.students, args.days)
+
+    # Journal mode is a property of the file: set it once before the workload starts
+    open_connection(path, PROFILES[name]).close()
+
+    stop = threading.Event()
+    reader_results, writer_results = [], []
+    threads = [
+        threading.Thread(target=run_worker, args=("reader", path, PROFILES[name], roster, args.classes,
+                                                  args.days, stop, reader_results))
+        for _ in range(args.readers)
+    ] + [
+        threading.Thread(target=run_worker, args=("writer", path, PROFILES[name], roster, args.classes,
+                                                  args.days, stop, writer_results))
+        for _ in range(args.writers)
+    ]
+    for thread in threads:
+        thread.start()
+    time.sleep(args.duration)
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    return {
+        "profile": name,
+        "readers": summarize(reader_results, args.duration),
+        "writers": summarize(writer_results, args.duration),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite reader/writer concurrency: default vs tuned pragmas.")
+    parser.add_argument("--readers", type=int, default=8, help="Dashboard reader threads")
+    parser.add_argument("--writers", type=int, default=2, help="Attendance writer threads")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds per profile")
+    parser.add_argument("--classes", type=int, default=20)
+    parser.add_argument("--students", type=int, default=40, help="Students per class")
+    parser.add_argument("--days", type=int, default=60, help="Days of seeded attendance history")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="db-concurrency-") as scratch:
+        for name in PROFILES:
+            print(f"⏱️ Running '{name}' profile for {args.duration:.0f}s "
+                  f"({args.readers} readers, {args.writers} writers)...")
+            results.append(benchmark_profile(name, args, scratch))
+
+    print(f"\n{'profile':<10}{'role':<9}{'ops/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'locked':>8}")
+    for r in results:
+        for role in ("readers", "writers"):
+            s = r[role]
+            print(f"{r['profile']:<10}{role:<9}{s['ops_per_sec']:>9.1f}{s['p50_ms']:>9.2f}"
+                  f"{s['p95_ms']:>9.2f}{s['p99_ms']:>9.2f}{s['locked_errors']:>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parameters": vars(args), "results": results}, f, indent=4)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,164 @@
+"""
+detector_benchmark.py
+Face Detector Latency & Recall Benchmark
+
+Purpose:
+Compares the detector backends from `face_detectors.py` on a folder of
+images so each deployment can pick the fastest backend that still finds
+enough faces.
+
+For every backend it reports:
+- Mean / p50 / p95 detection latency per image (milliseconds)
+- Recall: the fraction of reference faces that were found (IoU >= 0.5)
+
+With --tile-size every backend is also run through a TiledDetector (tiles
+detected in parallel by --tile-workers threads), and the measured speedup of
+tiled over whole-frame detection is reported next to its recall.
+
+Reference faces come from an annotations JSON file
+(`{"image.jpg": [[top, right, bottom, left], ...]}`) when one is given,
+otherwise from the output of a reference backend (dlib CNN by default).
+
+Usage:
+    python -m benchmarks.detector_benchmark path/to/images \\
+        --backends hog,cnn,haar,haar+hog --annotations boxes.json --json results.json
+    python -m benchmarks.detector_benchmark path/to/4k_images --backends hog --tile-size 1024 --tile-workers 4
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import glob  # Find the benchmark images
+import json  # Read annotations / write machine-readable results
+import os  # File path handling
+import time  # High resolution timers
+
+import cv2  # Image loading
+import numpy as np  # Latency percentiles
+
+from face_detectors import create_detector, box_iou, TiledDetector
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def load_images(image_dir):
+    """Loads every image in `image_dir` as an RGB array, keyed by file name."""
+    images = {}
+    for pattern in IMAGE_PATTERNS:
+        for path in sorted(glob.glob(os.path.join(image_dir, pattern))):
+            img = cv2.imread(path)
+            if img is not None:
+                images[os.path.basename(path)] = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+    return images
+
+
+def count_matches(reference_boxes, detected_boxes, iou_threshold=0.5):
+    """Counts reference faces that have a detected box overlapping them by at least `iou_threshold`."""
+    return sum(
+        1 for ref in reference_boxes
+        if any(box_iou(ref, det) >= iou_threshold for det in detected_boxes)
+    )
+
+
+def benchmark_detector(detector, images, reference):
+    """
+    Runs one detector over every image.
+
+    Returns:
+        dict with latency statistics (ms), recall and the number of faces found.
+    """
+    latencies = []
+    found = 0
+    total_reference = 0
+    total_detected = 0
+
+    for name, rgb_img in images.items():
+        start = time.perf_counter()
+        boxes = detector.detect(rgb_img)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+        total_detected += len(boxes)
+        total_reference += len(reference.get(name, []))
+        found += count_matches(reference.get(name, []), boxes)
+
+    return {
+        "backend": detector.name,
+        "images": len(images),
+        "mean_ms": float(np.mean(latencies)) if latencies else 0.0,
+        "p50_ms": float(np.percentile(latencies, 50)) if latencies else 0.0,
+        "p95_ms": float(np.percentile(latencies, 95)) if latencies else 0.0,
+        "recall": found / total_reference if total_reference else None,
+        "faces_detected": total_detected,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark face detector backends.")
+    parser.add_argument("image_dir", help="Folder of benchmark images")
+    parser.add_argument("--backends", default="hog,cnn,haar,dnn,haar+hog,haar+cnn",
+                        help="Comma separated backend names")
+    parser.add_argument("--annotations", help="JSON file with ground-truth boxes per image")
+    parser.add_argument("--reference", default="cnn",
+                        help="Backend used as ground truth when no annotations are given")
+    parser.add_argument("--tile-size", type=int, default=0,
+                        help="Also run every backend tiled with this tile edge in pixels (0 = off)")
+    parser.add_argument("--tile-overlap", type=int, default=160, help="Overlap between tiles in pixels")
+    parser.add_argument("--tile-workers", type=int, default=os.cpu_count() or 1, help="Parallel tile workers")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    images = load_images(args.image_dir)
+    if not images:
+        print(f"❌ No images found in {args.image_dir}")
+        return
+
+    print(f"📷 Loaded {len(images)} images from {args.image_dir}")
+
+    # Ground truth: annotation file or the reference backend's output
+    if args.annotations:
+        with open(args.annotations, "r") as f:
+            reference = {name: [tuple(b) for b in boxes] for name, boxes in json.load(f).items()}
+    else:
+        print(f"⚠️ No annotations given, using '{args.reference}' detections as ground truth.")
+        reference_detector = create_detector(args.reference)
+        reference = {name: reference_detector.detect(img) for name, img in images.items()}
+
+    results = []
+    for backend in args.backends.split(","):
+        try:
+            detector = create_detector(backend)
+        except (RuntimeError, ValueError) as e:
+            print(f"⚠️ Skipping '{backend}': {e}")
+            continue
+        whole = benchmark_detector(detector, images, reference)
+        results.append(whole)
+
+        if args.tile_size > 0:
+            tiled_detector = TiledDetector(backend, tile_size=args.tile_size, overlap=args.tile_overlap,
+                                           workers=args.tile_workers)
+            tiled = benchmark_detector(tiled_detector, images, reference)
+            tiled_detector.close()
+            # > 1 means tiling was faster than detecting on the whole frame
+            tiled["speedup"] = whole["mean_ms"] / tiled["mean_ms"] if tiled["mean_ms"] else None
+            results.append(tiled)
+
+    # Human readable summary
+    print(f"\n{'backend':<18}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'recall':>10}{'faces':>8}")
+    for r in results:
+        recall = f"{r['recall']:.3f}" if r["recall"] is not None else "n/a"
+        print(f"{r['backend']:<18}{r['mean_ms']:>10.1f}{r['p50_ms']:>10.1f}{r['p95_ms']:>10.1f}{recall:>10}{r['faces_detected']:>8}")
+
+    tiled_results = [r for r in results if r.get("speedup") is not None]
+    if tiled_results:
+        print(f"\nTiled ({args.tile_size}px tiles, {args.tile_overlap}px overlap, {args.tile_workers} workers) "
+              f"vs whole frame (mean latency ratio, > 1 = tiling is faster):")
+        for r in tiled_results:
+            print(f"{r['backend']:<18}{r['speedup']:>10.2f}×")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump(results, f, indent=4)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
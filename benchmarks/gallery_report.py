@@ -0,0 +1,125 @@
+"""
+gallery_report.py
+Gallery Memory & Accuracy Report
+
+Purpose:
+Shows what each gallery storage mode (float32, float16, int8) costs in
+memory per worker process and whether it changes any match decisions
+compared with exact float32 matching.
+
+The gallery is either the real `face_recognition_model.json` or a
+synthetic one (random student centres with per-sample noise, which is how
+dlib encodings of the same person cluster). Queries are noisy copies of
+known students plus impostors that are not in the gallery.
+
+Usage:
+    python -m benchmarks.gallery_report --students 2000 --samples 20 --queries 500
+    python -m benchmarks.gallery_report --model face_recognition_model.json --json gallery.json
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import json  # Machine-readable results
+import time  # Query latency
+
+import numpy as np  # Synthetic data and statistics
+
+from face_gallery import FaceGallery, GALLERY_MODES, memory_report
+
+
+def synthetic_model(students, samples, seed=0):
+    """Random gallery shaped like face_recognition_model.json."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 0.09, (students, 128)).astype(np.float32)
+    encodings = [
+        (centre + rng.normal(0, 0.02, (samples, 128))).astype(np.float32).tolist()
+        for centre in centres
+    ]
+    return {"encodings": encodings, "enrollments": [f"S{i:06d}" for i in range(students)]}, centres
+
+
+def build_queries(gallery, count, seed=1):
+    """Genuine queries (noisy known samples, with their enrollment) and impostor queries."""
+    rng = np.random.default_rng(seed)
+    exact = FaceGallery(gallery.vectors, gallery.labels, gallery.enrollments, mode="float32")
+
+    picks = rng.integers(0, len(exact.vectors), count)
+    genuine = exact.vectors[picks] + rng.normal(0, 0.02, (count, 128)).astype(np.float32)
+    expected = [exact.enrollments[exact.labels[i]] for i in picks]
+    impostors = rng.normal(0, 0.09, (count, 128)).astype(np.float32)
+    return genuine, expected, impostors
+
+
+def evaluate(gallery, genuine, expected, impostors, tolerance, baseline=None):
+    """Accuracy, false accepts, latency and agreement with the float32 baseline."""
+    decisions = []
+    start = time.perf_counter()
+    for query in genuine:
+        decisions.append(gallery.match(query, tolerance)[0])
+    for query in impostors:
+        decisions.append(gallery.match(query, tolerance)[0])
+    elapsed = time.perf_counter() - start
+
+    genuine_decisions = decisions[:len(genuine)]
+    impostor_decisions = decisions[len(genuine):]
+    result = {
+        "mode": gallery.mode,
+        "samples": len(gallery),
+        "memory_mb": round(gallery.nbytes / (1024 * 1024), 2),
+        "bytes_per_sample": round(gallery.nbytes / len(gallery), 1),
+        "top1_accuracy": round(float(np.mean([d == e for d, e in zip(genuine_decisions, expected)])), 4),
+        "false_accept_rate": round(float(np.mean([d is not None for d in impostor_decisions])), 4),
+        "ms_per_query": round(elapsed * 1000 / len(decisions), 3),
+    }
+    if baseline is not None:
+        result["decisions_changed_vs_float32"] = int(sum(a != b for a, b in zip(decisions, baseline)))
+    return result, decisions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Gallery memory / accuracy report per storage mode.")
+    parser.add_argument("--model", help="JSON face model (default: synthetic gallery)")
+    parser.add_argument("--students", type=int, default=2000)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--queries", type=int, default=300)
+    parser.add_argument("--tolerance", type=float, default=0.4)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    if args.model:
+        with open(args.model, "r") as f:
+            model_data = json.load(f)
+    else:
+        model_data, _ = synthetic_model(args.students, args.samples)
+
+    baseline_gallery = FaceGallery.from_model_data(model_data, mode="float32")
+    genuine, expected, impostors = build_queries(baseline_gallery, args.queries)
+
+    results = []
+    baseline = None
+    for mode in GALLERY_MODES:
+        gallery = baseline_gallery if mode == "float32" else FaceGallery.from_model_data(model_data, mode=mode)
+        print(f"🧠 {memory_report(gallery)}")
+        result, decisions = evaluate(gallery, genuine, expected, impostors, args.tolerance, baseline)
+        if mode == "float32":
+            baseline = decisions
+        results.append(result)
+
+    # The old float64 representation, for comparison
+    float64_mb = len(baseline_gallery) * 128 * 8 / (1024 * 1024)
+    print(f"\n📦 float64 (previous format) would use {float64_mb:.1f} MB per worker\n")
+
+    print(f"{'mode':<9}{'MB/worker':>11}{'B/sample':>10}{'top-1':>8}{'FAR':>8}{'ms/query':>10}{'changed':>9}")
+    for r in results:
+        changed = r.get("decisions_changed_vs_float32", 0)
+        print(f"{r['mode']:<9}{r['memory_mb']:>11.2f}{r['bytes_per_sample']:>10.1f}"
+              f"{r['top1_accuracy']:>8.3f}{r['false_accept_rate']:>8.3f}{r['ms_per_query']:>10.3f}{changed:>9}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"float64_mb": float64_mb, "results": results}, f, indent=4)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,165 @@
+"""
+group_commit.py
+Attendance Write Throughput: Per-Write Commits vs. the Group-Commit Writer
+
+Purpose:
+Replays many classrooms marking attendance at the same time against a
+fresh database (built with migrations.py) in two ways:
+
+- "direct" → every write commits its own transaction, as the live loop and
+  the socket handlers used to
+- "writer" → every write goes through attendance_writer (one writer thread,
+  group commit); latency is measured until the write's group has committed
+
+and reports writes/s, commit-latency percentiles and, for the writer, the
+average group size. Run it with `--synchronous FULL` to see the effect when
+every commit is fsynced.
+
+Usage:
+    python -m benchmarks.group_commit --classrooms 20 --writes 200 --synchronous FULL --json group_commit.json
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import json  # Machine-readable results
+import multiprocessing  # One fresh process per mode
+import os  # Scratch database path
+import shutil  # Remove the scratch database
+import tempfile  # Scratch directory
+import threading  # Concurrent classrooms
+import time  # Timing
+from datetime import date  # Attendance day
+
+import numpy as np  # Percentiles
+
+
+def seed(connect_db, classrooms, students):
+    with connect_db() as conn:
+        conn.executemany("INSERT INTO classrooms (id, class_name, professor_id) VALUES (?, ?, 1)",
+                         [(c, f"Class {c}") for c in range(1, classrooms + 1)])
+        enrollments = [(f"S{c:03d}{s:04d}", c) for c in range(1, classrooms + 1) for s in range(students)]
+        conn.executemany("INSERT INTO students (enrollment, name, email, password) VALUES (?1, ?1, ?1, '')",
+                         [(e,) for e, _ in enrollments])
+        conn.executemany("INSERT INTO student_classes (enrollment, class_id) VALUES (?, ?)", enrollments)
+
+
+def classroom(mode, class_id, args, latencies, errors):
+    """One classroom: `--writes` recognitions of random enrolled students, `--interval-ms` apart."""
+    from data_access import connect_db
+    from attendance_writer import submit_attendance, MARK_PRESENT
+
+    rng = np.random.default_rng(class_id)
+    today = date.today().isoformat()
+    pending = []
+
+    def committed(future, start):
+        # Runs on the writer thread as soon as the write's group has committed
+        if future.exception() is None:
+            latencies.append((time.perf_counter() - start) * 1000)
+        else:
+            errors.append(class_id)
+
+    for _ in range(args.writes):
+        enrollment = f"S{class_id:03d}{int(rng.integers(args.students)):04d}"
+        params = (class_id, enrollment, today, time.strftime("%Y-%m-%d %H:%M:%S"), 1)
+        start = time.perf_counter()
+        try:
+            if mode == "direct":
+                with connect_db() as conn:
+                    conn.execute(MARK_PRESENT, params)
+                latencies.append((time.perf_counter() - start) * 1000)
+            else:
+                future = submit_attendance(MARK_PRESENT, params)
+                future.add_done_callback(lambda f, start=start: committed(f, start))
+                pending.append(future)
+        except Exception:
+            errors.append(class_id)
+        if args.interval_ms:
+            time.sleep(args.interval_ms / 1000.0)
+
+    for future in pending:
+        future.exception()  # Wait for the commit (outcome recorded by the callback)
+
+
+def run_mode(mode, args, results):
+    """Runs one mode in a fresh database (in its own process: configuration is read at import)."""
+    scratch = tempfile.mkdtemp(prefix="group-commit-")
+    os.environ["DATABASE_PATH"] = os.path.join(scratch, "attendance.db")
+    os.environ["ATTENDANCE_SYNCHRONOUS"] = args.synchronous
+
+    import data_access
+    import migrations
+    import attendance_writer
+
+    # Per-write commits get the same synchronous setting as the writer
+    data_access.CONNECTION_PRAGMAS = tuple(
+        (name, args.synchronous if name == "synchronous" else value) for name, value in data_access.CONNECTION_PRAGMAS
+    )
+    migrations.migrate()
+    seed(data_access.connect_db, args.classrooms, args.students)
+
+    latencies, errors = [], []
+    threads = [threading.Thread(target=classroom, args=(mode, c, args, latencies, errors))
+               for c in range(1, args.classrooms + 1)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    stats = attendance_writer.get_attendance_writer().stats() if mode == "writer" else None
+    if mode == "writer":
+        attendance_writer.get_attendance_writer().stop()
+    data_access.get_pool().close_all()
+    shutil.rmtree(scratch, ignore_errors=True)
+
+    values = np.array(latencies) if latencies else np.zeros(1)
+    result = {
+        "mode": mode,
+        "writes": len(latencies),
+        "errors": len(errors),
+        "writes_per_sec": round(len(latencies) / elapsed, 1),  # Committed writes per second
+        "p50_ms": round(float(np.percentile(values, 50)), 2),
+        "p95_ms": round(float(np.percentile(values, 95)), 2),
+        "p99_ms": round(float(np.percentile(values, 99)), 2),
+    }
+    if stats:
+        result["average_group"] = stats["average_group"]
+        result["groups"] = stats["groups"]
+    results.put(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Per-write commits vs. the group-commit attendance writer.")
+    parser.add_argument("--classrooms", type=int, default=20, help="Concurrent classrooms (threads)")
+    parser.add_argument("--students", type=int, default=40, help="Students per classroom")
+    parser.add_argument("--writes", type=int, default=200, help="Attendance writes per classroom")
+    parser.add_argument("--interval-ms", type=float, default=0.0, help="Pause between a classroom's writes")
+    parser.add_argument("--synchronous", default="NORMAL", choices=("NORMAL", "FULL"))
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    results = []
+    context = multiprocessing.get_context("spawn")
+    for mode in ("direct", "writer"):
+        print(f"⏱️ {mode}: {args.classrooms} classrooms × {args.writes} writes (synchronous={args.synchronous})...")
+        queue = context.Queue()
+        process = context.Process(target=run_mode, args=(mode, args, queue))
+        process.start()
+        results.append(queue.get())
+        process.join()
+
+    print(f"\n{'mode':<8}{'writes/s':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}{'group':>8}")
+    for r in results:
+        print(f"{r['mode']:<8}{r['writes_per_sec']:>10.1f}{r['p50_ms']:>9.2f}{r['p95_ms']:>9.2f}"
+              f"{r['p99_ms']:>9.2f}{r['errors']:>8}{r.get('average_group', '-'):>8}")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"parameters": vars(args), "results": results}, f, indent=4)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,334 @@
+"""
+query_plans.py
+Index Check for the Hot Attendance, Roster and Message Queries
+
+Purpose:
+The queries that run on every live frame, every dashboard refresh and
+every chatbot question must be answered from an index, not by scanning
+the attendance, student_classes or messages tables. This check builds a
+fresh database with the schema migrations (migrations.py), fills it with some
+rows, runs `EXPLAIN QUERY PLAN` on each hot query (copied from the code
+that issues it) and verifies that SQLite picks the expected index.
+
+It also checks that the UNIQUE(class_id, student_id, date) index exists,
+since the attendance writer upserts with ON CONFLICT on those columns,
+that the trigger-maintained attendance_counters still agree with
+COUNT(*) over attendance after inserts, updates and deletes, and that the
+absences derived by the attendance_summary view (sessions held minus
+sessions attended) match a count over class_sessions × roster, and that
+enrolling or unenrolling a student logs a class-scoped gallery change
+(edge nodes receive class-filtered gallery deltas from that log).
+
+Exits with status 1 if any query scans a table or uses another index, so
+it can run in CI after schema changes.
+
+Usage:
+    python -m benchmarks.query_plans
+    python -m benchmarks.query_plans --verbose   # print every plan
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import atexit  # Remove the scratch database
+import os  # Scratch database path
+import shutil  # Remove the scratch database
+import sys  # Exit status
+import tempfile  # Scratch directory
+
+# data_access reads DATABASE_PATH at import: point it at a scratch file first
+SCRATCH_DIR = tempfile.mkdtemp(prefix="query-plans-")
+atexit.register(shutil.rmtree, SCRATCH_DIR, ignore_errors=True)
+os.environ["DATABASE_PATH"] = os.path.join(SCRATCH_DIR, "plans.db")
+
+from data_access import connect_db  # noqa: E402
+from migrations import migrate  # noqa: E402
+from attendance_writer import MARK_PRESENT  # noqa: E402
+
+# name → (query, parameters, index every SEARCH on the checked table must use, checked table)
+HOT_QUERIES = {
+    "live session: today's attendance (recognize_student_face)": (
+        "SELECT enrollment, status, time_recognized FROM attendance WHERE class_id = ? AND date = ?",
+        (1, "2024-01-01"), "idx_attendance_marks_class_date", "attendance_marks a",
+    ),
+    "retrieve_attendance: class on a date": (
+        """
+        SELECT a.enrollment, s.name, a.status, COALESCE(a.time_recognized, 'N/A'), c.class_name,
+               COALESCE((SELECT ac.absent FROM attendance_summary ac
+                         WHERE ac.student_id = a.student_id AND ac.class_id = a.class_id), 0)
+        FROM session_attendance a
+        INNER JOIN students s ON s.id = a.student_id
+        INNER JOIN classrooms c ON c.id = a.class_id
+        WHERE a.class_id = ? AND a.date = ?
+        ORDER BY a.time_recognized DESC
+        """,
+        (1, "2024-01-01"), None, None,  # Checked per table below
+    ),
+    "absence count of a student (retrieval agent)": (
+        "SELECT COALESCE(SUM(absent), 0) FROM attendance_summary WHERE enrollment = ?",
+        ("S0001",), None, None,
+    ),
+    "absence count of a student in one class (alert agent)": (
+        """
+        SELECT COALESCE((SELECT absent FROM attendance_summary
+                         WHERE enrollment = ? AND class_id = (SELECT id FROM classrooms WHERE class_name = ?)), 0)
+        """,
+        ("S0001", "Class 1"), None, None,
+    ),
+    "attendance of a student in one class (insights agent)": (
+        "SELECT present, absent FROM attendance_summary WHERE enrollment = ? AND class_id = ?",
+        ("S0001", 1), None, None,
+    ),
+    "attendance summary per class (query agent)": (
+        """
+        SELECT c.class_name, ac.absent, ac.present, ac.sessions
+        FROM attendance_summary ac
+        JOIN classrooms c ON c.id = ac.class_id
+        WHERE ac.enrollment = ? AND ac.absent > 0
+        """,
+        ("S0001",), None, None,
+    ),
+    "roster with absences (send_frame_to_frontend)": (
+        """
+        SELECT s.enrollment, s.name,
+               (SELECT COALESCE(SUM(absent), 0) FROM attendance_summary WHERE student_id = e.student_id)
+        FROM class_enrollments e
+        JOIN students s ON s.id = e.student_id
+        WHERE e.class_id = ?
+        """,
+        (1,), None, None,
+    ),
+    "weekly report (session_attendance)": (
+        """
+        SELECT s.name, a.enrollment, a.date, a.status
+        FROM session_attendance a
+        JOIN students s ON s.enrollment = a.enrollment
+        WHERE a.class_id = ? AND a.date BETWEEN ? AND ?
+        ORDER BY a.date DESC, s.name
+        """,
+        (1, "2024-01-01", "2024-01-07"), None, None,
+    ),
+    "sessions of a student in one class (prediction agent)": (
+        "SELECT date, status FROM session_attendance WHERE enrollment = ? AND class_id = ? ORDER BY date ASC",
+        ("S0001", 1), None, None,
+    ),
+    "class roster": (
+        "SELECT enrollment FROM student_classes WHERE class_id = ?",
+        (1,), "idx_class_enrollments_class_student", "class_enrollments e",
+    ),
+    "professor inbox": (
+        """
+        SELECT messages.id, students.name, classrooms.class_name, messages.message, messages.timestamp
+        FROM student_messages AS messages
+        JOIN students ON messages.student_id = students.id
+        JOIN classrooms ON messages.class_id = classrooms.id
+        WHERE messages.professor_id = ?
+          AND (messages.sender_type = 'student' OR messages.sender_type = 'ai_agent')
+          AND messages.recipient_type = 'professor'
+        ORDER BY messages.timestamp DESC
+        """,
+        (1,), "idx_student_messages_professor_recipient", "messages",
+    ),
+}
+
+# Expectations of the attendance_summary view (absences derived from the sessions held):
+# counters by primary key, session counts from the (class_id, date) unique index
+SUMMARY_EXPECTATIONS = {
+    "ac": "PRIMARY KEY",
+    "cs": "sqlite_autoindex_class_sessions_1",
+    "running": "sqlite_autoindex_class_sessions_1",
+}
+
+# Expectations of the session_attendance view (one row per session and enrolled student)
+SESSION_EXPECTATIONS = {
+    "cs": "sqlite_autoindex_class_sessions_1",
+    "a": "idx_attendance_marks_class_",  # Either (class_id, ...) attendance index serves the join
+}
+
+# Per-table expectations for queries touching several tables (aliases inside the views:
+# e = class_enrollments, s = students, a = attendance_marks)
+JOIN_EXPECTATIONS = {
+    "retrieve_attendance: class on a date": {
+        **SESSION_EXPECTATIONS,
+        "e": "idx_class_enrollments_",  # Either roster index serves the join
+        **SUMMARY_EXPECTATIONS,  # Absences in the class
+    },
+    "absence count of a student (retrieval agent)": {
+        "s": "sqlite_autoindex_students_", "e": "idx_class_enrollments_student", **SUMMARY_EXPECTATIONS,
+    },
+    "absence count of a student in one class (alert agent)": {
+        "s": "sqlite_autoindex_students_", "e": "idx_class_enrollments_", **SUMMARY_EXPECTATIONS,
+    },
+    "attendance of a student in one class (insights agent)": {
+        "s": "sqlite_autoindex_students_", "e": "idx_class_enrollments_", **SUMMARY_EXPECTATIONS,
+    },
+    "attendance summary per class (query agent)": {
+        "s": "sqlite_autoindex_students_", "e": "idx_class_enrollments_student", **SUMMARY_EXPECTATIONS,
+    },
+    "roster with absences (send_frame_to_frontend)": {
+        "e": "idx_class_enrollments_class_student", "s": "PRIMARY KEY", **SUMMARY_EXPECTATIONS,
+    },
+    "weekly report (session_attendance)": {
+        "e": "idx_class_enrollments_class_student", **SESSION_EXPECTATIONS,
+    },
+    "sessions of a student in one class (prediction agent)": {
+        "e": "idx_class_enrollments_", **SESSION_EXPECTATIONS,
+    },
+}
+
+
+def seed(conn, classes=5, students=60, days=30):
+    """A few thousand rows so the planner has statistics to work with."""
+    cursor = conn.cursor()
+    cursor.executemany("INSERT INTO students (enrollment, name, email, password) VALUES (?, ?, ?, 'x')",
+                       [(f"S{s:04d}", f"Student {s}", f"s{s}@example.com") for s in range(students)])
+    cursor.executemany("INSERT INTO classrooms (class_name, professor_id) VALUES (?, 1)",
+                       [(f"Class {c}",) for c in range(1, classes + 1)])
+    cursor.executemany("INSERT INTO student_classes (enrollment, class_id, student_name, class_name) VALUES (?, ?, ?, ?)",
+                       [(f"S{s:04d}", c, f"Student {s}", f"Class {c}")
+                        for c in range(1, classes + 1) for s in range(students)])
+    # Only Present is stored; the insert trigger records each day as a class session
+    cursor.executemany("""
+        INSERT INTO attendance (enrollment, class_id, date, status, time_recognized, professor_id)
+        VALUES (?, ?, ?, 'Present', ?, 1)
+    """, [(f"S{s:04d}", c, f"2024-01-{d + 1:02d}", None)
+          for c in range(1, classes + 1) for s in range(students) for d in range(days) if (s + d) % 7])
+    cursor.executemany("""
+        INSERT INTO messages (student_enrollment, professor_id, class_id, message, sender_type, recipient_type)
+        VALUES (?, ?, ?, 'Justification', 'student', ?)
+    """, [(f"S{s % students:04d}", 1 + s % 3, 1 + s % classes, "professor" if s % 2 else "student")
+          for s in range(students * 5)])
+    cursor.execute("ANALYZE")
+    conn.commit()
+
+
+def check_counters(cursor):
+    """
+    Runs the write paths that move counters (upsert, status change, delete — through
+    the attendance view and on attendance_marks) and compares attendance_counters
+    with COUNT(*) over attendance_marks.
+    """
+    cursor.execute(MARK_PRESENT, (1, "S0001", "2024-01-01", "2024-01-01 09:00:00", 1))
+    cursor.execute("UPDATE attendance SET status = 'Absent' WHERE class_id = 2 AND date = '2024-01-02'")
+    cursor.execute("DELETE FROM attendance WHERE class_id = 3 AND date >= '2024-01-25'")
+    cursor.execute("UPDATE attendance_marks SET class_id = 5, date = '2024-02-01' WHERE class_id = 4 AND date = '2024-01-03'")
+    cursor.execute("""
+        SELECT student_id, class_id, SUM(status = 'Present'), SUM(status = 'Absent'), MAX(date)
+        FROM attendance_marks GROUP BY student_id, class_id
+        EXCEPT
+        SELECT student_id, class_id, present, absent, last_date FROM attendance_counters
+    """)
+    mismatches = cursor.fetchall()
+    failures = [f"attendance_counters out of date for {row[0]} in class {row[1]}" for row in mismatches[:5]]
+
+    # A session with nobody present, and a live session still running today (not counted yet)
+    cursor.execute("INSERT INTO class_sessions (class_id, date, started_at, ended_at) VALUES (1, '2024-02-10', 'x', 'y')")
+    cursor.execute("""
+        INSERT INTO class_sessions (class_id, date, started_at, ended_at) VALUES (1, DATE('now', 'localtime'), 'x', NULL)
+    """)
+    cursor.execute("""
+        INSERT INTO attendance (class_id, enrollment, date, status, professor_id)
+        VALUES (1, 'S0002', DATE('now', 'localtime'), 'Present', 1)
+    """)
+    cursor.execute("""
+        SELECT r.enrollment, r.class_id, COUNT(cs.id),
+               COUNT(cs.id) - COALESCE(SUM(a.status = 'Present'), 0)
+        FROM student_classes r
+        JOIN class_sessions cs
+            ON cs.class_id = r.class_id AND (cs.ended_at IS NOT NULL OR cs.date < DATE('now', 'localtime'))
+        LEFT JOIN attendance a ON a.class_id = cs.class_id AND a.enrollment = r.enrollment AND a.date = cs.date
+        GROUP BY r.enrollment, r.class_id
+        EXCEPT
+        SELECT enrollment, class_id, sessions, absent FROM attendance_summary
+    """)
+    mismatches = cursor.fetchall()
+    failures += [f"attendance_summary wrong for {row[0]} in class {row[1]}" for row in mismatches[:5]]
+    return failures
+
+
+def check_gallery_log(cursor):
+    """Enrolling (through the student_classes view or class_enrollments) and unenrolling log gallery changes."""
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM gallery_changes")
+    since = cursor.fetchone()[0]
+    cursor.execute("INSERT INTO student_classes (enrollment, class_id) VALUES ('S0001', 99)")
+    cursor.execute("""
+        INSERT INTO class_enrollments (student_id, class_id)
+        SELECT id, 99 FROM students WHERE enrollment = 'S0002'
+    """)
+    cursor.execute("DELETE FROM student_classes WHERE enrollment = 'S0001' AND class_id = 99")
+    cursor.execute("SELECT enrollment, class_id, op FROM gallery_changes WHERE version > ? ORDER BY version",
+                   (since,))
+    logged = cursor.fetchall()
+    expected = [("S0001", 99, "add"), ("S0002", 99, "add"), ("S0001", 99, "remove")]
+    if logged != expected:
+        return [f"gallery_changes: enrollments logged {logged}, expected {expected}"]
+    return []
+
+
+def plan_of(cursor, query, params):
+    """EXPLAIN QUERY PLAN rows as text lines, e.g. 'SEARCH a USING INDEX idx_... (class_id=? AND date=?)'."""
+    return [row[3] for row in cursor.execute(f"EXPLAIN QUERY PLAN {query}", params)]
+
+
+def check_table(plan, table, index_prefix):
+    """The first line that reads `table` must be a SEARCH with the expected index (or PRIMARY KEY)."""
+    for line in plan:
+        words = line.split()
+        if len(words) < 2 or words[0] not in ("SCAN", "SEARCH"):
+            continue
+        # "SEARCH a USING ..." (aliased) or "SEARCH attendance USING ..."
+        alias = table.split()[-1]
+        if words[1] != alias:
+            continue
+        if words[0] == "SEARCH" and index_prefix in line:
+            return None
+        return f"{table}: expected an index search with {index_prefix}, got '{line}'"
+    return f"{table}: not found in plan"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Verify that the hot queries use their indexes.")
+    parser.add_argument("--verbose", action="store_true", help="Print every query plan")
+    args = parser.parse_args()
+
+    migrate()
+
+    failures = []
+    with connect_db() as conn:
+        seed(conn)
+        cursor = conn.cursor()
+
+        # ON CONFLICT(class_id, student_id, date) needs a unique index on exactly these columns,
+        # and the student_classes view relies on one enrollment per student and class
+        for table, columns in (("attendance_marks", ("class_id", "student_id", "date")),
+                               ("class_enrollments", ("class_id", "student_id"))):
+            unique = [row for row in cursor.execute(f"PRAGMA index_list({table})") if row[2]]
+            unique_columns = [
+                tuple(col[2] for col in conn.execute(f"PRAGMA index_info({row[1]})")) for row in unique
+            ]
+            if columns not in unique_columns:
+                failures.append(f"{table}: no UNIQUE({', '.join(columns)}) index")
+
+        failures.extend(check_counters(cursor))
+        failures.extend(check_gallery_log(cursor))
+        conn.rollback()
+
+        for name, (query, params, index, table) in HOT_QUERIES.items():
+            plan = plan_of(cursor, query, params)
+            if args.verbose:
+                print(f"\n{name}:\n  " + "\n  ".join(plan))
+            expectations = JOIN_EXPECTATIONS.get(name, {table: index})
+            problems = [p for p in (check_table(plan, t, i) for t, i in expectations.items()) if p]
+            status = "✅" if not problems else "❌"
+            print(f"{status} {name}")
+            failures.extend(f"{name} → {p}" for p in problems)
+
+    if failures:
+        print("\n❌ Query plan check failed:")
+        for failure in failures:
+            print(f"   {failure}")
+        sys.exit(1)
+    print("\n✅ All hot queries use their indexes.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,338 @@
+"""
+recognition_benchmark.py
+Recognition Pipeline Benchmark (no camera needed)
+
+Purpose:
+Measures the recognition hot paths on synthetic data so releases can be
+compared and regressions caught on any machine:
+
+- match_face_encodings → the matching step of the live loop (N faces per frame)
+- recognize_frame → detection + encoding + matching of one live frame
+- recognize_login_image → `recognize_student_face()` after the camera capture
+- mark_attendance_in_db → one attendance write for the recognized students
+- finalize_session → end-of-session pass closing the class session
+- send_frame_to_frontend → dashboard payload (JPEG + roster) for one frame
+- live_loop → `recognize_faces_live()` end to end, fed from a replay source
+
+Everything runs in a scratch directory with a synthetic gallery of
+`--students` × `--samples` 128-d encodings and a matching SQLite database,
+so the real gallery and database are never touched. Frames come from a
+recorded video (`--video`) or are synthetic; synthetic frames contain no
+faces, so for them recognize_frame measures detection cost only (the
+matching stage covers the rest).
+
+For every stage it reports count, mean, p50, p90, p95, p99 and max latency
+(ms) and throughput (calls/s). `--json` writes the results together with
+the git revision and parameters; `--compare` checks them against an
+earlier JSON file and exits with status 1 if a stage's p50 got slower by
+more than `--threshold`.
+
+Usage:
+    python -m benchmarks.recognition_benchmark --students 500 --frames 100 --json bench.json
+    python -m benchmarks.recognition_benchmark --video class.mp4 --compare bench.json --threshold 0.2
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import contextlib  # Silence the pipeline's debug output while timing
+import json  # Synthetic model file and machine-readable results
+import os  # Scratch directory and environment
+import platform  # Machine description in the results
+import subprocess  # Git revision of the measured code
+import sys  # Exit status for regressions
+import tempfile  # Scratch directory
+import time  # High resolution timers
+
+import cv2  # Video decoding
+import numpy as np  # Synthetic data and percentiles
+
+from benchmarks.gallery_report import synthetic_model
+
+STAGES = ("match_face_encodings", "recognize_frame", "recognize_login_image",
+          "mark_attendance_in_db", "finalize_session", "send_frame_to_frontend", "live_loop")
+
+CLASS_ID = 1
+PROFESSOR_ID = 1
+
+
+class StageTimer:
+    """Collects per-call latencies of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.latencies = []  # Seconds
+        self.elapsed = 0.0
+
+    @contextlib.contextmanager
+    def measure(self):
+        start = time.perf_counter()
+        yield
+        seconds = time.perf_counter() - start
+        self.latencies.append(seconds)
+        self.elapsed += seconds
+
+    def summary(self):
+        if not self.latencies:
+            return {"stage": self.name, "count": 0}
+        ms = np.array(self.latencies) * 1000
+        return {
+            "stage": self.name,
+            "count": len(ms),
+            "mean_ms": round(float(ms.mean()), 3),
+            "p50_ms": round(float(np.percentile(ms, 50)), 3),
+            "p90_ms": round(float(np.percentile(ms, 90)), 3),
+            "p95_ms": round(float(np.percentile(ms, 95)), 3),
+            "p99_ms": round(float(np.percentile(ms, 99)), 3),
+            "max_ms": round(float(ms.max()), 3),
+            "per_second": round(len(ms) / self.elapsed, 1) if self.elapsed else None,
+        }
+
+
+class NullSocketIO:
+    """Stands in for Flask-SocketIO: keeps only the size of the last emitted payload."""
+
+    def __init__(self):
+        self.emits = 0
+        self.last_image_bytes = 0
+
+    def emit(self, event, data, to=None):
+        self.emits += 1
+        self.last_image_bytes = len(data.get("image", ""))
+
+
+class ReplaySource:
+    """
+    Feeds frames to `recognize_faces_live()` with the LatestFrameGrabber
+    interface and times each loop iteration (read → next read).
+    """
+
+    def __init__(self, frames, timer):
+        self.frames = frames
+        self.timer = timer
+        self.index = 0
+        self.last_read = None
+        self._open = True
+
+    def read_latest(self, timeout=1.0, newer_than=None):
+        now = time.perf_counter()
+        if self.last_read is not None:
+            self.timer.latencies.append(now - self.last_read)
+            self.timer.elapsed += now - self.last_read
+        if self.index >= len(self.frames):
+            self._open = False
+            return None, None, self.index
+        self.last_read = now
+        frame = self.frames[self.index]
+        self.index += 1
+        return frame, time.time(), self.index
+
+    def isOpened(self):
+        return self._open
+
+    def release(self):
+        self._open = False
+
+
+def load_frames(video_path, count, width, height, seed=0):
+    """Frames from a recorded video (looped), or synthetic frames with moving content."""
+    frames = []
+    if video_path:
+        cap = cv2.VideoCapture(video_path)
+        while len(frames) < count:
+            ret, frame = cap.read()
+            if not ret:
+                if not frames:
+                    break
+                cap.set(cv2.CAP_PROP_POS_FRAMES, 0)  # Loop the recording
+                continue
+            if (frame.shape[1], frame.shape[0]) != (width, height):
+                frame = cv2.resize(frame, (width, height))
+            frames.append(frame)
+        cap.release()
+        return frames
+
+    # Synthetic: a textured background with a moving block, so the motion gate lets frames through
+    rng = np.random.default_rng(seed)
+    background = rng.integers(0, 255, (height, width, 3), dtype=np.uint8)
+    background = cv2.GaussianBlur(background, (0, 0), 3)
+    for i in range(count):
+        frame = background.copy()
+        x = (i * 37) % max(width - 200, 1)
+        cv2.rectangle(frame, (x, height // 3), (x + 200, height // 3 + 200), (255, 255, 255), -1)
+        frames.append(frame)
+    return frames
+
+
+def create_fixture_database(enrollments, model_data, class_size):
+    """Database with the deployed schema (migrations.py) at DATABASE_PATH, plus one class."""
+    # Imported here: data_access reads DATABASE_PATH at import
+    from migrations import migrate
+    from data_access import connect_db
+
+    migrate()
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        cursor.executemany(
+            "INSERT INTO students (enrollment, name, email, password, face_encoding) VALUES (?, ?, ?, '', ?)",
+            [(e, f"Student {e}", f"{e}@benchmark", json.dumps(enc))
+             for e, enc in zip(enrollments, model_data["encodings"])],
+        )
+        cursor.execute("INSERT INTO classrooms (id, class_name) VALUES (?, 'Benchmark Class')", (CLASS_ID,))
+        cursor.executemany(
+            "INSERT INTO student_classes (enrollment, class_id, student_name) VALUES (?, ?, ?)",
+            [(e, CLASS_ID, f"Student {e}") for e in enrollments[:class_size]],
+        )
+
+
+def git_revision():
+    """Commit of the measured code (None outside a git checkout)."""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True,
+                                       stderr=subprocess.DEVNULL).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(args, frames, centres):
+    """Times every stage; returns the list of stage summaries."""
+    # Imported here: the module maps the gallery of the current (scratch) directory at import
+    import recognize_student_face as rsf
+    from face_detectors import get_live_detector
+
+    timers = {name: StageTimer(name) for name in STAGES}
+    rng = np.random.default_rng(2)
+    quiet = open(os.devnull, "w")
+
+    # Matching: genuine faces (noisy student centres) plus impostors, as in a live frame
+    genuine_count = max(args.faces_per_frame - 1, 0)
+    for _ in range(len(frames)):
+        picks = rng.integers(0, len(centres), genuine_count)
+        queries = list(centres[picks] + rng.normal(0, 0.02, (genuine_count, 128)).astype(np.float32))
+        queries.append(rng.normal(0, 0.09, 128).astype(np.float32))  # An unknown visitor
+        with timers["match_face_encodings"].measure():
+            rsf.match_face_encodings(queries)
+
+    detector = get_live_detector()
+    for frame in frames[:args.detect_frames]:
+        rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        with contextlib.redirect_stdout(quiet), timers["recognize_frame"].measure():
+            rsf.recognize_frame(detector, rgb_frame)
+
+    for frame in frames[:args.login_frames]:
+        with contextlib.redirect_stdout(quiet), timers["recognize_login_image"].measure():
+            rsf.recognize_login_image(frame)
+
+    class_enrollments = rsf.known_gallery.enrollments[:args.class_size]
+    for _ in range(args.db_writes):
+        present = list(rng.choice(class_enrollments, min(args.faces_per_frame, len(class_enrollments)), replace=False))
+        with contextlib.redirect_stdout(quiet), timers["mark_attendance_in_db"].measure():
+            rsf.mark_attendance_in_db(CLASS_ID, PROFESSOR_ID, present)
+
+    for _ in range(args.finalize_runs):
+        with contextlib.redirect_stdout(quiet), timers["finalize_session"].measure():
+            rsf.mark_attendance_in_db(CLASS_ID, PROFESSOR_ID, [], session_end=True)
+
+    socketio = NullSocketIO()
+    for frame in frames:
+        with contextlib.redirect_stdout(quiet), timers["send_frame_to_frontend"].measure():
+            rsf.send_frame_to_frontend(None, socketio, frame, [], CLASS_ID)
+    print(f"📡 Dashboard payload: {socketio.last_image_bytes / 1024:.0f} KB per frame (base64 JPEG)")
+
+    # End to end: the live loop over a replay source (every call is a fresh session)
+    source = ReplaySource(frames[:args.detect_frames], timers["live_loop"])
+    with contextlib.redirect_stdout(quiet):
+        rsf.recognize_faces_live(None, socketio, CLASS_ID, PROFESSOR_ID, camera=source)
+
+    return [timers[name].summary() for name in STAGES]
+
+
+def compare_results(results, baseline_path, threshold):
+    """Prints p50 changes against an earlier run; returns the stages that regressed."""
+    with open(baseline_path, "r") as f:
+        baseline = {r["stage"]: r for r in json.load(f)["stages"]}
+
+    regressions = []
+    print(f"\n📈 Compared with {baseline_path}:")
+    for r in results:
+        before = baseline.get(r["stage"])
+        if not before or not before.get("p50_ms") or not r.get("p50_ms"):
+            continue
+        change = r["p50_ms"] / before["p50_ms"] - 1
+        flag = "❌" if change > threshold else "✅"
+        print(f"  {flag} {r['stage']:<24} p50 {before['p50_ms']:.3f} → {r['p50_ms']:.3f} ms ({change:+.0%})")
+        if change > threshold:
+            regressions.append(r["stage"])
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the recognition pipeline stages without a camera.")
+    parser.add_argument("--students", type=int, default=500, help="Students in the synthetic gallery")
+    parser.add_argument("--samples", type=int, default=10, help="Encodings per student")
+    parser.add_argument("--class-size", type=int, default=40, help="Students enrolled in the benchmark class")
+    parser.add_argument("--video", help="Recorded classroom video (default: synthetic frames)")
+    parser.add_argument("--frames", type=int, default=200, help="Frames for the cheap stages")
+    parser.add_argument("--detect-frames", type=int, default=30, help="Frames for detection / the live loop")
+    parser.add_argument("--login-frames", type=int, default=10, help="Frames for the face-login path")
+    parser.add_argument("--db-writes", type=int, default=200, help="Attendance writes")
+    parser.add_argument("--finalize-runs", type=int, default=20, help="End-of-session (close session) passes")
+    parser.add_argument("--faces-per-frame", type=int, default=5, help="Faces matched / marked per frame")
+    parser.add_argument("--width", type=int, default=1280)
+    parser.add_argument("--height", type=int, default=720)
+    parser.add_argument("--json", help="Write results to this JSON file")
+    parser.add_argument("--compare", help="Earlier JSON results to compare with")
+    parser.add_argument("--threshold", type=float, default=0.2, help="Allowed p50 slowdown before failing (0.2 = 20%%)")
+    args = parser.parse_args()
+
+    frames = load_frames(args.video, args.frames, args.width, args.height)
+    if not frames:
+        print(f"❌ Could not read frames from {args.video}")
+        return 1
+    print(f"🎞️ {len(frames)} {'recorded' if args.video else 'synthetic'} frames at {args.width}x{args.height}")
+
+    model_data, centres = synthetic_model(args.students, args.samples)
+    json_path = os.path.abspath(args.json) if args.json else None
+    compare_path = os.path.abspath(args.compare) if args.compare else None
+
+    # Scratch directory: synthetic model, gallery files and database; the real ones are never touched
+    original_dir = os.getcwd()
+    with tempfile.TemporaryDirectory(prefix="recognition-bench-") as scratch:
+        os.chdir(scratch)
+        try:
+            with open("face_recognition_model.json", "w") as f:
+                json.dump(model_data, f)
+            os.environ["FACE_GALLERY_PATH"] = os.path.join(scratch, "face_gallery.index.json")
+            os.environ["DATABASE_PATH"] = os.path.join(scratch, "attendance_system.db")
+            create_fixture_database(model_data["enrollments"], model_data, args.class_size)
+            print(f"🧠 Synthetic gallery: {args.students} students × {args.samples} samples")
+
+            results = run_benchmark(args, frames, centres)
+        finally:
+            os.chdir(original_dir)
+
+    print(f"\n{'stage':<24}{'count':>7}{'mean ms':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'per s':>10}")
+    for r in results:
+        if r["count"]:
+            print(f"{r['stage']:<24}{r['count']:>7}{r['mean_ms']:>10.3f}{r['p50_ms']:>10.3f}"
+                  f"{r['p95_ms']:>10.3f}{r['p99_ms']:>10.3f}{r['per_second']:>10.1f}")
+
+    if json_path:
+        with open(json_path, "w") as f:
+            json.dump({
+                "revision": git_revision(),
+                "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                            "cpus": os.cpu_count()},
+                "parameters": vars(args),
+                "stages": results,
+            }, f, indent=4)
+        print(f"\n✅ Results written to {json_path}")
+
+    if compare_path and compare_results(results, compare_path, args.threshold):
+        print("❌ Performance regression detected.")
+        return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,258 @@
+"""
+recognition_sweep.py
+Accuracy vs. Speed Evaluation of Recognition Settings
+
+Purpose:
+Face login matches with tolerance 0.6 (FACE_LOGIN_TOLERANCE) and live
+attendance with 0.4 (FACE_LIVE_TOLERANCE), and nobody measured what these,
+the detector backend, a downscaled detection pass or the number of
+samples per student cost or buy. This command sweeps those settings over
+a labelled set of face images and reports, per configuration:
+
+- precision: accepted matches that named the right student
+- recall: pictures of enrolled students that were recognized correctly
+- false-accept rate: pictures of unknown people (held-out students) accepted as someone
+- frames/sec: detection + encoding + matching throughput
+
+and recommends the fastest configuration with the best recall whose
+false-accept rate stays under `--max-far`, as environment settings.
+
+Labelled images are laid out one folder per enrollment:
+
+    faces/
+        S001/ a.jpg b.jpg c.jpg ...
+        S002/ ...
+
+For each student the first `samples` pictures (sorted by name) form the
+gallery and the rest are probes. Every `--impostor-every`-th student is
+left out of the gallery entirely; their pictures are the impostor probes.
+
+Usage:
+    python -m benchmarks.recognition_sweep faces/ --backends hog,haar+hog --downscale 1,0.5 \\
+        --samples 1,3,5 --tolerances 0.35,0.4,0.45,0.5,0.6 --json sweep.json
+"""
+
+# IMPORTS
+import argparse  # Command line options
+import glob  # Find the labelled images
+import json  # Machine-readable results
+import os  # Folder handling
+import time  # Throughput
+
+import cv2  # Image loading and resizing
+import numpy as np  # Statistics
+import face_recognition  # Face encodings
+
+from face_detectors import create_detector
+from face_gallery import FaceGallery
+
+IMAGE_PATTERNS = ("*.jpg", "*.jpeg", "*.png")
+
+
+def load_labelled_images(root):
+    """Returns `{enrollment: [RGB image, ...]}` from one sub-folder per enrollment."""
+    labelled = {}
+    for folder in sorted(os.listdir(root)):
+        path = os.path.join(root, folder)
+        if not os.path.isdir(path):
+            continue
+        images = []
+        for pattern in IMAGE_PATTERNS:
+            for image_path in sorted(glob.glob(os.path.join(path, pattern))):
+                img = cv2.imread(image_path)
+                if img is not None:
+                    images.append(cv2.cvtColor(img, cv2.COLOR_BGR2RGB))
+        if images:
+            labelled[folder] = images
+    return labelled
+
+
+def encode_images(detector, labelled, downscale):
+    """
+    Detects and encodes the largest face of every image (on a copy downscaled
+    by `downscale`, as a live session would process it).
+
+    Returns:
+        ({enrollment: [encoding or None, ...]}, seconds spent)
+    """
+    encodings = {}
+    elapsed = 0.0
+    for enrollment, images in labelled.items():
+        encodings[enrollment] = []
+        for rgb_img in images:
+            start = time.perf_counter()
+            if downscale != 1.0:
+                rgb_img = cv2.resize(rgb_img, (0, 0), fx=downscale, fy=downscale, interpolation=cv2.INTER_AREA)
+            boxes = detector.detect(rgb_img)
+            encoding = None
+            if boxes:
+                # Labelled pictures show one student; keep the largest face
+                largest = max(boxes, key=lambda b: (b[2] - b[0]) * (b[1] - b[3]))
+                found = face_recognition.face_encodings(rgb_img, [largest])
+                encoding = found[0] if found else None
+            elapsed += time.perf_counter() - start
+            encodings[enrollment].append(encoding)
+    return encodings, elapsed
+
+
+def split_gallery(encodings, samples, impostor_every):
+    """
+    Gallery (first `samples` usable encodings of each enrolled student),
+    genuine probes `[(enrollment, encoding or None)]` and impostor probes.
+    """
+    gallery_encodings, gallery_enrollments = [], []
+    genuine, impostors = [], []
+    for i, (enrollment, student_encodings) in enumerate(sorted(encodings.items())):
+        if impostor_every and i % impostor_every == impostor_every - 1:
+            impostors.extend(student_encodings)
+            continue
+
+        usable = [e for e in student_encodings if e is not None]
+        if len(usable) <= samples:
+            continue  # Needs at least one picture left over as a probe
+
+        gallery_samples, probes, taken = [], [], 0
+        for encoding in student_encodings:
+            if encoding is not None and taken < samples:
+                gallery_samples.append(encoding.tolist())
+                taken += 1
+            else:
+                probes.append((enrollment, encoding))
+        gallery_encodings.append(gallery_samples)
+        gallery_enrollments.append(enrollment)
+        genuine.extend(probes)
+    return {"encodings": gallery_encodings, "enrollments": gallery_enrollments}, genuine, impostors
+
+
+def nearest_matches(gallery, encodings):
+    """(closest enrollment, distance) per encoding; (None, inf) where no face was found."""
+    matches = []
+    for encoding in encodings:
+        if encoding is None:
+            matches.append((None, float("inf")))
+            continue
+        index, distance = gallery.nearest(encoding)
+        matches.append((gallery.enrollments[gallery.labels[index]] if index is not None else None, distance))
+    return matches
+
+
+def score(genuine, genuine_matches, impostor_matches, tolerance):
+    """Precision, recall and false-accept rate at one tolerance."""
+    correct = wrong = 0
+    for (expected, _), (enrollment, distance) in zip(genuine, genuine_matches):
+        if distance <= tolerance:
+            if enrollment == expected:
+                correct += 1
+            else:
+                wrong += 1
+    false_accepts = sum(1 for _, distance in impostor_matches if distance <= tolerance)
+
+    accepted = correct + wrong + false_accepts
+    return {
+        "precision": round(correct / accepted, 4) if accepted else None,
+        "recall": round(correct / len(genuine), 4) if genuine else None,
+        "false_accept_rate": round(false_accepts / len(impostor_matches), 4) if impostor_matches else None,
+        "misidentified": wrong,
+    }
+
+
+def recommend(results, max_far):
+    """Best recall with FAR ≤ max_far (ties → higher precision, then faster)."""
+    eligible = [r for r in results if r["recall"] is not None and (r["false_accept_rate"] or 0) <= max_far]
+    if not eligible:
+        return None
+    return max(eligible, key=lambda r: (r["recall"], r["precision"] or 0, r["frames_per_sec"]))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sweep recognition settings over labelled face images.")
+    parser.add_argument("image_root", help="Folder with one sub-folder of face images per enrollment")
+    parser.add_argument("--backends", default="hog", help="Comma separated detector backends")
+    parser.add_argument("--downscale", default="1.0,0.5", help="Comma separated detection scale factors")
+    parser.add_argument("--samples", default="1,3,5", help="Comma separated gallery samples per student")
+    parser.add_argument("--tolerances", default="0.35,0.4,0.45,0.5,0.55,0.6", help="Comma separated tolerances")
+    parser.add_argument("--impostor-every", type=int, default=5,
+                        help="Every N-th student is kept out of the gallery as an impostor (0 = none)")
+    parser.add_argument("--max-far", type=float, default=0.01, help="Highest acceptable false-accept rate")
+    parser.add_argument("--json", help="Write results to this JSON file")
+    args = parser.parse_args()
+
+    labelled = load_labelled_images(args.image_root)
+    if not labelled:
+        print(f"❌ No labelled images found in {args.image_root}")
+        return
+    image_count = sum(len(images) for images in labelled.values())
+    print(f"📷 Loaded {image_count} images of {len(labelled)} students from {args.image_root}")
+
+    tolerances = [float(t) for t in args.tolerances.split(",")]
+    results = []
+    for backend in args.backends.split(","):
+        try:
+            detector = create_detector(backend)
+        except (RuntimeError, ValueError) as e:
+            print(f"⚠️ Skipping '{backend}': {e}")
+            continue
+
+        for downscale in (float(d) for d in args.downscale.split(",")):
+            # Encoding depends only on the detector and scale; gallery size and tolerance reuse it
+            encodings, encode_seconds = encode_images(detector, labelled, downscale)
+            no_face = sum(e is None for student in encodings.values() for e in student)
+            print(f"🔍 {detector.name} @ {downscale}x: {image_count / encode_seconds:.1f} images/s, "
+                  f"no face found in {no_face}/{image_count}")
+
+            for samples in (int(s) for s in args.samples.split(",")):
+                model_data, genuine, impostors = split_gallery(encodings, samples, args.impostor_every)
+                if not model_data["enrollments"] or not genuine:
+                    print(f"⚠️ Not enough pictures per student for {samples} gallery samples — skipped.")
+                    continue
+                gallery = FaceGallery.from_model_data(model_data, mode="float32")
+
+                start = time.perf_counter()
+                genuine_matches = nearest_matches(gallery, [e for _, e in genuine])
+                impostor_matches = nearest_matches(gallery, impostors)
+                match_seconds = (time.perf_counter() - start) / max(len(genuine) + len(impostors), 1)
+
+                # Per frame: detection + encoding of one picture, then one gallery match
+                frames_per_sec = 1.0 / (encode_seconds / image_count + match_seconds)
+                for tolerance in tolerances:
+                    result = {
+                        "backend": detector.name,
+                        "downscale": downscale,
+                        "samples": samples,
+                        "tolerance": tolerance,
+                        "students": len(model_data["enrollments"]),
+                        "genuine_probes": len(genuine),
+                        "impostor_probes": len(impostors),
+                        "frames_per_sec": round(frames_per_sec, 2),
+                    }
+                    result.update(score(genuine, genuine_matches, impostor_matches, tolerance))
+                    results.append(result)
+
+    if not results:
+        print("❌ No configuration could be evaluated.")
+        return
+
+    # Human readable summary
+    print(f"\n{'backend':<12}{'scale':>7}{'samples':>9}{'tol':>7}{'precision':>11}{'recall':>9}{'FAR':>8}{'fps':>8}")
+    for r in results:
+        precision = f"{r['precision']:.3f}" if r["precision"] is not None else "n/a"
+        far = f"{r['false_accept_rate']:.3f}" if r["false_accept_rate"] is not None else "n/a"
+        print(f"{r['backend']:<12}{r['downscale']:>7.2f}{r['samples']:>9}{r['tolerance']:>7.2f}"
+              f"{precision:>11}{r['recall']:>9.3f}{far:>8}{r['frames_per_sec']:>8.1f}")
+
+    best = recommend(results, args.max_far)
+    if best:
+        print(f"\n🎯 Recommended operating point (FAR ≤ {args.max_far}): {best['backend']} @ {best['downscale']}x, "
+              f"{best['samples']} samples/student, tolerance {best['tolerance']}")
+        print(f"   FACE_DETECTOR_BACKEND={best['backend']} FACE_LIVE_TOLERANCE={best['tolerance']}")
+    else:
+        print(f"\n⚠️ No configuration kept the false-accept rate under {args.max_far}.")
+
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"max_far": args.max_far, "recommended": best, "results": results}, f, indent=4)
+        print(f"\n✅ Results written to {args.json}")
+
+
+if __name__ == "__main__":
+    main()
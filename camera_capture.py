@@ -0,0 +1,172 @@
+"""
+camera_capture.py
+Latest-Frame Camera Grabber
+
+Purpose:
+`cv2.VideoCapture.read()` hands out buffered frames in order. When face
+recognition takes longer than one frame interval the live session falls
+further and further behind the camera, and the dashboard preview lags by
+seconds. The LatestFrameGrabber reads the camera continuously on its own
+thread and keeps only the newest frame (plus the time it was captured) in a
+single-slot buffer, so consumers always work on the freshest picture and
+stale frames are simply dropped.
+
+🔧 Key Features:
+- Drop-in replacement for the parts of cv2.VideoCapture we use
+  (`read()`, `isOpened()`, `release()`).
+- `read_latest()` also returns the capture timestamp and a sequence number,
+  which makes capture-to-attendance latency measurable.
+- LatencyTracker keeps rolling latency percentiles for the dashboard.
+"""
+
+# IMPORTS
+import threading  # Background capture thread and frame-slot locking
+import time  # Capture timestamps
+from collections import deque  # Rolling window of latency samples
+
+import cv2  # Camera access
+import numpy as np  # Latency percentiles
+
+
+class LatestFrameGrabber:
+    """
+    Continuously reads a camera on a daemon thread and keeps only the newest frame.
+
+    Usage:
+        grabber = LatestFrameGrabber(0, width=1280, height=720).start()
+        frame, captured_at, seq = grabber.read_latest()
+        ...
+        grabber.release()
+    """
+
+    def __init__(self, source=0, width=None, height=None):
+        self.source = source
+        self.cap = cv2.VideoCapture(source)
+
+        # Set resolution before the first frame is read
+        if width:
+            self.cap.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        if height:
+            self.cap.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+
+        # Single-slot buffer protected by a condition variable
+        self._condition = threading.Condition()
+        self._frame = None
+        self._captured_at = None
+        self._seq = 0            # Incremented for every frame captured
+        self._last_read_seq = 0  # Last frame handed to `read()`
+
+        self._running = False
+        self._thread = None
+
+        # Counters
+        self.frames_captured = 0
+        self.frames_dropped = 0  # Frames overwritten before anyone consumed them
+
+    def start(self):
+        """Starts the capture thread. Returns self so it can be chained."""
+        if self._running or not self.cap.isOpened():
+            return self
+
+        self._running = True
+        self._thread = threading.Thread(target=self._capture_loop, name="camera-grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def _capture_loop(self):
+        """Reads frames as fast as the camera delivers them and overwrites the slot."""
+        while self._running:
+            ret, frame = self.cap.read()
+            if not ret or frame is None:
+                time.sleep(0.01)  # Camera hiccup — try again shortly
+                continue
+
+            captured_at = time.time()
+            with self._condition:
+                if self._seq > self._last_read_seq:
+                    self.frames_dropped += 1
+                self._frame = frame
+                self._captured_at = captured_at
+                self._seq += 1
+                self.frames_captured += 1
+                self._condition.notify_all()
+
+    def read_latest(self, timeout=1.0, newer_than=None):
+        """
+        Returns `(frame, captured_at, seq)` for the newest frame.
+
+        Waits up to `timeout` seconds for a frame with a sequence number greater
+        than `newer_than` (so a consumer never processes the same frame twice).
+        Returns `(None, None, seq)` if no such frame arrived in time or the
+        grabber was released.
+        """
+        newer_than = self._last_read_seq if newer_than is None else newer_than
+
+        with self._condition:
+            self._condition.wait_for(lambda: self._seq > newer_than or not self._running, timeout=timeout)
+            if self._seq <= newer_than or not self._running:
+                return None, None, self._seq
+
+            self._last_read_seq = self._seq
+            return self._frame, self._captured_at, self._seq
+
+    @property
+    def seq(self):
+        """Sequence number of the newest frame captured so far."""
+        with self._condition:
+            return self._seq
+
+    def read(self):
+        """cv2.VideoCapture-compatible read: returns `(ret, frame)` for the newest frame."""
+        frame, _, _ = self.read_latest()
+        return frame is not None, frame
+
+    def isOpened(self):
+        return self._running and self.cap.isOpened()
+
+    def release(self):
+        """Stops the capture thread and releases the camera."""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None and self._thread is not threading.current_thread():
+            self._thread.join(timeout=2)
+        self.cap.release()
+
+    def stats(self):
+        """Capture counters for logging."""
+        return {
+            "frames_captured": self.frames_captured,
+            "frames_dropped": self.frames_dropped,
+        }
+
+
+class LatencyTracker:
+    """
+    Rolling latency statistics (milliseconds) over the last `window` samples.
+
+    Used to measure how old a frame is when recognition starts and how long
+    it takes from capture until the attendance mark is committed. Samples may
+    be recorded from another thread (the attendance writer's commit callbacks).
+    """
+
+    def __init__(self, window=200):
+        self.samples = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, since_timestamp):
+        """Records the time elapsed since `since_timestamp` (a `time.time()` value)."""
+        with self._lock:
+            self.samples.append((time.time() - since_timestamp) * 1000)
+
+    def summary(self):
+        """Returns p50 / p95 / max latency in ms (None when there are no samples)."""
+        with self._lock:
+            values = np.array(self.samples)
+        if not len(values):
+            return None
+        return {
+            "p50_ms": round(float(np.percentile(values, 50)), 1),
+            "p95_ms": round(float(np.percentile(values, 95)), 1),
+            "max_ms": round(float(values.max()), 1),
+        }
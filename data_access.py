@@ -0,0 +1,233 @@
+"""
+data_access.py
+Shared SQLite Connection Pool
+
+Purpose:
+Every part of the system (web routes, chatbot agents, live recognition,
+edge ingest) used to open its own SQLite connection for every request and
+every video frame, each with its own settings. This module is the single
+place connections come from: they are created once with the same settings,
+kept in a small pool and handed out again.
+
+🔧 Key Features:
+- `connect_db()` checks a connection out of the pool. It is used exactly
+  like `sqlite3.connect()`:
+    * `with connect_db() as conn:` commits (or rolls back on error) and
+      returns the connection to the pool at the end of the block.
+    * `conn = connect_db()` ... `conn.close()` returns it to the pool
+      (uncommitted changes are rolled back, as before).
+- `open_connection()` opens a connection with the same settings that is
+  not pooled, for long-lived owners that change per-connection settings
+  (the attendance writer's synchronous level) — those never reach the pool.
+- Optional row factory per checkout: `connect_db(row_factory=sqlite3.Row)`
+  for access by column name; plain tuples otherwise.
+- `transaction(immediate=True)` for read-modify-write sequences that must
+  take the write lock up front.
+- `execute_script()` runs a multi-statement script (e.g. CREATE TRIGGER)
+  without leaving the current transaction.
+- Uniform settings on every connection (CONNECTION_PRAGMAS):
+    * WAL journal: readers (dashboards, agents) no longer block the live
+      recognition writer and the writer no longer blocks them.
+    * synchronous=NORMAL: with WAL a commit only appends to the log;
+      durable across application crashes, the last commits may be lost
+      on power failure — acceptable for attendance marks.
+    * busy_timeout: a writer waits for the lock instead of failing with
+      "database is locked".
+    * mmap_size / cache_size: reads served from memory-mapped pages and a
+      larger page cache per connection.
+- Connections may be used from any thread, but only by one thread at a time
+  (whoever has them checked out). A process gets its own pool, so spawned
+  recognition workers never share a connection with the web server.
+
+Configuration (environment variables):
+- DATABASE_PATH → SQLite database file (default attendance_system.db)
+- DATABASE_TIMEOUT → seconds to wait for a locked database (default 30)
+- DATABASE_POOL_SIZE → idle connections kept per process (default 8)
+- DATABASE_MMAP_SIZE → bytes of the database file memory-mapped per connection (default 256 MB)
+- DATABASE_CACHE_KB → page cache per connection in KiB (default 16 MB)
+"""
+
+# IMPORTS
+import os  # Configuration and process id
+import atexit  # Close pooled connections on exit
+import sqlite3  # SQLite driver
+import threading  # Pool lock
+import contextlib  # transaction() helper
+
+
+# CONNECTION CONFIGURATION
+DATABASE_PATH = os.getenv("DATABASE_PATH", "attendance_system.db")
+DATABASE_TIMEOUT = float(os.getenv("DATABASE_TIMEOUT", "30"))
+DATABASE_POOL_SIZE = int(os.getenv("DATABASE_POOL_SIZE", "8"))
+DATABASE_MMAP_SIZE = int(os.getenv("DATABASE_MMAP_SIZE", str(256 * 1024 * 1024)))
+DATABASE_CACHE_KB = int(os.getenv("DATABASE_CACHE_KB", str(16 * 1024)))
+
+# Applied to every new connection
+CONNECTION_PRAGMAS = (
+    ("journal_mode", "WAL"),  # Concurrent readers alongside one writer (persists in the file)
+    ("synchronous", "NORMAL"),  # Safe with WAL; no fsync on every commit
+    ("busy_timeout", int(DATABASE_TIMEOUT * 1000)),  # Wait for the write lock instead of failing
+    ("mmap_size", DATABASE_MMAP_SIZE),  # Memory-mapped reads
+    ("cache_size", -DATABASE_CACHE_KB),  # Negative = KiB
+    ("temp_store", "MEMORY"),  # Sorts and GROUP BYs of the reports never touch temp files
+)
+
+
+def _apply_pragmas(conn):
+    for name, value in CONNECTION_PRAGMAS:
+        conn.execute(f"PRAGMA {name} = {value}")
+
+
+class PooledConnection(sqlite3.Connection):
+    """
+    sqlite3 connection that goes back to its pool instead of closing.
+
+    Behaves like a normal connection (including with pandas), except that
+    `close()` and the end of a `with` block return it to the pool.
+    """
+
+    pool = None  # Owning ConnectionPool
+    checked_out = False
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.release(self)
+        else:
+            super().close()
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        result = super().__exit__(exc_type, exc_value, traceback)  # Commit or roll back
+        self.close()
+        return result
+
+
+class ConnectionPool:
+    """Idle SQLite connections of one process, all created with the same settings."""
+
+    def __init__(self, path=DATABASE_PATH, size=DATABASE_POOL_SIZE, timeout=DATABASE_TIMEOUT):
+        self.path = path
+        self.size = size
+        self.timeout = timeout
+        self.pid = os.getpid()
+        self._idle = []
+        self._lock = threading.Lock()
+        self.created = 0
+
+    def _create(self):
+        conn = sqlite3.connect(self.path, timeout=self.timeout, check_same_thread=False, factory=PooledConnection)
+        _apply_pragmas(conn)
+        conn.pool = self
+        self.created += 1
+        return conn
+
+    def acquire(self, row_factory=None):
+        with self._lock:
+            conn = self._idle.pop() if self._idle else None
+        if conn is None:
+            conn = self._create()
+        conn.row_factory = row_factory
+        conn.checked_out = True
+        return conn
+
+    def release(self, conn):
+        """Rolls back whatever the caller left uncommitted and keeps the connection for reuse."""
+        if not conn.checked_out:
+            return  # Already returned (e.g. close() inside a with block)
+        conn.checked_out = False
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+        except sqlite3.ProgrammingError:
+            return  # Closed underneath us; drop it
+        conn.row_factory = None
+
+        with self._lock:
+            if len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        sqlite3.Connection.close(conn)
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            sqlite3.Connection.close(conn)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    """The pool of this process (a forked child starts a fresh one)."""
+    global _pool
+
+    with _pool_lock:
+        if _pool is None or _pool.pid != os.getpid():
+            _pool = ConnectionPool()
+        return _pool
+
+
+def connect_db(row_factory=None):
+    """
+    Checks a connection out of the pool.
+
+    Use it as a context manager (`with connect_db() as conn:`) or call
+    `conn.close()` when done; both return the connection to the pool.
+    """
+    return get_pool().acquire(row_factory)
+
+
+def open_connection(row_factory=None):
+    """
+    Opens a connection with the pool's settings that never joins the pool.
+
+    For an owner that keeps it for its whole life and changes its settings;
+    `close()` really closes it.
+    """
+    conn = sqlite3.connect(DATABASE_PATH, timeout=DATABASE_TIMEOUT, check_same_thread=False)
+    _apply_pragmas(conn)
+    conn.row_factory = row_factory
+    return conn
+
+
+@contextlib.contextmanager
+def transaction(immediate=False, row_factory=None):
+    """
+    A connection inside one transaction: committed on success, rolled back on error.
+
+    `immediate=True` takes the write lock at the start (BEGIN IMMEDIATE), so a
+    check followed by a write cannot interleave with another writer.
+    """
+    conn = connect_db(row_factory)
+    try:
+        if immediate:
+            conn.execute("BEGIN IMMEDIATE")
+        yield conn
+        conn.commit()
+    except BaseException:
+        conn.rollback()
+        raise
+    finally:
+        conn.close()
+
+
+def execute_script(cursor, script):
+    """
+    Runs several `;`-separated statements (trigger bodies included) inside the
+    caller's transaction — unlike `executescript()`, which commits first.
+    """
+    statement = ""
+    for line in script.splitlines(keepends=True):
+        statement += line
+        if sqlite3.complete_statement(statement):
+            cursor.execute(statement)
+            statement = ""
+    if statement.strip():
+        cursor.execute(statement)
+
+
+@atexit.register
+def _close_pool():
+    if _pool is not None and _pool.pid == os.getpid():
+        _pool.close_all()
@@ -0,0 +1,286 @@
+"""
+edge_runner.py
+Headless Edge Recognition Runner
+
+Purpose:
+One central server cannot run dlib for every classroom camera. This runner
+is the live attendance loop (`recognize_faces_live()`) running on the
+classroom machine itself: it keeps a local copy of the class's face
+gallery, recognizes students from the local camera, and posts batches of
+recognized enrollments with timestamps to the central server
+(`POST /api/edge/attendance`). The server only stores results.
+
+🔧 Key Features:
+- Keeps the class gallery as a local memory-mapped gallery file and pulls
+  binary deltas (`GET /api/edge/gallery/changes`, see gallery_sync.py) on
+  start and every minute; the last copy is reused when offline.
+- Batches sightings (latest time per student) and flushes them every few
+  seconds on a background thread.
+- Every batch has an idempotency key that is reused for all retries, so a
+  batch that reached the server before a network blip is never counted twice.
+- Unsent batches are spooled to disk and resent (with their original keys)
+  after a restart.
+
+Usage:
+    EDGE_API_TOKEN=... python edge_runner.py --server http://central:5000 --class-id 3 --professor-id 1
+
+Stop with Ctrl+C; pending results are flushed before exiting.
+"""
+
+# IMPORTS
+import os  # Working directory and token
+import sys  # Exit codes
+import json  # Request bodies and the spool file
+import time  # Flush timing and retry backoff
+import uuid  # Idempotency keys
+import signal  # Ctrl+C / SIGTERM handling
+import argparse  # Command line options
+import threading  # Background uploader
+import urllib.request  # HTTP client (standard library only)
+import urllib.error  # HTTP errors
+from datetime import datetime  # Event timestamps
+
+
+class AttendanceUploader:
+    """
+    Collects recognized students and uploads them to the central server in batches.
+
+    Only one batch is in flight at a time. A batch keeps its idempotency key
+    until the server has acknowledged it; sightings recognized meanwhile go
+    into the next batch.
+    """
+
+    def __init__(self, server, token, class_id, professor_id, flush_interval=3.0,
+                 spool_path="edge_spool.json", max_backoff=60.0):
+        self.url = server.rstrip("/") + "/api/edge/attendance"
+        self.token = token
+        self.class_id = class_id
+        self.professor_id = professor_id
+        self.flush_interval = flush_interval
+        self.spool_path = spool_path
+        self.max_backoff = max_backoff
+
+        self._lock = threading.Lock()
+        self._send_lock = threading.Lock()  # One sender at a time (the thread, or close() after it)
+        self._pending = {}  # enrollment → latest timestamp not yet in a batch
+        self._batches = self._load_spool()  # Batches waiting for an acknowledgement, oldest first
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="edge-uploader", daemon=True)
+
+        # Counters
+        self.batches_sent = 0
+        self.retries = 0
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def add(self, results):
+        """Callback for `recognize_faces_live()`: `[(captured_at, enrollments), ...]`."""
+        with self._lock:
+            for captured_at, enrollments in results:
+                timestamp = datetime.fromtimestamp(captured_at).strftime("%Y-%m-%d %H:%M:%S")
+                for enrollment in enrollments:
+                    if timestamp > self._pending.get(enrollment, ""):
+                        self._pending[enrollment] = timestamp
+
+    def _cut_batch(self):
+        """Moves pending sightings into a new batch with a fresh idempotency key."""
+        with self._lock:
+            if self._pending:
+                events = [{"enrollment": e, "timestamp": t} for e, t in self._pending.items()]
+                self._batches.append({"key": str(uuid.uuid4()), "events": events})
+                self._pending = {}
+                self._save_spool()
+
+    def _post(self, batch):
+        """Sends one batch. Returns True once the server has stored it."""
+        body = json.dumps({
+            "class_id": self.class_id,
+            "professor_id": self.professor_id,
+            "events": batch["events"],
+        }).encode("utf-8")
+        request = urllib.request.Request(self.url, data=body, method="POST", headers={
+            "Content-Type": "application/json",
+            "Authorization": f"Bearer {self.token}",
+            "Idempotency-Key": batch["key"],
+        })
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                result = json.loads(response.read().decode("utf-8"))
+            print(f"📤 Batch {batch['key'][:8]} stored: {result.get('marked_present')} present"
+                  f"{' (already received)' if result.get('replayed') else ''}")
+            return True
+        except urllib.error.HTTPError as e:
+            if 400 <= e.code < 500 and e.code not in (408, 429):
+                # The server rejected the batch itself; retrying would not help
+                print(f"❌ Batch {batch['key'][:8]} rejected ({e.code}): {e.read().decode('utf-8', 'replace')}")
+                return True
+            print(f"⚠️ Server error {e.code}, will retry batch {batch['key'][:8]}")
+        except (urllib.error.URLError, OSError) as e:
+            print(f"⚠️ Server unreachable ({e}), will retry batch {batch['key'][:8]}")
+        return False
+
+    def _send_batches(self):
+        """Sends waiting batches in order. Returns False if the server could not be reached."""
+        # Exclusive: two senders would both post the head batch and both pop it,
+        # dropping the next batch unsent
+        with self._send_lock:
+            while True:
+                with self._lock:
+                    if not self._batches:
+                        return True
+                    batch = self._batches[0]
+
+                if not self._post(batch):
+                    self.retries += 1
+                    return False
+
+                with self._lock:
+                    self._batches.pop(0)
+                    self.batches_sent += 1
+                    self._save_spool()
+
+    def _run(self):
+        backoff = self.flush_interval
+        while not self._stop.wait(backoff):
+            self._cut_batch()
+            if self._send_batches():
+                backoff = self.flush_interval
+            else:
+                backoff = min(backoff * 2, self.max_backoff)  # Back off while the server is down
+
+    def close(self, timeout=10.0):
+        """Stops the uploader after a last flush; whatever is still unsent stays in the spool."""
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join(timeout=timeout)
+        self._cut_batch()
+        if self._thread.is_alive():
+            # Still inside a slow send: the spool keeps the rest for the next run
+            print("⚠️ Uploader still sending; unsent batches stay in the spool.")
+            return
+        self._send_batches()
+
+    # Spool file: unsent batches survive restarts and keep their idempotency keys
+
+    def _load_spool(self):
+        try:
+            with open(self.spool_path, "r") as f:
+                batches = json.load(f)
+            if batches:
+                print(f"📦 Resending {len(batches)} spooled batch(es)")
+            return batches
+        except (OSError, ValueError):
+            return []
+
+    def _save_spool(self):
+        """Writes the unsent batches atomically (called with the lock held)."""
+        temp_path = self.spool_path + ".tmp"
+        with open(temp_path, "w") as f:
+            json.dump(self._batches, f)
+        os.replace(temp_path, self.spool_path)
+
+
+def sync_class_gallery(server, token, class_id, index_path):
+    """
+    Brings the local class gallery up to date with a binary delta from the server
+    (`GET /api/edge/gallery/changes`). Returns False if the server was unreachable.
+    """
+    from face_gallery import read_gallery_index
+    from gallery_sync import apply_delta
+
+    index = read_gallery_index(index_path)
+    since = index.get("sync_version", 0) if index else 0
+
+    url = f"{server.rstrip('/')}/api/edge/gallery/changes?since={since}&class_id={class_id}"
+    request = urllib.request.Request(url, headers={"Authorization": f"Bearer {token}"})
+    try:
+        with urllib.request.urlopen(request, timeout=30) as response:
+            payload = response.read()
+    except (urllib.error.URLError, OSError) as e:
+        print(f"⚠️ Gallery sync failed ({e}); keeping version {since}.")
+        return False
+
+    start = time.perf_counter()
+    apply_delta(index_path, payload)
+    print(f"✅ Class {class_id} gallery synced ({len(payload)} bytes, applied in {(time.perf_counter() - start) * 1000:.1f} ms)")
+    return True
+
+
+def sync_periodically(server, token, class_id, index_path, interval, stop_event):
+    """Background thread: pulls gallery deltas every `interval` seconds during the session."""
+    while not stop_event.wait(interval):
+        sync_class_gallery(server, token, class_id, index_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Headless edge recognition runner for one classroom.")
+    parser.add_argument("--server", required=True, help="Central server URL, e.g. http://central:5000")
+    parser.add_argument("--class-id", type=int, required=True)
+    parser.add_argument("--professor-id", type=int, required=True)
+    parser.add_argument("--camera", default="0", help="Camera index or video URL")
+    parser.add_argument("--data-dir", default="edge_data", help="Local gallery and spool directory")
+    parser.add_argument("--flush-interval", type=float, default=3.0, help="Seconds between uploads")
+    parser.add_argument("--sync-interval", type=float, default=60.0, help="Seconds between gallery delta syncs")
+    parser.add_argument("--no-sync", action="store_true", help="Use the local gallery without downloading")
+    args = parser.parse_args()
+
+    token = os.getenv("EDGE_API_TOKEN", "")
+    if not token:
+        print("❌ Set EDGE_API_TOKEN to the token configured on the server.")
+        return 1
+
+    # Everything local (gallery files, spool) lives in the data directory. Recognition
+    # worker processes inherit the working directory and FACE_GALLERY_PATH.
+    os.makedirs(args.data_dir, exist_ok=True)
+    os.chdir(args.data_dir)
+    index_path = os.path.abspath(f"class_{args.class_id}.index.json")
+    os.environ["FACE_GALLERY_PATH"] = index_path
+
+    if not args.no_sync:
+        if not sync_class_gallery(args.server, token, args.class_id, index_path) and not os.path.exists(index_path):
+            print("❌ No local gallery and the server is unreachable.")
+            return 1
+
+    # Imported after FACE_GALLERY_PATH is set: the module maps the gallery at import
+    import recognize_student_face
+    from camera_capture import LatestFrameGrabber
+
+    uploader = AttendanceUploader(args.server, token, args.class_id, args.professor_id,
+                                  flush_interval=args.flush_interval).start()
+
+    stop_live = threading.Event()  # Ends the recognition loop
+
+    def stop(signum, frame):
+        print("🛑 Stopping edge runner...")
+        stop_live.set()
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    # Keep the gallery current while the session runs (picked up by the recognition loop)
+    stop_sync = threading.Event()
+    if not args.no_sync:
+        threading.Thread(
+            target=sync_periodically, name="gallery-sync", daemon=True,
+            args=(args.server, token, args.class_id, index_path, args.sync_interval, stop_sync),
+        ).start()
+
+    source = int(args.camera) if args.camera.isdigit() else args.camera
+    camera = LatestFrameGrabber(source).start()
+
+    try:
+        recognize_student_face.recognize_faces_live(
+            None, None, args.class_id, args.professor_id, camera=camera, on_recognized=uploader.add,
+            stop_event=stop_live
+        )
+    finally:
+        stop_sync.set()
+        uploader.close()
+        print(f"📊 Batches sent: {uploader.batches_sent}, retries: {uploader.retries}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
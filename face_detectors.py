@@ -0,0 +1,500 @@
+"""
+face_detectors.py
+Pluggable Face Detector Backends
+
+Purpose:
+Face detection is the most expensive step of every recognition pass. This
+module puts all detectors behind one small interface so the rest of the
+system (live sessions, face login, registration) can switch backends per
+deployment without touching the recognition code.
+
+🔧 Available Backends:
+- "hog"     → dlib HOG via face_recognition (CPU friendly, the old default)
+- "cnn"     → dlib CNN via face_recognition (accurate, very slow without a GPU)
+- "haar"    → OpenCV's bundled Haar cascade (very cheap, more false positives)
+- "dnn"     → OpenCV's res10 SSD face detector (needs the Caffe model files)
+- "<cheap>+<accurate>" → cascade mode, e.g. "haar+hog" or "haar+cnn".
+  The cheap detector proposes candidate regions and only those crops are
+  passed to the accurate detector.
+
+Any backend can additionally be wrapped in a `TiledDetector` for
+high-resolution lecture-hall cameras: the frame is split into overlapping
+tiles that are detected in parallel (each worker thread with its own
+detector instance) and merged with non-maximum suppression.
+
+Every detector returns boxes in the face_recognition format
+`(top, right, bottom, left)` so the result can be passed directly to
+`face_recognition.face_encodings()`.
+
+Configuration (environment variables):
+- FACE_DETECTOR_BACKEND        → backend for live sessions and face login (default "hog")
+- FACE_REGISTRATION_DETECTOR   → backend used when registering students (default "cnn")
+- OPENCV_DNN_PROTOTXT / OPENCV_DNN_MODEL → paths to the res10 SSD files
+- FACE_TILE_SIZE               → tile edge in pixels for live sessions (0 = tiling off)
+- FACE_TILE_OVERLAP            → overlap between neighbouring tiles in pixels
+- FACE_TILE_WORKERS            → number of parallel tile workers
+- FACE_TILE_SKIP_IDLE          → "1" to skip tiles without recent faces or motion
+"""
+
+# IMPORTS
+import os  # Read the per-deployment backend configuration
+import threading  # One backend detector per tile worker thread
+from concurrent.futures import ThreadPoolExecutor  # Detect tiles in parallel
+import cv2  # OpenCV detectors (Haar cascade and DNN)
+import numpy as np  # Box arithmetic for cascade crops and suppression
+import face_recognition  # dlib HOG / CNN detectors
+
+
+# DETECTOR CONFIGURATION
+FACE_DETECTOR_BACKEND = os.getenv("FACE_DETECTOR_BACKEND", "hog")
+FACE_REGISTRATION_DETECTOR = os.getenv("FACE_REGISTRATION_DETECTOR", "cnn")
+
+# Tiled detection for 4K lecture-hall cameras (disabled when the tile size is 0)
+FACE_TILE_SIZE = int(os.getenv("FACE_TILE_SIZE", "0"))
+FACE_TILE_OVERLAP = int(os.getenv("FACE_TILE_OVERLAP", "160"))
+FACE_TILE_WORKERS = int(os.getenv("FACE_TILE_WORKERS", str(os.cpu_count() or 1)))
+FACE_TILE_SKIP_IDLE = os.getenv("FACE_TILE_SKIP_IDLE", "0") == "1"
+
+# Default location of the OpenCV res10 SSD model (not shipped with pip wheels)
+OPENCV_DNN_PROTOTXT = os.getenv("OPENCV_DNN_PROTOTXT", "models/deploy.prototxt")
+OPENCV_DNN_MODEL = os.getenv("OPENCV_DNN_MODEL", "models/res10_300x300_ssd_iter_140000.caffemodel")
+
+
+def box_iou(box_a, box_b):
+    """
+    Intersection-over-union of two `(top, right, bottom, left)` boxes.
+    Returns a float between 0 (no overlap) and 1 (identical boxes).
+    """
+    top = max(box_a[0], box_b[0])
+    right = min(box_a[1], box_b[1])
+    bottom = min(box_a[2], box_b[2])
+    left = max(box_a[3], box_b[3])
+
+    intersection = max(0, right - left) * max(0, bottom - top)
+    if intersection == 0:
+        return 0.0
+
+    area_a = (box_a[1] - box_a[3]) * (box_a[2] - box_a[0])
+    area_b = (box_b[1] - box_b[3]) * (box_b[2] - box_b[0])
+    return intersection / float(area_a + area_b - intersection)
+
+
+def non_max_suppression(boxes, iou_threshold=0.4):
+    """
+    Removes duplicate detections of the same face.
+
+    Boxes are visited from largest to smallest and a box is dropped if it
+    overlaps an already kept box by more than `iou_threshold`.
+
+    Parameters:
+    - boxes: list of `(top, right, bottom, left)` tuples
+    - iou_threshold: overlap above which two boxes are considered the same face
+
+    Returns:
+    - list of the boxes that were kept
+    """
+    ordered = sorted(boxes, key=lambda b: (b[1] - b[3]) * (b[2] - b[0]), reverse=True)
+    kept = []
+    for box in ordered:
+        if all(box_iou(box, other) <= iou_threshold for other in kept):
+            kept.append(box)
+    return kept
+
+
+def detect_in_regions(detector, rgb_image, regions):
+    """
+    Runs `detector` only inside the given `(top, right, bottom, left)` regions
+    and returns the boxes in full-frame coordinates.
+
+    Used by the cascade detector (regions proposed by a cheap detector) and by
+    the live motion gate (regions where the picture changed).
+    """
+    boxes = []
+    for top, right, bottom, left in regions:
+        crop = np.ascontiguousarray(rgb_image[top:bottom, left:right])
+
+        # Offset the crop-relative boxes back to full-frame coordinates
+        for c_top, c_right, c_bottom, c_left in detector.detect(crop):
+            boxes.append((c_top + top, c_right + left, c_bottom + top, c_left + left))
+
+    # Overlapping regions can find the same face twice
+    return non_max_suppression(boxes)
+
+
+class FaceDetector:
+    """
+    Base interface shared by every detector backend.
+
+    Subclasses implement `detect()`, which receives an RGB image
+    (as produced by `cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)`) and returns a
+    list of `(top, right, bottom, left)` boxes.
+    """
+
+    name = "base"
+
+    def detect(self, rgb_image):
+        raise NotImplementedError
+
+    def __repr__(self):
+        return f"<{self.__class__.__name__} {self.name}>"
+
+
+class DlibHogDetector(FaceDetector):
+    """dlib HOG detector — the default used by live sessions and face login."""
+
+    name = "hog"
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+
+    def detect(self, rgb_image):
+        return face_recognition.face_locations(
+            rgb_image, number_of_times_to_upsample=self.upsample, model="hog"
+        )
+
+
+class DlibCnnDetector(FaceDetector):
+    """dlib CNN detector — most accurate, but slow on CPU-only machines."""
+
+    name = "cnn"
+
+    def __init__(self, upsample=1):
+        self.upsample = upsample
+
+    def detect(self, rgb_image):
+        return face_recognition.face_locations(
+            rgb_image, number_of_times_to_upsample=self.upsample, model="cnn"
+        )
+
+
+class HaarCascadeDetector(FaceDetector):
+    """
+    OpenCV Haar cascade bundled with opencv-python.
+    Very cheap, which makes it a good prefilter for the dlib detectors.
+    """
+
+    name = "haar"
+
+    def __init__(self, scale_factor=1.1, min_neighbors=5, min_size=(30, 30)):
+        cascade_path = os.path.join(cv2.data.haarcascades, "haarcascade_frontalface_default.xml")
+        self.classifier = cv2.CascadeClassifier(cascade_path)
+        if self.classifier.empty():
+            raise RuntimeError(f"❌ Could not load Haar cascade from {cascade_path}")
+
+        self.scale_factor = scale_factor
+        self.min_neighbors = min_neighbors
+        self.min_size = min_size
+
+    def detect(self, rgb_image):
+        gray = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2GRAY)
+        faces = self.classifier.detectMultiScale(
+            gray,
+            scaleFactor=self.scale_factor,
+            minNeighbors=self.min_neighbors,
+            minSize=self.min_size,
+        )
+        # OpenCV returns (x, y, w, h) → convert to (top, right, bottom, left)
+        return [(int(y), int(x + w), int(y + h), int(x)) for (x, y, w, h) in faces]
+
+
+class OpenCVDnnDetector(FaceDetector):
+    """
+    OpenCV res10 SSD face detector (ResNet-10 backbone, 300x300 input).
+    Much more robust than Haar to pose and lighting, still far cheaper than dlib CNN.
+    """
+
+    name = "dnn"
+
+    def __init__(self, prototxt=OPENCV_DNN_PROTOTXT, model=OPENCV_DNN_MODEL, confidence=0.5):
+        if not (os.path.exists(prototxt) and os.path.exists(model)):
+            raise RuntimeError(
+                f"❌ OpenCV DNN model not found ({prototxt}, {model}). "
+                "Set OPENCV_DNN_PROTOTXT and OPENCV_DNN_MODEL."
+            )
+        self.net = cv2.dnn.readNetFromCaffe(prototxt, model)
+        self.confidence = confidence
+
+    def detect(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+
+        # The model was trained on BGR input with these mean values
+        bgr_image = cv2.cvtColor(rgb_image, cv2.COLOR_RGB2BGR)
+        blob = cv2.dnn.blobFromImage(
+            cv2.resize(bgr_image, (300, 300)), 1.0, (300, 300), (104.0, 177.0, 123.0)
+        )
+        self.net.setInput(blob)
+        detections = self.net.forward()
+
+        boxes = []
+        for i in range(detections.shape[2]):
+            if detections[0, 0, i, 2] < self.confidence:
+                continue
+            x1, y1, x2, y2 = (detections[0, 0, i, 3:7] * np.array([width, height, width, height])).astype(int)
+            x1, y1 = max(0, x1), max(0, y1)
+            x2, y2 = min(width, x2), min(height, y2)
+            if x2 > x1 and y2 > y1:
+                boxes.append((int(y1), int(x2), int(y2), int(x1)))
+        return boxes
+
+
+class CascadeDetector(FaceDetector):
+    """
+    Two-stage detector: a cheap prefilter proposes candidate regions and the
+    accurate detector only runs on those crops.
+
+    On a typical classroom frame the faces cover a small fraction of the
+    image, so running dlib on a handful of crops is much cheaper than
+    running it on the whole frame. Frames where the prefilter finds nothing
+    skip the accurate detector entirely.
+    """
+
+    def __init__(self, prefilter, accurate, margin=0.5):
+        self.prefilter = prefilter
+        self.accurate = accurate
+        self.margin = margin  # Extra context around each candidate, as a fraction of its size
+        self.name = f"{prefilter.name}+{accurate.name}"
+
+    def _expand(self, box, height, width):
+        """Grow a candidate box by `margin` on each side, clipped to the image."""
+        top, right, bottom, left = box
+        pad_y = int((bottom - top) * self.margin)
+        pad_x = int((right - left) * self.margin)
+        return (
+            max(0, top - pad_y),
+            min(width, right + pad_x),
+            min(height, bottom + pad_y),
+            max(0, left - pad_x),
+        )
+
+    def detect(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+
+        candidates = self.prefilter.detect(rgb_image)
+        if not candidates:
+            return []
+
+        regions = [self._expand(candidate, height, width) for candidate in candidates]
+        return detect_in_regions(self.accurate, rgb_image, regions)
+
+
+class TiledDetector(FaceDetector):
+    """
+    Runs a detector over overlapping tiles of a high-resolution frame.
+
+    Downscaling a 4K frame makes faces in the back rows too small to find,
+    while detecting on the full frame is very slow. Tiles keep the native
+    resolution, can be processed by several workers at once, and the
+    overlap (which should be at least the size of the largest expected face)
+    ensures every face lies fully inside at least one tile. Duplicate boxes
+    from neighbouring tiles are merged with non-maximum suppression.
+
+    With `skip_idle=True` a tile is only re-detected if it contained a face
+    in the last `idle_frames` frames or its pixels changed; every tile is
+    still re-scanned once every `rescan_interval` frames so new arrivals are
+    picked up. Because of this history, use one instance per camera.
+
+    The backend is given by name (e.g. "hog" or "haar+hog"): every tile worker
+    thread builds its own detector with `create_detector()`, because OpenCV
+    cascades and DNN nets keep per-call state and must not run concurrently.
+    """
+
+    def __init__(self, backend, tile_size=1024, overlap=160, workers=4,
+                 skip_idle=False, idle_frames=15, rescan_interval=30,
+                 motion_threshold=8.0, full_frame_scale=None):
+        if overlap >= tile_size:
+            raise ValueError("Tile overlap must be smaller than the tile size.")
+
+        self.backend = backend
+        self._local = threading.local()  # Tile worker thread → its own backend detector
+        self.tile_size = tile_size
+        self.overlap = overlap
+        self.skip_idle = skip_idle
+        self.idle_frames = idle_frames
+        self.rescan_interval = rescan_interval
+        self.motion_threshold = motion_threshold  # Mean absolute grey-level change that counts as motion
+        self.full_frame_scale = full_frame_scale  # Optional downscaled pass for very large (front row) faces
+        self.name = f"tiled({backend.strip().lower()})"
+
+        self.executor = ThreadPoolExecutor(max_workers=max(1, workers))
+
+        # Per-tile state, reset whenever the frame size changes
+        self._tiles = []
+        self._frame_shape = None
+        self._frames_since_face = []
+        self._previous_thumbnails = []
+        self._frame_count = 0
+
+        # Counters for the dashboard / debugging
+        self.tiles_detected = 0
+        self.tiles_skipped = 0
+
+    @staticmethod
+    def _tile_starts(length, tile_size, stride):
+        """Start offsets along one axis so tiles cover the whole axis."""
+        if length <= tile_size:
+            return [0]
+        starts = list(range(0, length - tile_size, stride))
+        starts.append(length - tile_size)  # Last tile ends exactly at the border
+        return starts
+
+    def _layout(self, height, width):
+        """Computes (and caches) the tile grid for a frame size."""
+        if self._frame_shape == (height, width):
+            return
+
+        stride = self.tile_size - self.overlap
+        self._tiles = [
+            (top, min(width, left + self.tile_size), min(height, top + self.tile_size), left)
+            for top in self._tile_starts(height, self.tile_size, stride)
+            for left in self._tile_starts(width, self.tile_size, stride)
+        ]
+        self._frame_shape = (height, width)
+        self._frames_since_face = [self.idle_frames] * len(self._tiles)  # No history yet
+        self._previous_thumbnails = [None] * len(self._tiles)
+        print(f"🧩 Tiled detection: {len(self._tiles)} tiles of {self.tile_size}px for {width}x{height} frames")
+
+    def _tile_changed(self, index, tile_img):
+        """Cheap motion check on a 32x32 greyscale thumbnail of the tile."""
+        thumbnail = cv2.resize(cv2.cvtColor(tile_img, cv2.COLOR_RGB2GRAY), (32, 32),
+                               interpolation=cv2.INTER_AREA).astype(np.int16)
+        previous = self._previous_thumbnails[index]
+        self._previous_thumbnails[index] = thumbnail
+        if previous is None:
+            return True
+        return float(np.mean(np.abs(thumbnail - previous))) > self.motion_threshold
+
+    def _base(self):
+        """This worker thread's own backend detector (built on its first tile)."""
+        detector = getattr(self._local, "detector", None)
+        if detector is None:
+            detector = self._local.detector = create_detector(self.backend)
+        return detector
+
+    def _detect_tile(self, rgb_image, tile):
+        """Detects faces in one tile and returns them in full-frame coordinates."""
+        top, right, bottom, left = tile
+        crop = np.ascontiguousarray(rgb_image[top:bottom, left:right])
+        return [
+            (t + top, r + left, b + top, l + left)
+            for (t, r, b, l) in self._base().detect(crop)
+        ]
+
+    def _detect_full_frame(self, rgb_image):
+        """Downscaled full-frame pass that catches faces larger than the tile overlap."""
+        scale = self.full_frame_scale
+        small = cv2.resize(rgb_image, (0, 0), fx=scale, fy=scale)
+        return [
+            (int(t / scale), int(r / scale), int(b / scale), int(l / scale))
+            for (t, r, b, l) in self._base().detect(small)
+        ]
+
+    def detect(self, rgb_image):
+        height, width = rgb_image.shape[:2]
+        self._layout(height, width)
+        self._frame_count += 1
+        full_rescan = self._frame_count % self.rescan_interval == 0
+
+        # Pick the tiles worth detecting on this frame
+        selected = []
+        for index, tile in enumerate(self._tiles):
+            top, right, bottom, left = tile
+            changed = self._tile_changed(index, rgb_image[top:bottom, left:right]) if self.skip_idle else True
+            recently_active = self._frames_since_face[index] < self.idle_frames
+            if not self.skip_idle or full_rescan or changed or recently_active:
+                selected.append(index)
+
+        self.tiles_skipped += len(self._tiles) - len(selected)
+        self.tiles_detected += len(selected)
+
+        # Detect the selected tiles in parallel
+        futures = {index: self.executor.submit(self._detect_tile, rgb_image, self._tiles[index])
+                   for index in selected}
+        full_frame_future = (self.executor.submit(self._detect_full_frame, rgb_image)
+                             if self.full_frame_scale else None)
+
+        boxes = []
+        for index in range(len(self._tiles)):
+            if index in futures:
+                tile_boxes = futures[index].result()
+                boxes.extend(tile_boxes)
+                self._frames_since_face[index] = 0 if tile_boxes else self._frames_since_face[index] + 1
+            else:
+                self._frames_since_face[index] += 1
+
+        if full_frame_future is not None:
+            boxes.extend(full_frame_future.result())
+
+        return non_max_suppression(boxes)
+
+    def close(self):
+        """Stops the tile worker threads."""
+        self.executor.shutdown(wait=False)
+
+
+# BACKEND REGISTRY
+DETECTOR_BACKENDS = {
+    "hog": DlibHogDetector,
+    "cnn": DlibCnnDetector,
+    "haar": HaarCascadeDetector,
+    "dnn": OpenCVDnnDetector,
+}
+
+# Detectors are reused — loading models is expensive — but never shared between threads:
+# OpenCV cascades and DNN nets keep per-call state, so every thread gets its own instances
+_detector_cache = threading.local()
+
+
+def create_detector(backend):
+    """
+    Builds a new detector from a backend name such as "hog" or "haar+cnn".
+    Raises ValueError for unknown backend names.
+    """
+    backend = backend.strip().lower()
+
+    if "+" in backend:
+        prefilter_name, accurate_name = backend.split("+", 1)
+        return CascadeDetector(create_detector(prefilter_name), create_detector(accurate_name))
+
+    if backend not in DETECTOR_BACKENDS:
+        raise ValueError(
+            f"Unknown face detector backend '{backend}'. "
+            f"Choose one of {sorted(DETECTOR_BACKENDS)} or '<cheap>+<accurate>'."
+        )
+    return DETECTOR_BACKENDS[backend]()
+
+
+def get_detector(backend=None):
+    """
+    Returns this thread's detector instance for `backend`
+    (defaults to the deployment-wide FACE_DETECTOR_BACKEND).
+    """
+    backend = backend or FACE_DETECTOR_BACKEND
+    detectors = getattr(_detector_cache, "detectors", None)
+    if detectors is None:
+        detectors = _detector_cache.detectors = {}
+    if backend not in detectors:
+        detectors[backend] = create_detector(backend)
+        print(f"🔍 Face detector ready: {detectors[backend].name}")
+    return detectors[backend]
+
+
+def get_live_detector():
+    """
+    Returns a new detector owned by one live session (concurrent sessions
+    never share an instance).
+
+    When FACE_TILE_SIZE is set it is a TiledDetector (tiling keeps per-camera
+    history, and its worker threads build their own backend detectors).
+    """
+    if FACE_TILE_SIZE <= 0:
+        detector = create_detector(FACE_DETECTOR_BACKEND)
+        print(f"🔍 Face detector ready: {detector.name}")
+        return detector
+
+    return TiledDetector(
+        FACE_DETECTOR_BACKEND,
+        tile_size=FACE_TILE_SIZE,
+        overlap=FACE_TILE_OVERLAP,
+        workers=FACE_TILE_WORKERS,
+        skip_idle=FACE_TILE_SKIP_IDLE,
+    )
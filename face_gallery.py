@@ -0,0 +1,379 @@
+"""
+face_gallery.py
+Compact In-Memory Face Gallery
+
+Purpose:
+Holds every known face encoding (the "gallery") and matches detected faces
+against it. The old code kept the gallery as float64 — about 1 KB per
+128-d sample, or ~300 MB per worker process for 300k samples. The gallery
+is now stored and matched in float32 by default, with optional smaller
+storage modes:
+
+- "float32" → 512 bytes per sample, exact matching (default)
+- "float16" → 256 bytes per sample
+- "int8"    → 128 bytes per sample (per-dimension scalar quantization)
+
+(plus 8 bytes per sample for the label and the precomputed squared norm)
+
+In the quantized modes all distances are first computed on the compact
+copy (widened to float32 chunk by chunk), then the best `rerank_k` candidates are
+re-ranked with exact float32 distances. The float32 vectors used for
+re-ranking can live outside the process heap (e.g. a memory-mapped file),
+otherwise the dequantized candidates are used.
+
+Configuration (environment variables):
+- FACE_GALLERY_DTYPE → "float32" (default), "float16" or "int8"
+- FACE_GALLERY_RERANK_K → number of candidates re-ranked in float32 (default 16)
+- FACE_GALLERY_PATH → index file of the memory-mapped gallery (default "face_gallery.index.json")
+
+🔧 Memory-mapped gallery file:
+`write_gallery_file()` persists the gallery as `.npy` arrays (float32
+vectors and their squared norms) plus a small JSON index with the
+enrollments and sample counts. `FaceGallery.from_gallery_file()` maps the
+arrays read-only, so every process on the host shares one page-cache copy
+and startup is an mmap instead of a JSON parse. Updates are written to new
+versioned `.npy` files and published by atomically replacing the index, so
+a reader never sees a half-written gallery; processes that still map the
+previous version keep using it until they reload.
+"""
+
+# IMPORTS
+import os  # Read the gallery configuration, atomic file replacement
+import json  # Load the JSON face model and the gallery index
+import time  # Gallery file versions
+import numpy as np  # Vector storage and distance computation
+
+
+# GALLERY CONFIGURATION
+FACE_GALLERY_DTYPE = os.getenv("FACE_GALLERY_DTYPE", "float32")
+FACE_GALLERY_RERANK_K = int(os.getenv("FACE_GALLERY_RERANK_K", "16"))
+ENCODING_SIZE = 128  # face_recognition / dlib embedding size
+DEFAULT_SAMPLES_PER_STUDENT = 20  # Registration captures 20 samples per student
+GALLERY_MODES = ("float32", "float16", "int8")
+FACE_GALLERY_PATH = os.getenv("FACE_GALLERY_PATH", "face_gallery.index.json")
+GALLERY_FILES_KEPT = 2  # Versions kept on disk so readers mapping the previous one are not disturbed
+
+
+class FaceGallery:
+    """
+    Gallery of face encodings with the enrollment each sample belongs to.
+
+    Attributes:
+    - enrollments: list of enrollment IDs (one per student)
+    - labels: int32 array, index into `enrollments` for every sample
+    - vectors: samples in the storage dtype (float32, float16 or int8)
+    """
+
+    def __init__(self, encodings, labels, enrollments, mode=FACE_GALLERY_DTYPE,
+                 rerank_k=FACE_GALLERY_RERANK_K, rerank_source=None, chunk_size=16384,
+                 squared_norms=None):
+        if mode not in GALLERY_MODES:
+            raise ValueError(f"Unknown gallery mode '{mode}'. Choose one of {GALLERY_MODES}.")
+
+        self.mode = mode
+        self.enrollments = list(enrollments)
+        self.labels = np.asarray(labels, dtype=np.int32)
+        self.rerank_k = rerank_k
+        self.chunk_size = chunk_size  # Rows dequantized at a time in the quantized modes
+        self.version = None  # Set when loaded from a gallery file
+
+        # No copy when `encodings` already is a float32 array (e.g. a read-only memmap)
+        mapped = encodings if isinstance(encodings, np.memmap) else None
+        encodings = np.asarray(encodings, dtype=np.float32).reshape(-1, ENCODING_SIZE)
+
+        # Quantization parameters (int8 only)
+        self.offset = None
+        self.scale = None
+
+        if mode == "float32":
+            self.vectors = np.ascontiguousarray(encodings)
+        elif mode == "float16":
+            self.vectors = encodings.astype(np.float16)
+        else:
+            self.vectors = self._quantize_int8(encodings)
+
+        # |g|² per (stored) sample, so distances need one matrix-vector product and no N×128 temporary
+        if squared_norms is not None and mode == "float32":
+            self._squared_norms = squared_norms  # Precomputed (shared from the gallery file)
+        else:
+            self._squared_norms = np.empty(len(self.vectors), dtype=np.float32)
+            for start in range(0, len(self.vectors), chunk_size):
+                chunk = self._dequantize(self.vectors[start:start + chunk_size])
+                self._squared_norms[start:start + len(chunk)] = np.einsum("ij,ij->i", chunk, chunk)
+
+        # Optional exact vectors for re-ranking (float32, may be a np.memmap)
+        if rerank_source is None and mode != "float32" and mapped is not None:
+            rerank_source = mapped
+        self.rerank_source = rerank_source
+
+    # Construction helpers
+
+    @classmethod
+    def from_model_data(cls, model_data, **kwargs):
+        """
+        Builds a gallery from the `face_recognition_model.json` structure:
+        `{"encodings": [...], "enrollments": [...]}`.
+
+        `encodings` may hold one list of samples per student (any number of
+        samples each) or a flat list of 128-d vectors, in which case every
+        DEFAULT_SAMPLES_PER_STUDENT consecutive samples belong to one student.
+        """
+        enrollments = model_data["enrollments"]
+        raw = model_data["encodings"]
+
+        vectors = []
+        labels = []
+        if raw and np.ndim(raw[0]) == 2:
+            # One list of samples per student
+            for student_index, samples in enumerate(raw):
+                vectors.extend(samples)
+                labels.extend([student_index] * len(samples))
+        else:
+            vectors = raw
+            labels = [i // DEFAULT_SAMPLES_PER_STUDENT for i in range(len(raw))]
+
+        return cls(np.asarray(vectors, dtype=np.float32).reshape(-1, ENCODING_SIZE), labels, enrollments, **kwargs)
+
+    @classmethod
+    def from_model_file(cls, path, **kwargs):
+        """Loads a gallery from a JSON face model file."""
+        with open(path, "r") as f:
+            return cls.from_model_data(json.load(f), **kwargs)
+
+    @classmethod
+    def from_gallery_file(cls, index_path=FACE_GALLERY_PATH, **kwargs):
+        """
+        Maps a gallery written by `write_gallery_file()`.
+
+        The float32 vectors and squared norms are read-only memmaps shared with
+        every other process on the host. In the quantized modes the compact
+        copy is private and the mapped float32 vectors are used for re-ranking.
+        """
+        directory = os.path.dirname(os.path.abspath(index_path))
+        for attempt in range(3):
+            with open(index_path, "r") as f:
+                index = json.load(f)
+            try:
+                vectors = np.load(os.path.join(directory, index["vectors"]), mmap_mode="r")
+                norms = np.load(os.path.join(directory, index["norms"]), mmap_mode="r")
+                break
+            except FileNotFoundError:
+                # Two updates were published between reading the index and mapping its files
+                if attempt == 2:
+                    raise
+        labels = np.repeat(np.arange(len(index["counts"]), dtype=np.int32), index["counts"])
+
+        gallery = cls(vectors, labels, index["enrollments"], squared_norms=norms, **kwargs)
+        gallery.version = index["version"]
+        return gallery
+
+    def is_stale(self, index_path=FACE_GALLERY_PATH):
+        """True if a newer gallery version has been published at `index_path`."""
+        try:
+            with open(index_path, "r") as f:
+                return json.load(f)["version"] != self.version
+        except (OSError, ValueError, KeyError):
+            return False
+
+    # Quantization
+
+    def _quantize_int8(self, encodings):
+        """Per-dimension affine quantization of float32 encodings to int8."""
+        if len(encodings) == 0:
+            self.offset = np.zeros(ENCODING_SIZE, dtype=np.float32)
+            self.scale = np.ones(ENCODING_SIZE, dtype=np.float32)
+            return np.zeros((0, ENCODING_SIZE), dtype=np.int8)
+
+        low = encodings.min(axis=0)
+        high = encodings.max(axis=0)
+        self.scale = np.maximum((high - low) / 255.0, 1e-8).astype(np.float32)
+        self.offset = low.astype(np.float32)
+        quantized = np.round((encodings - self.offset) / self.scale) - 128
+        return np.clip(quantized, -128, 127).astype(np.int8)
+
+    def _dequantize(self, rows):
+        """Converts stored rows back to float32."""
+        if self.mode == "float32":
+            return rows
+        if self.mode == "float16":
+            return rows.astype(np.float32)
+        return (rows.astype(np.float32) + 128.0) * self.scale + self.offset
+
+    # Matching
+
+    def __len__(self):
+        return len(self.vectors)
+
+    @property
+    def nbytes(self):
+        """Bytes held by the gallery vectors, labels and norms (memmapped parts are shared)."""
+        return self.vectors.nbytes + self.labels.nbytes + self._squared_norms.nbytes
+
+    def distances(self, encoding):
+        """Euclidean distance from `encoding` to every sample (float32 array)."""
+        query = np.asarray(encoding, dtype=np.float32)
+
+        # |g - q|² = |g|² - 2 g·q + |q|²
+        if self.mode == "float32":
+            dots = self.vectors @ query
+        else:
+            # Quantized modes: widen a chunk at a time to keep memory bounded.
+            # For int8, g·q = v·(scale*q) + (128*scale + offset)·q, so the codes
+            # never need to be fully dequantized.
+            if self.mode == "int8":
+                weights = self.scale * query
+                constant = float(np.dot(128.0 * self.scale + self.offset, query))
+            else:
+                weights, constant = query, 0.0
+            dots = np.empty(len(self.vectors), dtype=np.float32)
+            for start in range(0, len(self.vectors), self.chunk_size):
+                chunk = self.vectors[start:start + self.chunk_size].astype(np.float32)
+                dots[start:start + len(chunk)] = chunk @ weights + constant
+
+        squared = self._squared_norms - 2.0 * dots + np.dot(query, query)
+        return np.sqrt(np.maximum(squared, 0.0))
+
+    def nearest(self, encoding):
+        """
+        Returns `(sample_index, distance)` of the closest sample, or `(None, inf)`
+        for an empty gallery. Quantized modes re-rank the top candidates in float32.
+        """
+        if len(self.vectors) == 0:
+            return None, float("inf")
+
+        distances = self.distances(encoding)
+
+        if self.mode == "float32":
+            best = int(np.argmin(distances))
+            return best, float(distances[best])
+
+        # Re-rank the best `rerank_k` candidates with exact float32 vectors
+        k = min(self.rerank_k, len(distances))
+        candidates = np.sort(np.argpartition(distances, k - 1)[:k])  # Sorted → sequential reads from a memmap
+        if self.rerank_source is not None:
+            exact = np.asarray(self.rerank_source[candidates], dtype=np.float32)
+        else:
+            exact = self._dequantize(self.vectors[candidates])
+
+        exact_distances = np.linalg.norm(exact - np.asarray(encoding, dtype=np.float32), axis=1)
+        best = int(np.argmin(exact_distances))
+        return int(candidates[best]), float(exact_distances[best])
+
+    def match(self, encoding, tolerance=0.6):
+        """
+        Matches one face encoding against the gallery.
+
+        Returns:
+            (enrollment, distance) if the closest sample is within `tolerance`,
+            otherwise (None, distance).
+        """
+        index, distance = self.nearest(encoding)
+        if index is None or distance > tolerance:
+            return None, distance
+
+        student_index = self.labels[index]
+        if student_index >= len(self.enrollments):
+            return None, distance
+        return self.enrollments[student_index], distance
+
+
+def write_gallery_file(model_data, index_path=FACE_GALLERY_PATH, extra=None):
+    """
+    Persists a gallery for memory-mapped loading and publishes it atomically.
+
+    `model_data` has the `face_recognition_model.json` structure. The arrays
+    are written to new versioned files first; only then is the index replaced
+    (os.replace is atomic), so readers see either the old or the new gallery.
+    `extra` is stored in the index as well (e.g. the synced version of an edge
+    node). Returns the new version.
+    """
+    gallery = FaceGallery.from_model_data(model_data, mode="float32")
+    counts = np.bincount(gallery.labels, minlength=len(gallery.enrollments)).tolist()
+
+    directory = os.path.dirname(os.path.abspath(index_path))
+    stem = os.path.basename(index_path).split(".")[0]
+    version = time.time_ns()
+    vectors_name = f"{stem}.{version}.vectors.npy"
+    norms_name = f"{stem}.{version}.norms.npy"
+
+    # Samples must be grouped by student for the counts to describe them
+    order = np.argsort(gallery.labels, kind="stable")
+    for name, array in ((vectors_name, gallery.vectors[order]), (norms_name, gallery._squared_norms[order])):
+        with open(os.path.join(directory, name), "wb") as f:
+            np.save(f, array)
+            f.flush()
+            os.fsync(f.fileno())
+
+    index = {
+        "version": version,
+        "vectors": vectors_name,
+        "norms": norms_name,
+        "enrollments": gallery.enrollments,
+        "counts": counts,
+    }
+    index.update(extra or {})
+    temp_path = f"{index_path}.tmp"
+    with open(temp_path, "w") as f:
+        json.dump(index, f)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, index_path)
+
+    _remove_old_gallery_files(directory, stem)
+    print(f"💾 Gallery version {version} written: {len(gallery)} samples, {len(gallery.enrollments)} students")
+    return version
+
+
+def read_gallery_index(index_path=FACE_GALLERY_PATH):
+    """The gallery index as a dict, or None if no gallery file has been written yet."""
+    try:
+        with open(index_path, "r") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def publish_model_file(model_path="face_recognition_model.json", index_path=FACE_GALLERY_PATH):
+    """Republishes the shared gallery from the JSON model (call after retraining)."""
+    with open(model_path, "r") as f:
+        return write_gallery_file(json.load(f), index_path)
+
+
+def _remove_old_gallery_files(directory, stem, keep=GALLERY_FILES_KEPT):
+    """
+    Deletes all but the newest `keep` gallery versions. On POSIX a process that
+    still maps a deleted file keeps its pages until it reloads.
+    """
+    versions = set()
+    for name in os.listdir(directory):
+        parts = name.split(".")
+        if len(parts) == 4 and parts[0] == stem and parts[1].isdigit() and parts[3] == "npy":
+            versions.add(int(parts[1]))
+
+    for version in sorted(versions)[:-keep]:
+        for kind in ("vectors", "norms"):
+            try:
+                os.remove(os.path.join(directory, f"{stem}.{version}.{kind}.npy"))
+            except OSError:
+                pass  # Still open on a platform that does not allow deleting it
+
+
+def load_gallery(index_path=FACE_GALLERY_PATH, model_path="face_recognition_model.json", **kwargs):
+    """
+    Loads the shared memory-mapped gallery, building the gallery file from the
+    JSON model first if it does not exist yet (or the JSON model is newer).
+    """
+    index_exists = os.path.exists(index_path)
+    model_newer = os.path.exists(model_path) and (
+        not index_exists or os.path.getmtime(model_path) > os.path.getmtime(index_path)
+    )
+    if model_newer:
+        publish_model_file(model_path, index_path)
+    return FaceGallery.from_gallery_file(index_path, **kwargs)
+
+
+def memory_report(gallery):
+    """Human readable memory usage of a gallery (used by the benchmark report)."""
+    megabytes = gallery.nbytes / (1024 * 1024)
+    per_sample = gallery.nbytes / len(gallery) if len(gallery) else 0
+    return f"{gallery.mode}: {len(gallery)} samples, {megabytes:.1f} MB ({per_sample:.0f} bytes/sample)"
@@ -0,0 +1,181 @@
+"""
+face_login.py
+Face Login from Browser-Uploaded Images
+
+Purpose:
+Camera-based face login needs a camera attached to the server, and every
+student logging in queues for that one device. Here the browser captures
+the picture and uploads it as a JPEG; decoding, face detection and
+encoding run in a pool of worker processes, so face login scales with the
+server's cores instead of with the number of cameras. The resulting
+encoding is matched in the web process against the cached face gallery.
+
+🔧 Key Features:
+- Process pool with the detector and dlib models loaded once per worker.
+- Large uploads are downscaled before detection (FACE_LOGIN_MAX_SIDE).
+- Every request has a time budget (FACE_LOGIN_BUDGET); when it runs out
+  the request fails instead of piling up behind slower ones.
+- A bounded number of in-flight requests; beyond that new logins are
+  rejected right away as "busy".
+
+Configuration (environment variables):
+- FACE_LOGIN_WORKERS → worker processes (default: number of CPU cores)
+- FACE_LOGIN_BUDGET → seconds per login request (default 3)
+- FACE_LOGIN_MAX_SIDE → longest image side used for detection (default 960)
+- FACE_LOGIN_MAX_BYTES → largest accepted upload (default 5 MB)
+"""
+
+# IMPORTS
+import os  # Worker count and configuration
+import atexit  # Stop the worker pool with the web process
+import threading  # Pool creation and in-flight request limit
+import time  # Per-request timing
+import multiprocessing  # Spawn context for the worker processes
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeout  # Worker pool
+from concurrent.futures.process import BrokenProcessPool  # A worker died (e.g. out of memory)
+
+import cv2  # JPEG decoding and resizing
+import numpy as np  # Image buffers
+
+
+# FACE LOGIN CONFIGURATION
+FACE_LOGIN_WORKERS = int(os.getenv("FACE_LOGIN_WORKERS", str(os.cpu_count() or 2)))
+FACE_LOGIN_BUDGET = float(os.getenv("FACE_LOGIN_BUDGET", "3"))
+FACE_LOGIN_MAX_SIDE = int(os.getenv("FACE_LOGIN_MAX_SIDE", "960"))
+FACE_LOGIN_MAX_BYTES = int(os.getenv("FACE_LOGIN_MAX_BYTES", str(5 * 1024 * 1024)))
+
+
+class FaceLoginError(Exception):
+    """
+    Raised when an uploaded login image cannot be processed.
+    `status` is the HTTP status to answer with: 400 for bad uploads,
+    503 when the server is busy or the time budget ran out.
+    """
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# WORKER PROCESS SIDE
+
+_worker_detector = None  # Detector loaded once per worker process
+
+
+def _init_worker():
+    """Loads the detector and dlib models in the worker before its first request."""
+    global _worker_detector
+
+    import face_recognition  # Loads dlib's models
+    from face_detectors import get_detector
+
+    _worker_detector = get_detector()
+
+    # Warm-up pass so the first real login does not pay for lazy initialization
+    blank = np.zeros((480, 640, 3), dtype=np.uint8)
+    _worker_detector.detect(blank)
+    face_recognition.face_encodings(blank, [(100, 300, 300, 100)])
+
+
+def encode_login_image(image_bytes, max_side=FACE_LOGIN_MAX_SIDE):
+    """
+    Decodes a JPEG/PNG, detects the largest face and returns its encoding.
+
+    Runs in a worker process. Returns `(encoding, faces_found)` where
+    `encoding` is a float32 array or None when no usable face was found.
+    """
+    import face_recognition
+
+    image = cv2.imdecode(np.frombuffer(image_bytes, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if image is None:
+        raise FaceLoginError("The uploaded file is not a readable image.")
+
+    # Downscale big phone/webcam pictures: detection time grows with pixel count
+    height, width = image.shape[:2]
+    scale = max_side / max(height, width)
+    if scale < 1:
+        image = cv2.resize(image, (int(width * scale), int(height * scale)), interpolation=cv2.INTER_AREA)
+
+    rgb_image = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    face_locations = _worker_detector.detect(rgb_image)
+    if not face_locations:
+        return None, 0
+
+    # Only the largest face is used for login (the student in front of the camera)
+    largest = max(face_locations, key=lambda box: (box[2] - box[0]) * (box[1] - box[3]))
+    encodings = face_recognition.face_encodings(rgb_image, [largest])
+    if not encodings:
+        return None, len(face_locations)
+    return np.asarray(encodings[0], dtype=np.float32), len(face_locations)
+
+
+# WEB PROCESS SIDE
+
+login_pool = None  # Created on first use
+login_pool_lock = threading.Lock()
+_in_flight = threading.BoundedSemaphore(FACE_LOGIN_WORKERS * 4)  # Requests running or queued in the pool
+
+
+def get_login_pool():
+    """Returns the process-wide login worker pool, starting it on first use."""
+    global login_pool
+
+    with login_pool_lock:
+        if login_pool is None:
+            login_pool = ProcessPoolExecutor(
+                max_workers=FACE_LOGIN_WORKERS,
+                mp_context=multiprocessing.get_context("spawn"),
+                initializer=_init_worker,
+            )
+            atexit.register(close_login_pool)
+            print(f"✅ Face login pool started with {FACE_LOGIN_WORKERS} workers")
+        return login_pool
+
+
+def encode_uploaded_image(image_bytes, budget=FACE_LOGIN_BUDGET):
+    """
+    Encodes the face in an uploaded image using the worker pool.
+
+    Returns the float32 encoding, or None if no face was found.
+    Raises FaceLoginError for invalid uploads, when the server is busy, or
+    when the request's time budget runs out.
+    """
+    if not image_bytes:
+        raise FaceLoginError("No image was uploaded.")
+    if len(image_bytes) > FACE_LOGIN_MAX_BYTES:
+        raise FaceLoginError("The uploaded image is too large.")
+
+    # Reject immediately instead of queueing behind requests that will not finish in time
+    if not _in_flight.acquire(blocking=False):
+        raise FaceLoginError("Face login is busy, please try again.", status=503)
+
+    start = time.perf_counter()
+    try:
+        future = get_login_pool().submit(encode_login_image, image_bytes)
+    except Exception:
+        _in_flight.release()
+        raise
+    # The slot is freed when the pool is done with the image, even after a timeout
+    future.add_done_callback(lambda _: _in_flight.release())
+
+    try:
+        encoding, faces_found = future.result(timeout=budget)
+    except FutureTimeout:
+        future.cancel()  # Dropped if it has not started yet
+        raise FaceLoginError("Face login took too long, please try again.", status=503)
+    except BrokenProcessPool:
+        close_login_pool()  # Started again by the next request
+        raise FaceLoginError("Face login is restarting, please try again.", status=503)
+
+    print(f"🔍 Login image processed in {(time.perf_counter() - start) * 1000:.0f} ms ({faces_found} face(s))")
+    return encoding
+
+
+def close_login_pool():
+    """Shuts the worker pool down (registered to run on exit)."""
+    global login_pool
+
+    with login_pool_lock:
+        if login_pool is not None:
+            login_pool.shutdown(wait=False, cancel_futures=True)
+            login_pool = None
@@ -0,0 +1,211 @@
+"""
+frame_ingest.py
+HTTP Frame Ingestion for Networked Classroom Cameras
+
+Purpose:
+Live sessions used to assume the camera is plugged into the web server.
+With frame ingestion, any networked camera (or a small client next to it)
+posts JPEG frames to the server for a live session, and one recognition
+server can serve many classrooms.
+
+🔧 Key Features:
+- NetworkFrameSource: a bounded, per-session frame queue with the same
+  `read_latest()` / `isOpened()` / `release()` interface as the local
+  LatestFrameGrabber, so `recognize_faces_live()` consumes it unchanged.
+- Drop-oldest under load: when recognition falls behind, the oldest queued
+  frames are discarded so the session keeps working on recent pictures
+  and memory stays bounded.
+- Frames are resized to the session's frame size (the first frame's size,
+  unless configured), which the shared-memory worker ring requires.
+- Session registry with a per-session token the camera must present. A
+  session leaves the registry as soon as its frame source closes (stopped,
+  idle, or its recognition loop ended).
+
+Configuration (environment variables):
+- FRAME_INGEST_QUEUE_SIZE → frames queued per session (default 4)
+- FRAME_INGEST_MAX_BYTES → largest accepted JPEG (default 4 MB)
+- FRAME_INGEST_IDLE_TIMEOUT → seconds without frames before a session closes itself (default 300)
+"""
+
+# IMPORTS
+import os  # Configuration
+import hmac  # Constant-time token comparison
+import time  # Capture timestamps
+import uuid  # Session ids
+import secrets  # Camera tokens
+import threading  # Queue locking and the registry
+from collections import deque  # Bounded drop-oldest queue
+
+import cv2  # JPEG decoding and resizing
+import numpy as np  # Frame buffers
+
+
+# FRAME INGEST CONFIGURATION
+FRAME_INGEST_QUEUE_SIZE = int(os.getenv("FRAME_INGEST_QUEUE_SIZE", "4"))
+FRAME_INGEST_MAX_BYTES = int(os.getenv("FRAME_INGEST_MAX_BYTES", str(4 * 1024 * 1024)))
+FRAME_INGEST_IDLE_TIMEOUT = float(os.getenv("FRAME_INGEST_IDLE_TIMEOUT", "300"))
+
+
+class NetworkFrameSource:
+    """
+    Frames posted over HTTP for one live session, consumed by the recognition loop.
+
+    `push_jpeg()` is called from request threads; `read_latest()` from the
+    recognition loop. The queue holds at most `max_queue` frames; pushing
+    into a full queue drops the oldest frame.
+    """
+
+    def __init__(self, max_queue=FRAME_INGEST_QUEUE_SIZE, frame_size=None, idle_timeout=FRAME_INGEST_IDLE_TIMEOUT):
+        self._queue = deque(maxlen=max_queue)
+        self._condition = threading.Condition()
+        self._seq = 0
+        self._open = True
+        self.frame_size = frame_size  # (width, height); taken from the first frame when None
+        self.idle_timeout = idle_timeout
+        self.opened_at = time.time()
+        self.on_close = None  # Called once when the source closes (the registry forgets the session)
+
+        # Counters
+        self.frames_received = 0
+        self.frames_dropped = 0  # Discarded before recognition got to them
+        self.frames_rejected = 0  # Not decodable
+        self.last_frame_at = None
+
+    def push_jpeg(self, data, captured_at=None):
+        """
+        Decodes a JPEG and queues it. Returns False if the data is not an image.
+        `captured_at` is the camera's capture time (epoch seconds), defaulting to now.
+        """
+        frame = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if frame is None:
+            with self._condition:
+                self.frames_rejected += 1
+            return False
+        self.push(frame, captured_at)
+        return True
+
+    def push(self, frame, captured_at=None):
+        """Queues a decoded BGR frame, dropping the oldest queued frame when full."""
+        with self._condition:
+            if self.frame_size is None:
+                self.frame_size = (frame.shape[1], frame.shape[0])
+            frame_size = self.frame_size
+        if (frame.shape[1], frame.shape[0]) != frame_size:
+            frame = cv2.resize(frame, frame_size, interpolation=cv2.INTER_AREA)
+
+        with self._condition:
+            if not self._open:
+                return
+            if len(self._queue) == self._queue.maxlen:
+                self.frames_dropped += 1
+            self._seq += 1
+            self._queue.append((frame, captured_at or time.time(), self._seq))
+            self.frames_received += 1
+            self.last_frame_at = time.time()
+            self._condition.notify_all()
+
+    def read_latest(self, timeout=1.0, newer_than=None):
+        """
+        Returns `(frame, captured_at, seq)` for the oldest frame still queued
+        (frames beyond the queue bound were already dropped), or
+        `(None, None, seq)` if none arrives within `timeout` or the source is closed.
+        """
+        idle = False
+        with self._condition:
+            self._condition.wait_for(lambda: self._queue or not self._open, timeout=timeout)
+            if self._queue and self._open:
+                return self._queue.popleft()
+            # A camera that stopped sending must not keep its session alive forever
+            if self._open and time.time() - (self.last_frame_at or self.opened_at) > self.idle_timeout:
+                print("⚠️ Network camera idle for too long — closing the frame source.")
+                self._open = False
+                idle = True
+            seq = self._seq
+        if idle:
+            self._closed()
+        return None, None, seq
+
+    def read(self):
+        """cv2.VideoCapture-compatible read."""
+        frame, _, _ = self.read_latest()
+        return frame is not None, frame
+
+    def isOpened(self):
+        return self._open
+
+    def release(self):
+        """Closes the source; the recognition loop ends on its next read."""
+        with self._condition:
+            was_open = self._open
+            self._open = False
+            self._queue.clear()
+            self._condition.notify_all()
+        if was_open:
+            self._closed()
+
+    def _closed(self):
+        on_close, self.on_close = self.on_close, None
+        if on_close is not None:
+            on_close()
+
+    def stats(self):
+        with self._condition:
+            return {
+                "frames_received": self.frames_received,
+                "frames_dropped": self.frames_dropped,
+                "frames_rejected": self.frames_rejected,
+                "queue_depth": len(self._queue),
+            }
+
+
+class IngestSession:
+    """A live session fed by a network camera."""
+
+    def __init__(self, class_id, professor_id, max_queue=FRAME_INGEST_QUEUE_SIZE):
+        self.session_id = uuid.uuid4().hex
+        self.token = secrets.token_urlsafe(24)  # Given to the camera once
+        self.class_id = class_id
+        self.professor_id = professor_id
+        self.source = NetworkFrameSource(max_queue=max_queue)
+        self.started_at = time.time()
+        self.ticket = None  # Session scheduler ticket (set by the route that starts the session)
+
+    def check_token(self, token):
+        return bool(token) and hmac.compare_digest(token, self.token)
+
+
+# SESSION REGISTRY
+
+ingest_sessions = {}  # session_id → IngestSession
+ingest_sessions_lock = threading.Lock()
+
+
+def create_ingest_session(class_id, professor_id):
+    """Registers a new network-camera session and returns it."""
+    session = IngestSession(class_id, professor_id)
+    session.source.on_close = lambda: _forget_ingest_session(session.session_id)
+    with ingest_sessions_lock:
+        ingest_sessions[session.session_id] = session
+    print(f"📡 Frame ingest session {session.session_id} created for class {class_id}")
+    return session
+
+
+def _forget_ingest_session(session_id):
+    """Drops a session whose frame source closed (idle, or its recognition loop ended)."""
+    with ingest_sessions_lock:
+        ingest_sessions.pop(session_id, None)
+
+
+def get_ingest_session(session_id):
+    with ingest_sessions_lock:
+        return ingest_sessions.get(session_id)
+
+
+def close_ingest_session(session_id):
+    """Closes the session's frame source (ending its recognition loop) and forgets it."""
+    with ingest_sessions_lock:
+        session = ingest_sessions.pop(session_id, None)
+    if session is not None:
+        session.source.release()
+        print(f"📡 Frame ingest session {session_id} closed: {session.source.stats()}")
+    return session
@@ -0,0 +1,110 @@
+"""
+frame_ring.py
+Shared-Memory Frame Ring Buffer
+
+Purpose:
+Handing 1280x720 BGR frames to recognition worker processes through a
+multiprocessing queue pickles and copies ~2.7 MB per frame. The
+SharedFrameRing keeps a fixed number of frame slots in
+`multiprocessing.shared_memory`; the capture side writes a frame into the
+next slot and only sends `(slot, seq)` to a worker, which reads the pixels
+through a NumPy view of the same memory — no copy, no pickling.
+
+🔧 How overwrites are detected:
+Each slot has a sequence number stored in a small shared int64 array. The
+writer marks a slot as "being written" (-1) before copying a frame in and
+stores the frame's sequence number afterwards. A reader checks that the
+slot still carries the sequence number it was given, both before and after
+using the frame (`is_current()`); if the writer lapped the ring in the
+meantime the frame is discarded instead of producing a corrupt result.
+Use more slots than in-flight frames (e.g. 2 × workers) so this is rare.
+
+Usage:
+    ring = SharedFrameRing.create(slots=8, shape=(720, 1280, 3))
+    slot, seq = ring.write(frame)                      # capture process
+    worker_ring = SharedFrameRing.attach(ring.name, 8, (720, 1280, 3))
+    frame = worker_ring.view(slot)                     # worker process
+    if worker_ring.is_current(slot, seq): ...
+"""
+
+# IMPORTS
+from multiprocessing import shared_memory  # Cross-process memory without copies
+import numpy as np  # NumPy views onto the shared memory
+
+
+class SharedFrameRing:
+    """Fixed-size ring of frames in shared memory, addressed by slot index and sequence number."""
+
+    def __init__(self, shm, slots, shape, dtype=np.uint8, owner=False):
+        self.shm = shm
+        self.slots = slots
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.owner = owner  # Only the creator unlinks the memory
+
+        frame_bytes = int(np.prod(self.shape)) * self.dtype.itemsize
+        self.frame_bytes = frame_bytes
+
+        # Layout: [slot sequence numbers (int64 × slots)] [frame 0] [frame 1] ...
+        header_bytes = 8 * slots
+        self._seqs = np.ndarray((slots,), dtype=np.int64, buffer=shm.buf[:header_bytes])
+        self._frames = np.ndarray(
+            (slots,) + self.shape, dtype=self.dtype,
+            buffer=shm.buf[header_bytes:header_bytes + slots * frame_bytes],
+        )
+        self._next_seq = 1
+
+    @staticmethod
+    def _size(slots, shape, dtype):
+        return 8 * slots + slots * int(np.prod(shape)) * np.dtype(dtype).itemsize
+
+    @classmethod
+    def create(cls, slots, shape, dtype=np.uint8, name=None):
+        """Allocates a new ring (capture side)."""
+        shm = shared_memory.SharedMemory(name=name, create=True, size=cls._size(slots, shape, dtype))
+        ring = cls(shm, slots, shape, dtype, owner=True)
+        ring._seqs[:] = 0
+        return ring
+
+    @classmethod
+    def attach(cls, name, slots, shape, dtype=np.uint8):
+        """Attaches to an existing ring by name (worker side)."""
+        return cls(shared_memory.SharedMemory(name=name), slots, shape, dtype)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def write(self, frame):
+        """
+        Copies `frame` into the next slot and returns `(slot, seq)`.
+        This is the only copy a frame makes on its way to the workers.
+        """
+        if frame.shape != self.shape:
+            raise ValueError(f"Frame shape {frame.shape} does not match ring shape {self.shape}")
+
+        seq = self._next_seq
+        self._next_seq += 1
+        slot = seq % self.slots
+
+        self._seqs[slot] = -1  # Mark as being written
+        np.copyto(self._frames[slot], frame)
+        self._seqs[slot] = seq
+        return slot, seq
+
+    def view(self, slot):
+        """Zero-copy NumPy view of a slot. Do not keep it beyond `is_current()`."""
+        return self._frames[slot]
+
+    def is_current(self, slot, seq):
+        """True while the slot still holds the frame with sequence number `seq`."""
+        return int(self._seqs[slot]) == seq
+
+    def close(self):
+        """Detaches from the shared memory; the creator also frees it."""
+        # Drop the NumPy views first, otherwise the buffer cannot be released
+        self._seqs = None
+        self._frames = None
+        self.shm.close()
+        if self.owner:
+            self.shm.unlink()
@@ -0,0 +1,247 @@
+"""
+gallery_sync.py
+Versioned Face Gallery with Delta Sync for Edge Nodes
+
+Purpose:
+Edge recognition nodes keep a local copy of their class's face encodings.
+Re-downloading the whole gallery after every registration wastes bandwidth
+and leaves nodes stale in between. Instead, every change to the gallery is
+recorded in a change log, and a node asks only for the changes since the
+version it already has.
+
+🔧 How it works:
+- `gallery_changes` is filled by SQLite triggers: a student registered,
+  re-encoded or deleted, and a student added to / removed from a class.
+  Triggers catch every write path (routes, scripts, DB tools).
+  The log's autoincrement id is the gallery version.
+- `build_delta(since, class_id)` collapses the log after `since` to one
+  entry per student and answers from the *current* state of the database:
+  students to upsert (with all their encodings) and students to remove.
+  `since=0` (or a version older than the log) returns a full snapshot.
+- Deltas are compact binary (see `encode_delta`): a small header, then
+  enrollment strings and raw float32 (or float16) encodings — no JSON.
+- `apply_delta()` merges a delta into an edge node's local memory-mapped
+  gallery file and publishes it atomically (face_gallery.write_gallery_file).
+
+Binary format (little-endian):
+    header:  b"NXGD" | u8 format | u8 flags | u16 reserved | u64 version | u32 upserts | u32 removes
+    upsert:  u16 enrollment length | enrollment (UTF-8) | u16 samples | samples × 128 floats
+    remove:  u16 enrollment length | enrollment (UTF-8)
+    flags:   bit 0 = full snapshot (replace the local gallery), bit 1 = float16 encodings
+"""
+
+# IMPORTS
+import json  # Stored encodings and the gallery index
+import struct  # Binary delta encoding
+
+import numpy as np  # Encoding arrays
+
+from face_gallery import ENCODING_SIZE, FaceGallery, write_gallery_file, read_gallery_index
+from data_access import connect_db, execute_script  # Pooled connections to the attendance database
+
+DELTA_MAGIC = b"NXGD"
+DELTA_FORMAT = 1
+FLAG_FULL = 0x01
+FLAG_FLOAT16 = 0x02
+
+_HEADER = struct.Struct("<4sBBHQII")
+
+
+# CHANGE LOG (SERVER SIDE)
+
+def ensure_change_log(cursor):
+    """Creates the gallery change log and the triggers that fill it (run by migrations.py)."""
+    execute_script(cursor, """
+        CREATE TABLE IF NOT EXISTS gallery_changes (
+            version INTEGER PRIMARY KEY AUTOINCREMENT,  -- Gallery version after this change
+            enrollment TEXT NOT NULL,
+            class_id INTEGER,                           -- NULL = change to the student, any class
+            op TEXT NOT NULL,                           -- 'add', 'update' or 'remove'
+            changed_at TEXT DEFAULT CURRENT_TIMESTAMP
+        );
+
+        CREATE TRIGGER IF NOT EXISTS gallery_student_added AFTER INSERT ON students
+        WHEN NEW.face_encoding IS NOT NULL
+        BEGIN
+            INSERT INTO gallery_changes (enrollment, op) VALUES (NEW.enrollment, 'add');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS gallery_student_encoding_changed AFTER UPDATE OF face_encoding, enrollment ON students
+        BEGIN
+            INSERT INTO gallery_changes (enrollment, op)
+            SELECT OLD.enrollment, 'remove' WHERE OLD.enrollment IS NOT NEW.enrollment;
+            INSERT INTO gallery_changes (enrollment, op) VALUES (NEW.enrollment, 'update');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS gallery_student_removed AFTER DELETE ON students
+        BEGIN
+            INSERT INTO gallery_changes (enrollment, op) VALUES (OLD.enrollment, 'remove');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS gallery_class_member_added AFTER INSERT ON student_classes
+        BEGIN
+            INSERT INTO gallery_changes (enrollment, class_id, op) VALUES (NEW.enrollment, NEW.class_id, 'add');
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS gallery_class_member_removed AFTER DELETE ON student_classes
+        BEGIN
+            INSERT INTO gallery_changes (enrollment, class_id, op) VALUES (OLD.enrollment, OLD.class_id, 'remove');
+        END;
+    """)
+
+
+def current_version(cursor):
+    """Latest gallery version (0 when nothing has been logged yet)."""
+    cursor.execute("SELECT COALESCE(MAX(version), 0) FROM gallery_changes")
+    return cursor.fetchone()[0]
+
+
+def _current_encodings(cursor, enrollments=None, class_id=None):
+    """enrollment → float32 (n, 128) array for students with encodings (optionally one class)."""
+    query = "SELECT s.enrollment, s.face_encoding FROM students s"
+    params = []
+    if class_id is not None:
+        query += " JOIN class_enrollments e ON e.student_id = s.id AND e.class_id = ?"
+        params.append(class_id)
+    query += " WHERE s.face_encoding IS NOT NULL"
+
+    if enrollments is None:
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+    else:
+        # Chunked to stay below SQLite's bound-parameter limit
+        rows = []
+        for start in range(0, len(enrollments), 500):
+            chunk = enrollments[start:start + 500]
+            cursor.execute(query + f" AND s.enrollment IN ({','.join('?' * len(chunk))})", params + chunk)
+            rows.extend(cursor.fetchall())
+
+    result = {}
+    for enrollment, encoding_str in rows:
+        try:
+            samples = np.asarray(json.loads(encoding_str), dtype=np.float32).reshape(-1, ENCODING_SIZE)
+        except (TypeError, ValueError):
+            continue  # Unusable encodings → treated as not in the gallery
+        if len(samples):
+            result[enrollment] = samples
+    return result
+
+
+def build_delta(since=0, class_id=None, float16=False):
+    """
+    Changes to the gallery (of one class, if given) after version `since`,
+    encoded with `encode_delta()`.
+    """
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        version = current_version(cursor)
+
+        cursor.execute("SELECT MIN(version) FROM gallery_changes")
+        oldest = cursor.fetchone()[0]
+
+        # Unknown history (new node, pruned log, or a node ahead of a restored database) → full snapshot
+        full = since <= 0 or since > version or (oldest is not None and since < oldest - 1)
+        if full:
+            upserts = _current_encodings(cursor, class_id=class_id)
+            return encode_delta(version, upserts, [], full=True, float16=float16)
+
+        class_filter = "" if class_id is None else "AND (class_id IS NULL OR class_id = ?)"
+        params = [since] + ([] if class_id is None else [class_id])
+        cursor.execute(f"""
+            SELECT DISTINCT enrollment FROM gallery_changes
+            WHERE version > ? {class_filter}
+        """, params)
+        changed = [row[0] for row in cursor.fetchall()]
+
+        # Decide from the current state, not from the log entries themselves
+        upserts = _current_encodings(cursor, enrollments=changed, class_id=class_id)
+        removes = [enrollment for enrollment in changed if enrollment not in upserts]
+
+    return encode_delta(version, upserts, removes, full=False, float16=float16)
+
+
+# BINARY ENCODING
+
+def _pack_string(value):
+    raw = value.encode("utf-8")
+    return struct.pack("<H", len(raw)) + raw
+
+
+def encode_delta(version, upserts, removes, full=False, float16=False):
+    """Packs `{enrollment: (n, 128) array}` upserts and a list of removed enrollments."""
+    flags = (FLAG_FULL if full else 0) | (FLAG_FLOAT16 if float16 else 0)
+    dtype = "<f2" if float16 else "<f4"
+
+    parts = [_HEADER.pack(DELTA_MAGIC, DELTA_FORMAT, flags, 0, version, len(upserts), len(removes))]
+    for enrollment, samples in upserts.items():
+        parts.append(_pack_string(enrollment))
+        parts.append(struct.pack("<H", len(samples)))
+        parts.append(np.ascontiguousarray(samples, dtype=dtype).tobytes())
+    for enrollment in removes:
+        parts.append(_pack_string(enrollment))
+    return b"".join(parts)
+
+
+def decode_delta(payload):
+    """
+    Unpacks a delta. Returns `(version, upserts, removes, full)` where upserts
+    maps enrollment → float32 (n, 128) array.
+    """
+    magic, fmt, flags, _, version, upsert_count, remove_count = _HEADER.unpack_from(payload, 0)
+    if magic != DELTA_MAGIC or fmt != DELTA_FORMAT:
+        raise ValueError("Not a gallery delta (or an unsupported format version).")
+
+    dtype = np.dtype("<f2") if flags & FLAG_FLOAT16 else np.dtype("<f4")
+    offset = _HEADER.size
+
+    def read_string():
+        nonlocal offset
+        (length,) = struct.unpack_from("<H", payload, offset)
+        offset += 2
+        value = payload[offset:offset + length].decode("utf-8")
+        offset += length
+        return value
+
+    upserts = {}
+    for _ in range(upsert_count):
+        enrollment = read_string()
+        (samples,) = struct.unpack_from("<H", payload, offset)
+        offset += 2
+        size = samples * ENCODING_SIZE
+        upserts[enrollment] = np.frombuffer(payload, dtype=dtype, count=size, offset=offset) \
+            .reshape(samples, ENCODING_SIZE).astype(np.float32)
+        offset += size * dtype.itemsize
+
+    removes = [read_string() for _ in range(remove_count)]
+    return version, upserts, removes, bool(flags & FLAG_FULL)
+
+
+# EDGE NODE SIDE
+
+def apply_delta(index_path, payload):
+    """
+    Merges a delta into the local gallery file at `index_path` and publishes
+    the result atomically. Returns the gallery version the node now has.
+    """
+    version, upserts, removes, full = decode_delta(payload)
+
+    index = read_gallery_index(index_path)
+    if index is not None and not full and not upserts and not removes and version == index.get("sync_version"):
+        return version  # Already up to date, keep the current file
+
+    students = {}
+    if index is not None and not full:
+        # Start from the current local gallery: enrollment → its samples
+        gallery = FaceGallery.from_gallery_file(index_path)
+        bounds = np.concatenate([[0], np.cumsum(index["counts"])])
+        for i, enrollment in enumerate(index["enrollments"]):
+            students[enrollment] = np.asarray(gallery.vectors[bounds[i]:bounds[i + 1]])
+
+    for enrollment in removes:
+        students.pop(enrollment, None)
+    students.update(upserts)
+
+    model_data = {"encodings": list(students.values()), "enrollments": list(students.keys())}
+    write_gallery_file(model_data, index_path, extra={"sync_version": version})
+    print(f"🔄 Gallery delta applied: +{len(upserts)} / -{len(removes)}{' (full)' if full else ''} → version {version}")
+    return version
@@ -0,0 +1,921 @@
+"""
+migrations.py
+Versioned Schema Migrations
+
+Purpose:
+The schema used to be spread over `database.initialize_database()`, a
+second `initialize_database()` in app.py, `ensure_*()` calls made on every
+request, and columns the code reads but nothing ever created
+(`time_recognized`, `absences`, `sender_type`, `replied`,
+`student_classes.student_name`, `classrooms.professor_name`, ...). This
+module is now the only place the schema is defined: a numbered list of
+migrations, applied once at deploy time.
+
+🔧 Key Features:
+- `schema_version` table: one row per applied migration (version,
+  description, time applied).
+- `migrate()` applies the pending migrations in order. Each one runs in its
+  own BEGIN IMMEDIATE transaction together with its `schema_version` row:
+  a failing migration leaves the database at the previous version, and two
+  deploys running at once cannot apply the same migration twice.
+- Existing databases are adopted, not rebuilt: tables are created with
+  IF NOT EXISTS and columns are only added when missing, so a database
+  created by hand or by an older version ends up with the same schema as a
+  new one.
+- `pending_migrations()` / `check_schema()` let the app warn at startup
+  when the deploy step was skipped. Nothing runs at import.
+
+To change the schema, append a migration with the next version number;
+never edit one that has shipped.
+
+Usage (deploy step):
+    python migrations.py            # apply pending migrations
+    python migrations.py --status   # list applied and pending migrations
+
+Configuration (environment variables):
+- DATABASE_PATH → SQLite database file (see data_access.py)
+"""
+
+# IMPORTS
+import sys  # Command line
+import argparse  # Command line options
+
+from data_access import connect_db, transaction, execute_script, DATABASE_PATH  # Pooled connections
+from gallery_sync import ensure_change_log  # Gallery change log table and triggers
+from attendance_ingest import ensure_ingest_table  # Edge ingest idempotency keys
+from attendance_bitsets import ensure_bitset_tables  # Stored attendance bitsets and their versions
+
+# version → (description, function(cursor)), filled by @migration below
+MIGRATIONS = {}
+
+
+def migration(version, description):
+    """Registers a schema migration under its version number."""
+    def register(apply):
+        if version in MIGRATIONS:
+            raise ValueError(f"Duplicate migration version {version}")
+        MIGRATIONS[version] = (description, apply)
+        return apply
+    return register
+
+
+def add_missing_columns(cursor, table, columns):
+    """Adds `{column: declaration}` to `table` where missing; returns the columns added."""
+    existing = {row[1] for row in cursor.execute(f"PRAGMA table_info({table})")}
+    added = []
+    for column, declaration in columns.items():
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {declaration}")
+            added.append(column)
+    return added
+
+
+# MIGRATIONS
+
+@migration(1, "Core tables and the default professor code")
+def _core_tables(cursor):
+    # Students Table: Stores all registered students
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS students (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            enrollment TEXT UNIQUE NOT NULL,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            profile_picture BLOB,        -- Stores the image data (optional)
+            face_encoding BLOB           -- Stores the encoded facial features
+        )
+    ''')
+
+    # Professors Table: Registered professors
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS professors (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            professor_code TEXT UNIQUE NOT NULL -- A code used during registration
+        )
+    ''')
+
+    # Admins Table: Admin credentials
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admins (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL
+        )
+    ''')
+
+    # Classrooms Table: List of all created classes (admins create them before assigning a professor)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS classrooms (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_name TEXT NOT NULL,
+            professor_id INTEGER,
+            FOREIGN KEY (professor_id) REFERENCES professors(id)
+        )
+    ''')
+
+    # Student-Class Mapping Table: Links students to their enrolled classes
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_classes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            enrollment TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            FOREIGN KEY (enrollment) REFERENCES students(enrollment),
+            FOREIGN KEY (class_id) REFERENCES classrooms(id)
+        )
+    ''')
+
+    # Attendance Table: Tracks daily attendance for students per class
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS attendance (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            enrollment TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            date TEXT NOT NULL DEFAULT (DATE('now')), -- Automatically uses current date
+            status TEXT NOT NULL,                     -- e.g., Present or Absent
+            professor_id INTEGER NOT NULL,
+            FOREIGN KEY (enrollment) REFERENCES students(enrollment),
+            FOREIGN KEY (class_id) REFERENCES classrooms(id),
+            FOREIGN KEY (professor_id) REFERENCES professors(id)
+        )
+    ''')
+
+    # Student Activities Table: Tracks the student activity in their dashboard
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS student_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id TEXT NOT NULL,
+            activity TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students(enrollment)
+        )
+    ''')
+
+    # Messages Table: Stores student messages to professors (e.g. absence justifications)
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_enrollment TEXT NOT NULL,
+            professor_id INTEGER NOT NULL,
+            message TEXT NOT NULL,
+            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+            seen INTEGER DEFAULT 0, -- 0 = Unseen, 1 = Seen
+            FOREIGN KEY (student_enrollment) REFERENCES students(enrollment),
+            FOREIGN KEY (professor_id) REFERENCES professors(id)
+        )
+    ''')
+
+    # Professor Codes Table: Used to verify professor identity at registration
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS professor_codes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            code TEXT UNIQUE NOT NULL
+        )
+    ''')
+
+    # Seed a default professor code if not already present
+    cursor.execute("INSERT OR IGNORE INTO professor_codes (code) VALUES ('PROF123')")
+
+
+@migration(2, "Edge ingest batches and the gallery change log")
+def _edge_tables(cursor):
+    ensure_ingest_table(cursor)
+    ensure_change_log(cursor)
+
+
+@migration(3, "Columns and tables the application uses but never created")
+def _assumed_columns(cursor):
+    add_missing_columns(cursor, "attendance", {
+        "time_recognized": "TEXT",          # Last time the student was seen (live sessions, edge ingest)
+        "absences": "INTEGER DEFAULT 0",    # 1 on rows written as Absent at session end
+    })
+    add_missing_columns(cursor, "messages", {
+        "class_id": "INTEGER REFERENCES classrooms(id)",
+        "sender_type": "TEXT DEFAULT 'student'",        # student, professor or ai_agent
+        "recipient_type": "TEXT DEFAULT 'professor'",   # professor or student
+        "replied": "INTEGER DEFAULT 0",
+        "response_to_message_id": "INTEGER REFERENCES messages(id)",
+        "justification_file": "TEXT",
+    })
+    names_added = add_missing_columns(cursor, "student_classes", {
+        "student_name": "TEXT",
+        "class_name": "TEXT",
+    })
+    names_added += add_missing_columns(cursor, "classrooms", {
+        "professor_name": "TEXT",
+    })
+
+    # Admin dashboard activity feed
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS admin_activity (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            admin_id INTEGER NOT NULL,
+            action TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (admin_id) REFERENCES admins(id)
+        )
+    ''')
+
+    # Fill the denormalized names the dashboards read, where nobody wrote them
+    if names_added:
+        cursor.execute('''
+            UPDATE student_classes SET student_name = (
+                SELECT name FROM students WHERE students.enrollment = student_classes.enrollment
+            ) WHERE student_name IS NULL
+        ''')
+        cursor.execute('''
+            UPDATE student_classes SET class_name = (
+                SELECT class_name FROM classrooms WHERE classrooms.id = student_classes.class_id
+            ) WHERE class_name IS NULL
+        ''')
+        cursor.execute('''
+            UPDATE classrooms SET professor_name = (
+                SELECT name FROM professors WHERE professors.id = classrooms.professor_id
+            ) WHERE professor_name IS NULL
+        ''')
+
+
+# Indexes of the hot queries: name → (table, columns, unique)
+QUERY_INDEXES = {
+    # ON CONFLICT(class_id, enrollment, date) in mark_attendance_in_db() needs this constraint
+    "idx_attendance_class_enrollment_date": ("attendance", "class_id, enrollment, date", True),
+    # Live sessions, retrieve_attendance, view_classroom: one class on one day (covering)
+    "idx_attendance_class_date": ("attendance", "class_id, date, enrollment, status, time_recognized", False),
+    # Absence counts per student (agents, send_frame_to_frontend, dashboards)
+    "idx_attendance_enrollment_status": ("attendance", "enrollment, status, class_id", False),
+    # Class rosters, and the classes of one student (chatbot)
+    "idx_student_classes_class": ("student_classes", "class_id, enrollment", False),
+    "idx_student_classes_enrollment": ("student_classes", "enrollment, class_id", False),
+    # Professor inbox, newest first
+    "idx_messages_professor_recipient": ("messages", "professor_id, recipient_type, timestamp", False),
+}
+
+
+@migration(4, "Indexes for the hot attendance, roster and message queries")
+def _query_indexes(cursor):
+    # Before the UNIQUE(class_id, enrollment, date) index can be created, duplicate
+    # attendance rows left by older versions are collapsed into one per student
+    # and day, keeping a Present row over an Absent one and the latest sighting.
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_attendance_class_enrollment_date'")
+    if not cursor.fetchone():
+        cursor.execute("""
+            DELETE FROM attendance WHERE id IN (
+                SELECT id FROM (
+                    SELECT id, ROW_NUMBER() OVER (
+                        PARTITION BY class_id, enrollment, date
+                        ORDER BY status = 'Present' DESC, time_recognized DESC, id DESC
+                    ) AS duplicate_rank
+                    FROM attendance
+                ) WHERE duplicate_rank > 1
+            )
+        """)
+        if cursor.rowcount:
+            print(f"🧹 Removed {cursor.rowcount} duplicate attendance rows before adding the unique index")
+
+    for name, (table, columns, unique) in QUERY_INDEXES.items():
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+    # Fresh statistics so the planner prefers the new indexes
+    cursor.execute("ANALYZE")
+
+
+@migration(5, "Per-student, per-class attendance counters maintained by triggers")
+def _attendance_counters(cursor):
+    # One row per (student, class): what the agents and dashboards used to COUNT(*) on every request
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS attendance_counters (
+            enrollment TEXT NOT NULL,
+            class_id INTEGER NOT NULL,
+            present INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,
+            last_date TEXT,                      -- Latest day with an attendance row
+            PRIMARY KEY (enrollment, class_id)
+        ) WITHOUT ROWID
+    """)
+
+    # Triggers keep the counters exact for every write path (live sessions, edge ingest,
+    # professors editing attendance, DB tools). Re-marking a student Present, which live
+    # sessions do for every sighting, changes no counted column and does not fire them.
+    execute_script(cursor, """
+        CREATE TRIGGER IF NOT EXISTS attendance_counters_insert AFTER INSERT ON attendance
+        BEGIN
+            INSERT INTO attendance_counters (enrollment, class_id, present, absent, last_date)
+            VALUES (NEW.enrollment, NEW.class_id, NEW.status = 'Present', NEW.status = 'Absent', NEW.date)
+            ON CONFLICT (enrollment, class_id) DO UPDATE SET
+                present = present + excluded.present,
+                absent = absent + excluded.absent,
+                last_date = MAX(COALESCE(last_date, ''), excluded.last_date);
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_counters_delete AFTER DELETE ON attendance
+        BEGIN
+            UPDATE attendance_counters SET
+                present = present - (OLD.status = 'Present'),
+                absent = absent - (OLD.status = 'Absent'),
+                last_date = (SELECT MAX(date) FROM attendance
+                             WHERE class_id = OLD.class_id AND enrollment = OLD.enrollment)
+            WHERE enrollment = OLD.enrollment AND class_id = OLD.class_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS attendance_counters_update AFTER UPDATE OF enrollment, class_id, date, status ON attendance
+        WHEN OLD.status IS NOT NEW.status OR OLD.enrollment IS NOT NEW.enrollment
+          OR OLD.class_id IS NOT NEW.class_id OR OLD.date IS NOT NEW.date
+        BEGIN
+            UPDATE attendance_counters SET
+                present = present - (OLD.status = 'Present'),
+                absent = absent - (OLD.status = 'Absent'),
+                last_date = (SELECT MAX(date) FROM attendance
+                             WHERE class_id = OLD.class_id AND enrollment = OLD.enrollment)
+            WHERE enrollment = OLD.enrollment AND class_id = OLD.class_id;
+
+            INSERT INTO attendance_counters (enrollment, class_id, present, absent, last_date)
+            VALUES (NEW.enrollment, NEW.class_id, NEW.status = 'Present', NEW.status = 'Absent', NEW.date)
+            ON CONFLICT (enrollment, class_id) DO UPDATE SET
+                present = present + excluded.present,
+                absent = absent + excluded.absent,
+                last_date = MAX(COALESCE(last_date, ''), excluded.last_date);
+        END;
+    """)
+
+    # Counts of the attendance already recorded (in the same transaction, so no write is missed)
+    cursor.execute("DELETE FROM attendance_counters")
+    cursor.execute("""
+        INSERT INTO attendance_counters (enrollment, class_id, present, absent, last_date)
+        SELECT enrollment, class_id, SUM(status = 'Present'), SUM(status = 'Absent'), MAX(date)
+        FROM attendance
+        GROUP BY enrollment, class_id
+    """)
+
+
+@migration(6, "Class sessions; absences derived from the roster instead of stored as rows")
+def _class_sessions(cursor):
+    # One row per class meeting: written when a live session starts (ended_at stays NULL
+    # until it stops) and when a professor takes attendance manually
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS class_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            class_id INTEGER NOT NULL,
+            date TEXT NOT NULL,
+            started_at TEXT NOT NULL,
+            ended_at TEXT,                       -- NULL while a live session is running
+            UNIQUE (class_id, date),
+            FOREIGN KEY (class_id) REFERENCES classrooms(id)
+        )
+    """)
+
+    # Any other write path (edge ingest, DB tools) that records attendance for a day
+    # also records that the class met that day
+    execute_script(cursor, """
+        CREATE TRIGGER IF NOT EXISTS class_sessions_from_attendance AFTER INSERT ON attendance
+        BEGIN
+            INSERT INTO class_sessions (class_id, date, started_at, ended_at)
+            VALUES (NEW.class_id, NEW.date,
+                    COALESCE(NEW.time_recognized, DATETIME('now', 'localtime')),
+                    COALESCE(NEW.time_recognized, DATETIME('now', 'localtime')))
+            ON CONFLICT (class_id, date) DO NOTHING;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS class_sessions_from_attendance_update AFTER UPDATE OF class_id, date ON attendance
+        WHEN OLD.class_id IS NOT NEW.class_id OR OLD.date IS NOT NEW.date
+        BEGIN
+            INSERT INTO class_sessions (class_id, date, started_at, ended_at)
+            VALUES (NEW.class_id, NEW.date,
+                    COALESCE(NEW.time_recognized, DATETIME('now', 'localtime')),
+                    COALESCE(NEW.time_recognized, DATETIME('now', 'localtime')))
+            ON CONFLICT (class_id, date) DO NOTHING;
+        END;
+    """)
+
+    # Every day that already has attendance rows (Present or Absent) was a session
+    cursor.execute("""
+        INSERT INTO class_sessions (class_id, date, started_at, ended_at)
+        SELECT class_id, date,
+               COALESCE(MIN(time_recognized), date || ' 00:00:00'),
+               COALESCE(MAX(time_recognized), date || ' 00:00:00')
+        FROM attendance
+        GROUP BY class_id, date
+        ON CONFLICT (class_id, date) DO NOTHING
+    """)
+
+    # Absent rows are now implied by the session and the roster (the counter triggers
+    # follow the deletes; attendance_counters.absent is no longer read)
+    cursor.execute("DELETE FROM attendance WHERE status = 'Absent'")
+    if cursor.rowcount:
+        print(f"🧹 Removed {cursor.rowcount} materialized Absent rows (now derived from class_sessions)")
+
+    # Absences per student and class = sessions held − sessions attended. A live session
+    # that is still running today does not count yet (neither as held nor as attended),
+    # so students are not absent before it ends; one left open on an earlier day does.
+    execute_script(cursor, """
+        CREATE VIEW IF NOT EXISTS attendance_summary AS
+        SELECT enrollment, class_id, sessions, present, sessions - present AS absent, last_date
+        FROM (
+            SELECT r.enrollment, r.class_id,
+                   (SELECT COUNT(*) FROM class_sessions cs WHERE cs.class_id = r.class_id) - (
+                       SELECT COUNT(*) FROM class_sessions running
+                       WHERE running.class_id = r.class_id
+                         AND running.date >= DATE('now', 'localtime') AND running.ended_at IS NULL
+                   ) AS sessions,
+                   COALESCE(ac.present, 0) - (
+                       SELECT COUNT(*)
+                       FROM class_sessions running
+                       JOIN attendance a
+                           ON a.class_id = running.class_id AND a.date = running.date
+                           AND a.enrollment = r.enrollment AND a.status = 'Present'
+                       WHERE running.class_id = r.class_id
+                         AND running.date >= DATE('now', 'localtime') AND running.ended_at IS NULL
+                   ) AS present,
+                   ac.last_date
+            FROM student_classes r
+            LEFT JOIN attendance_counters ac ON ac.enrollment = r.enrollment AND ac.class_id = r.class_id
+            WHERE NOT EXISTS (  -- A student listed twice in a class counts once
+                SELECT 1 FROM student_classes twice
+                WHERE twice.class_id = r.class_id AND twice.enrollment = r.enrollment AND twice.id < r.id
+            )
+        );
+
+        -- One row per session and enrolled student, Absent where nothing was recorded
+        CREATE VIEW IF NOT EXISTS session_attendance AS
+        SELECT cs.class_id, cs.date, r.enrollment,
+               COALESCE(a.status, 'Absent') AS status,
+               a.time_recognized,
+               a.professor_id
+        FROM class_sessions cs
+        JOIN student_classes r ON r.class_id = cs.class_id
+        LEFT JOIN attendance a
+            ON a.class_id = cs.class_id AND a.enrollment = r.enrollment AND a.date = cs.date
+        WHERE NOT EXISTS (
+            SELECT 1 FROM student_classes twice
+            WHERE twice.class_id = r.class_id AND twice.enrollment = r.enrollment AND twice.id < r.id
+        );
+    """)
+
+
+# Indexes of the integer-keyed tables (migration 7): name → (table, columns, unique)
+STUDENT_KEY_INDEXES = {
+    # ON CONFLICT(class_id, student_id, date) of the attendance upserts
+    "idx_attendance_marks_class_student_date": ("attendance_marks", "class_id, student_id, date", True),
+    "idx_attendance_marks_class_date": ("attendance_marks", "class_id, date, student_id, status, time_recognized", False),
+    "idx_attendance_marks_student_status": ("attendance_marks", "student_id, status, class_id", False),
+    # A student is enrolled in a class once
+    "idx_class_enrollments_class_student": ("class_enrollments", "class_id, student_id", True),
+    "idx_class_enrollments_student": ("class_enrollments", "student_id, class_id", False),
+    "idx_student_messages_professor_recipient": ("student_messages", "professor_id, recipient_type, timestamp", False),
+    "idx_student_messages_student": ("student_messages", "student_id", False),
+    "idx_student_activity_log_student": ("student_activity_log", "student_id, timestamp", False),
+}
+
+
+@migration(7, "Integer student keys in attendance, enrollments, messages and activities")
+def _student_keys(cursor):
+    # attendance, student_classes, messages and student_activities repeated the TEXT
+    # enrollment in every row and index. Their rows move to tables keyed by students.id;
+    # the old names become views with the old columns, so existing queries keep working
+    # (INSTEAD OF triggers translate writes). Rows of students that no longer exist cannot
+    # be keyed and are dropped.
+    for table, column in (("attendance", "enrollment"), ("student_classes", "enrollment"),
+                          ("messages", "student_enrollment"), ("student_activities", "student_id")):
+        cursor.execute(f"""
+            SELECT COUNT(*) FROM {table}
+            WHERE NOT EXISTS (SELECT 1 FROM students WHERE students.enrollment = {table}.{column})
+        """)
+        orphans = cursor.fetchone()[0]
+        if orphans:
+            print(f"🧹 Dropping {orphans} {table} rows of students that no longer exist")
+
+    # Views over the old tables are rebuilt below
+    for view in ("attendance_summary", "session_attendance"):
+        cursor.execute(f"DROP VIEW IF EXISTS {view}")
+
+    cursor.execute("""
+        CREATE TABLE attendance_marks (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            date TEXT NOT NULL DEFAULT (DATE('now')),
+            status TEXT NOT NULL,                     -- Present (Absent is derived, see class_sessions)
+            professor_id INTEGER NOT NULL,
+            time_recognized TEXT,
+            FOREIGN KEY (student_id) REFERENCES students(id),
+            FOREIGN KEY (class_id) REFERENCES classrooms(id),
+            FOREIGN KEY (professor_id) REFERENCES professors(id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO attendance_marks (id, student_id, class_id, date, status, professor_id, time_recognized)
+        SELECT a.id, s.id, a.class_id, a.date, a.status, a.professor_id, a.time_recognized
+        FROM attendance a JOIN students s ON s.enrollment = a.enrollment
+    """)
+
+    cursor.execute("""
+        CREATE TABLE class_enrollments (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            FOREIGN KEY (student_id) REFERENCES students(id),
+            FOREIGN KEY (class_id) REFERENCES classrooms(id)
+        )
+    """)
+    # One row per student and class (the first one, if a student was added twice)
+    cursor.execute("""
+        INSERT INTO class_enrollments (id, student_id, class_id)
+        SELECT MIN(sc.id), s.id, sc.class_id
+        FROM student_classes sc JOIN students s ON s.enrollment = sc.enrollment
+        WHERE sc.class_id IS NOT NULL
+        GROUP BY s.id, sc.class_id
+    """)
+
+    cursor.execute("""
+        CREATE TABLE student_messages (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            professor_id INTEGER NOT NULL,
+            class_id INTEGER,
+            message TEXT NOT NULL,
+            timestamp TEXT DEFAULT CURRENT_TIMESTAMP,
+            seen INTEGER DEFAULT 0,                        -- 0 = Unseen, 1 = Seen
+            sender_type TEXT DEFAULT 'student',            -- student, professor or ai_agent
+            recipient_type TEXT DEFAULT 'professor',       -- professor or student
+            replied INTEGER DEFAULT 0,
+            response_to_message_id INTEGER,
+            justification_file TEXT,
+            FOREIGN KEY (student_id) REFERENCES students(id),
+            FOREIGN KEY (professor_id) REFERENCES professors(id),
+            FOREIGN KEY (class_id) REFERENCES classrooms(id),
+            FOREIGN KEY (response_to_message_id) REFERENCES student_messages(id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO student_messages (id, student_id, professor_id, class_id, message, timestamp, seen,
+                                      sender_type, recipient_type, replied, response_to_message_id, justification_file)
+        SELECT m.id, s.id, m.professor_id, m.class_id, m.message, m.timestamp, m.seen,
+               m.sender_type, m.recipient_type, m.replied, m.response_to_message_id, m.justification_file
+        FROM messages m JOIN students s ON s.enrollment = m.student_enrollment
+    """)
+
+    cursor.execute("""
+        CREATE TABLE student_activity_log (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            student_id INTEGER NOT NULL,
+            activity TEXT NOT NULL,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (student_id) REFERENCES students(id)
+        )
+    """)
+    cursor.execute("""
+        INSERT INTO student_activity_log (id, student_id, activity, timestamp)
+        SELECT sa.id, s.id, sa.activity, sa.timestamp
+        FROM student_activities sa JOIN students s ON s.enrollment = sa.student_id
+    """)
+
+    # The old tables go with their indexes and triggers
+    for table in ("attendance", "student_classes", "messages", "student_activities"):
+        cursor.execute(f"DROP TABLE {table}")
+
+    for name, (table, columns, unique) in STUDENT_KEY_INDEXES.items():
+        cursor.execute(f"CREATE {'UNIQUE ' if unique else ''}INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+
+    # Counters keyed by student id, maintained on attendance_marks like before
+    cursor.execute("DROP TABLE attendance_counters")
+    cursor.execute("""
+        CREATE TABLE attendance_counters (
+            student_id INTEGER NOT NULL,
+            class_id INTEGER NOT NULL,
+            present INTEGER NOT NULL DEFAULT 0,
+            absent INTEGER NOT NULL DEFAULT 0,   -- Rows stored as Absent (normally none: absences are derived)
+            last_date TEXT,                      -- Latest day with an attendance row
+            PRIMARY KEY (student_id, class_id)
+        ) WITHOUT ROWID
+    """)
+    cursor.execute("""
+        INSERT INTO attendance_counters (student_id, class_id, present, absent, last_date)
+        SELECT student_id, class_id, SUM(status = 'Present'), SUM(status = 'Absent'), MAX(date)
+        FROM attendance_marks
+        GROUP BY student_id, class_id
+    """)
+
+    execute_script(cursor, """
+        CREATE TRIGGER attendance_counters_insert AFTER INSERT ON attendance_marks
+        BEGIN
+            INSERT INTO attendance_counters (student_id, class_id, present, absent, last_date)
+            VALUES (NEW.student_id, NEW.class_id, NEW.status = 'Present', NEW.status = 'Absent', NEW.date)
+            ON CONFLICT (student_id, class_id) DO UPDATE SET
+                present = present + excluded.present,
+                absent = absent + excluded.absent,
+                last_date = MAX(COALESCE(last_date, ''), excluded.last_date);
+        END;
+
+        CREATE TRIGGER attendance_counters_delete AFTER DELETE ON attendance_marks
+        BEGIN
+            UPDATE attendance_counters SET
+                present = present - (OLD.status = 'Present'),
+                absent = absent - (OLD.status = 'Absent'),
+                last_date = (SELECT MAX(date) FROM attendance_marks
+                             WHERE class_id = OLD.class_id AND student_id = OLD.student_id)
+            WHERE student_id = OLD.student_id AND class_id = OLD.class_id;
+        END;
+
+        CREATE TRIGGER attendance_counters_update AFTER UPDATE OF student_id, class_id, date, status ON attendance_marks
+        WHEN OLD.status IS NOT NEW.status OR OLD.student_id IS NOT NEW.student_id
+          OR OLD.class_id IS NOT NEW.class_id OR OLD.date IS NOT NEW.date
+        BEGIN
+            UPDATE attendance_counters SET
+                present = present - (OLD.status = 'Present'),
+                absent = absent - (OLD.status = 'Absent'),
+                last_date = (SELECT MAX(date) FROM attendance_marks
+                             WHERE class_id = OLD.class_id AND student_id = OLD.student_id)
+            WHERE student_id = OLD.student_id AND class_id = OLD.class_id;
+
+            INSERT INTO attendance_counters (student_id, class_id, present, absent, last_date)
+            VALUES (NEW.student_id, NEW.class_id, NEW.status = 'Present', NEW.status = 'Absent', NEW.date)
+            ON CONFLICT (student_id, class_id) DO UPDATE SET
+                present = present + excluded.present,
+                absent = absent + excluded.absent,
+                last_date = MAX(COALESCE(last_date, ''), excluded.last_date);
+        END;
+
+        CREATE TRIGGER class_sessions_from_attendance AFTER INSERT ON attendance_marks
+        BEGIN
+            INSERT INTO class_sessions (class_id, date, started_at, ended_at)
+            VALUES (NEW.class_id, NEW.date,
+                    COALESCE(NEW.time_recognized, DATETIME('now', 'localtime')),
+                    COALESCE(NEW.time_recognized, DATETIME('now', 'localtime')))
+            ON CONFLICT (class_id, date) DO NOTHING;
+        END;
+
+        CREATE TRIGGER class_sessions_from_attendance_update AFTER UPDATE OF class_id, date ON attendance_marks
+        WHEN OLD.class_id IS NOT NEW.class_id OR OLD.date IS NOT NEW.date
+        BEGIN
+            INSERT INTO class_sessions (class_id, date, started_at, ended_at)
+            VALUES (NEW.class_id, NEW.date,
+                    COALESCE(NEW.time_recognized, DATETIME('now', 'localtime')),
+                    COALESCE(NEW.time_recognized, DATETIME('now', 'localtime')))
+            ON CONFLICT (class_id, date) DO NOTHING;
+        END;
+
+        -- The gallery change log's class triggers (migration 2) went with student_classes;
+        -- class-filtered deltas (gallery_sync.build_delta) rely on them
+        CREATE TRIGGER IF NOT EXISTS gallery_class_member_added AFTER INSERT ON class_enrollments
+        BEGIN
+            INSERT INTO gallery_changes (enrollment, class_id, op)
+            SELECT enrollment, NEW.class_id, 'add' FROM students WHERE id = NEW.student_id;
+        END;
+
+        CREATE TRIGGER IF NOT EXISTS gallery_class_member_removed AFTER DELETE ON class_enrollments
+        BEGIN
+            -- A deleted student was already logged as removed by gallery_student_removed
+            INSERT INTO gallery_changes (enrollment, class_id, op)
+            SELECT enrollment, OLD.class_id, 'remove' FROM students WHERE id = OLD.student_id;
+        END;
+    """)
+
+    # Compatibility views: the old tables' columns, enrollment looked up by integer key
+    execute_script(cursor, """
+        CREATE VIEW attendance AS
+        SELECT a.id, s.enrollment, a.class_id, a.date, a.status, a.professor_id, a.time_recognized, a.student_id
+        FROM attendance_marks a JOIN students s ON s.id = a.student_id;
+
+        CREATE VIEW student_classes AS
+        SELECT e.id, s.enrollment, e.class_id, s.name AS student_name, c.class_name, e.student_id
+        FROM class_enrollments e
+        JOIN students s ON s.id = e.student_id
+        LEFT JOIN classrooms c ON c.id = e.class_id;
+
+        CREATE VIEW messages AS
+        SELECT m.id, s.enrollment AS student_enrollment, m.professor_id, m.message, m.timestamp, m.seen,
+               m.class_id, m.sender_type, m.recipient_type, m.replied, m.response_to_message_id,
+               m.justification_file, m.student_id
+        FROM student_messages m JOIN students s ON s.id = m.student_id;
+
+        CREATE VIEW student_activities AS
+        SELECT l.id, s.enrollment AS student_id, l.activity, l.timestamp
+        FROM student_activity_log l JOIN students s ON s.id = l.student_id;
+
+        -- Writes through the views (an unknown enrollment fails like a broken foreign key)
+        CREATE TRIGGER attendance_insert INSTEAD OF INSERT ON attendance
+        BEGIN
+            SELECT RAISE(ABORT, 'Unknown student enrollment')
+            WHERE NOT EXISTS (SELECT 1 FROM students WHERE enrollment = NEW.enrollment);
+            INSERT INTO attendance_marks (student_id, class_id, date, status, professor_id, time_recognized)
+            SELECT id, NEW.class_id, COALESCE(NEW.date, DATE('now')), NEW.status, NEW.professor_id, NEW.time_recognized
+            FROM students WHERE enrollment = NEW.enrollment;
+        END;
+
+        CREATE TRIGGER attendance_update INSTEAD OF UPDATE ON attendance
+        BEGIN
+            UPDATE attendance_marks SET
+                student_id = (SELECT id FROM students WHERE enrollment = NEW.enrollment),
+                class_id = NEW.class_id, date = NEW.date, status = NEW.status,
+                professor_id = NEW.professor_id, time_recognized = NEW.time_recognized
+            WHERE id = OLD.id;
+        END;
+
+        CREATE TRIGGER attendance_delete INSTEAD OF DELETE ON attendance
+        BEGIN
+            DELETE FROM attendance_marks WHERE id = OLD.id;
+        END;
+
+        CREATE TRIGGER student_classes_insert INSTEAD OF INSERT ON student_classes
+        BEGIN
+            SELECT RAISE(ABORT, 'Unknown student enrollment')
+            WHERE NOT EXISTS (SELECT 1 FROM students WHERE enrollment = NEW.enrollment);
+            INSERT INTO class_enrollments (student_id, class_id)
+            SELECT id, COALESCE(NEW.class_id, (SELECT id FROM classrooms WHERE class_name = NEW.class_name))
+            FROM students WHERE enrollment = NEW.enrollment
+            ON CONFLICT (class_id, student_id) DO NOTHING;  -- Already enrolled
+        END;
+
+        CREATE TRIGGER student_classes_update INSTEAD OF UPDATE ON student_classes
+        BEGIN
+            UPDATE class_enrollments SET
+                student_id = (SELECT id FROM students WHERE enrollment = NEW.enrollment),
+                class_id = NEW.class_id
+            WHERE id = OLD.id;
+        END;
+
+        CREATE TRIGGER student_classes_delete INSTEAD OF DELETE ON student_classes
+        BEGIN
+            DELETE FROM class_enrollments WHERE id = OLD.id;
+        END;
+
+        CREATE TRIGGER messages_insert INSTEAD OF INSERT ON messages
+        BEGIN
+            SELECT RAISE(ABORT, 'Unknown student enrollment')
+            WHERE NOT EXISTS (SELECT 1 FROM students WHERE enrollment = NEW.student_enrollment);
+            INSERT INTO student_messages (student_id, professor_id, class_id, message, timestamp, seen,
+                                          sender_type, recipient_type, replied, response_to_message_id,
+                                          justification_file)
+            SELECT id, NEW.professor_id, NEW.class_id, NEW.message, COALESCE(NEW.timestamp, CURRENT_TIMESTAMP),
+                   COALESCE(NEW.seen, 0), COALESCE(NEW.sender_type, 'student'),
+                   COALESCE(NEW.recipient_type, 'professor'), COALESCE(NEW.replied, 0),
+                   NEW.response_to_message_id, NEW.justification_file
+            FROM students WHERE enrollment = NEW.student_enrollment;
+        END;
+
+        CREATE TRIGGER messages_update INSTEAD OF UPDATE ON messages
+        BEGIN
+            UPDATE student_messages SET
+                student_id = (SELECT id FROM students WHERE enrollment = NEW.student_enrollment),
+                professor_id = NEW.professor_id, class_id = NEW.class_id, message = NEW.message,
+                timestamp = NEW.timestamp, seen = NEW.seen, sender_type = NEW.sender_type,
+                recipient_type = NEW.recipient_type, replied = NEW.replied,
+                response_to_message_id = NEW.response_to_message_id, justification_file = NEW.justification_file
+            WHERE id = OLD.id;
+        END;
+
+        CREATE TRIGGER messages_delete INSTEAD OF DELETE ON messages
+        BEGIN
+            DELETE FROM student_messages WHERE id = OLD.id;
+        END;
+
+        CREATE TRIGGER student_activities_insert INSTEAD OF INSERT ON student_activities
+        BEGIN
+            SELECT RAISE(ABORT, 'Unknown student enrollment')
+            WHERE NOT EXISTS (SELECT 1 FROM students WHERE enrollment = NEW.student_id);
+            INSERT INTO student_activity_log (student_id, activity, timestamp)
+            SELECT id, NEW.activity, COALESCE(NEW.timestamp, CURRENT_TIMESTAMP)
+            FROM students WHERE enrollment = NEW.student_id;
+        END;
+
+        CREATE TRIGGER student_activities_delete INSTEAD OF DELETE ON student_activities
+        BEGIN
+            DELETE FROM student_activity_log WHERE id = OLD.id;
+        END;
+    """)
+
+    # The derived-absence views of migration 6, now joined on integer keys
+    execute_script(cursor, """
+        CREATE VIEW attendance_summary AS
+        SELECT s.enrollment, x.student_id, x.class_id, x.sessions, x.present,
+               x.sessions - x.present AS absent, x.last_date
+        FROM (
+            SELECT e.student_id, e.class_id,
+                   (SELECT COUNT(*) FROM class_sessions cs WHERE cs.class_id = e.class_id) - (
+                       SELECT COUNT(*) FROM class_sessions running
+                       WHERE running.class_id = e.class_id
+                         AND running.date >= DATE('now', 'localtime') AND running.ended_at IS NULL
+                   ) AS sessions,
+                   COALESCE(ac.present, 0) - (
+                       SELECT COUNT(*)
+                       FROM class_sessions running
+                       JOIN attendance_marks a
+                           ON a.class_id = running.class_id AND a.date = running.date
+                           AND a.student_id = e.student_id AND a.status = 'Present'
+                       WHERE running.class_id = e.class_id
+                         AND running.date >= DATE('now', 'localtime') AND running.ended_at IS NULL
+                   ) AS present,
+                   ac.last_date
+            FROM class_enrollments e
+            LEFT JOIN attendance_counters ac ON ac.student_id = e.student_id AND ac.class_id = e.class_id
+        ) x
+        JOIN students s ON s.id = x.student_id;
+
+        -- One row per session and enrolled student, Absent where nothing was recorded
+        CREATE VIEW session_attendance AS
+        SELECT cs.class_id, cs.date, s.enrollment, e.student_id,
+               COALESCE(a.status, 'Absent') AS status,
+               a.time_recognized,
+               a.professor_id
+        FROM class_sessions cs
+        JOIN class_enrollments e ON e.class_id = cs.class_id
+        JOIN students s ON s.id = e.student_id
+        LEFT JOIN attendance_marks a
+            ON a.class_id = cs.class_id AND a.student_id = e.student_id AND a.date = cs.date;
+    """)
+
+    cursor.execute("ANALYZE")
+
+
+@migration(8, "Per-student attendance bitsets and the per-class versions that invalidate them")
+def _attendance_bitsets(cursor):
+    # Built on first read (attendance_bitsets.class_attendance), not here
+    ensure_bitset_tables(cursor)
+
+
+# RUNNER
+
+def ensure_version_table(cursor):
+    cursor.execute('''
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+
+
+def applied_versions(cursor):
+    cursor.execute("SELECT version FROM schema_version")
+    return {row[0] for row in cursor.fetchall()}
+
+
+def pending_migrations():
+    """Versions not yet applied to the database, in order."""
+    with connect_db() as conn:
+        cursor = conn.cursor()
+        ensure_version_table(cursor)
+        applied = applied_versions(cursor)
+    return [version for version in sorted(MIGRATIONS) if version not in applied]
+
+
+def migrate(target=None):
+    """
+    Applies pending migrations (up to `target`, if given) in order.
+
+    Returns the list of versions applied by this call.
+    """
+    with connect_db() as conn:
+        ensure_version_table(conn.cursor())
+
+    applied = []
+    for version in sorted(MIGRATIONS):
+        if target is not None and version > target:
+            break
+        description, apply = MIGRATIONS[version]
+
+        with transaction(immediate=True) as conn:
+            cursor = conn.cursor()
+            # Checked under the write lock: another deploy may have just applied it
+            if version in applied_versions(cursor):
+                continue
+            print(f"🛠️ Applying migration {version}: {description}")
+            apply(cursor)
+            cursor.execute("INSERT INTO schema_version (version, description) VALUES (?, ?)", (version, description))
+        applied.append(version)
+
+    if applied:
+        print(f"✅ Database schema at version {max(applied)} ({len(applied)} migrations applied)")
+    return applied
+
+
+def check_schema():
+    """Warns (at app startup) when the deploy step left migrations unapplied; returns them."""
+    pending = pending_migrations()
+    if pending:
+        print(f"⚠️ Database {DATABASE_PATH} is missing schema migrations {pending}. "
+              f"Run `python migrations.py` before serving requests.")
+    return pending
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply versioned schema migrations to the attendance database.")
+    parser.add_argument("--status", action="store_true", help="List applied and pending migrations, change nothing")
+    parser.add_argument("--to", type=int, help="Stop after this version")
+    args = parser.parse_args()
+
+    if args.status:
+        pending = pending_migrations()
+        for version in sorted(MIGRATIONS):
+            state = "pending" if version in pending else "applied"
+            print(f"{version:>4}  {state:<8} {MIGRATIONS[version][0]}")
+        sys.exit(1 if pending else 0)
+
+    if not migrate(args.to):
+        print(f"✅ Database schema already up to date (version {max(MIGRATIONS)})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+"""
+motion_gate.py
+Motion Gating for Live Face Recognition
+
+Purpose:
+While a class is seated and nothing moves, running face detection and
+encoding on every frame only burns CPU. The MotionGate compares each new
+frame with the last frame that was actually analysed and decides:
+
+- Skip the frame entirely when the picture is effectively unchanged.
+- Detect only inside the regions that changed when the change is local
+  (someone walks in, a student turns around).
+- Detect on the full frame when a large part of the picture changed
+  (camera moved, lights switched on).
+
+🔧 Key Features:
+- Cheap: works on a blurred, downscaled greyscale copy of the frame.
+- Two methods: plain frame differencing ("diff") or OpenCV's MOG2
+  background subtractor ("mog2").
+- Configurable sensitivity and a forced full detection every N frames so
+  slow changes (e.g. lighting drift) never block recognition for long.
+- Counters for the fraction of frames skipped.
+- The comparison frame only advances when detection really ran: the caller
+  confirms with `accept()`. A frame the gate let through but that was then
+  paced out (session scheduler) or dropped (busy workers) leaves the
+  reference as it was, so the next frame still shows the change.
+
+Configuration (environment variables):
+- MOTION_GATE_ENABLED      → "0" disables the gate (default "1")
+- MOTION_GATE_METHOD       → "diff" (default) or "mog2"
+- MOTION_GATE_SENSITIVITY  → per-pixel grey-level change counted as motion (default 25, lower = more sensitive)
+- MOTION_GATE_MIN_AREA     → fraction of the frame that must change before detection runs (default 0.002)
+"""
+
+# IMPORTS
+import os  # Read the gate configuration
+import cv2  # Image differencing, morphology and contours
+import numpy as np  # Mask arithmetic
+
+
+# GATE CONFIGURATION
+MOTION_GATE_ENABLED = os.getenv("MOTION_GATE_ENABLED", "1") == "1"
+MOTION_GATE_METHOD = os.getenv("MOTION_GATE_METHOD", "diff")
+MOTION_GATE_SENSITIVITY = int(os.getenv("MOTION_GATE_SENSITIVITY", "25"))
+MOTION_GATE_MIN_AREA = float(os.getenv("MOTION_GATE_MIN_AREA", "0.002"))
+
+
+class MotionGate:
+    """
+    Decides, frame by frame, whether (and where) face detection should run.
+
+    `check(frame)` returns a tuple `(run_detection, regions)`:
+    - `(False, [])`   → frame unchanged, skip detection
+    - `(True, None)`  → detect on the whole frame
+    - `(True, [...])` → detect only inside these `(top, right, bottom, left)` regions
+
+    `check()` does not move the reference: call `accept()` once detection
+    actually ran on the checked frame.
+    """
+
+    def __init__(self, method=MOTION_GATE_METHOD, sensitivity=MOTION_GATE_SENSITIVITY,
+                 min_changed_area=MOTION_GATE_MIN_AREA, full_frame_area=0.3,
+                 max_skipped_frames=50, work_width=320, region_margin=0.25):
+        if method not in ("diff", "mog2"):
+            raise ValueError(f"Unknown motion gate method '{method}'. Use 'diff' or 'mog2'.")
+
+        self.method = method
+        self.sensitivity = sensitivity            # Pixel change (0-255) that counts as motion
+        self.min_changed_area = min_changed_area  # Below this fraction of changed pixels → skip
+        self.full_frame_area = full_frame_area    # Above this fraction → detect on the full frame
+        self.max_skipped_frames = max_skipped_frames  # Force a full detection after this many skips
+        self.work_width = work_width              # Width of the downscaled analysis image
+        self.region_margin = region_margin        # Extra context around changed regions (fraction of size)
+
+        self.reference = None  # Last analysed frame (diff method)
+        self._pending = None  # Last checked frame the gate let through, until accept()
+        self.subtractor = (
+            cv2.createBackgroundSubtractorMOG2(history=300, varThreshold=sensitivity, detectShadows=False)
+            if method == "mog2" else None
+        )
+        self.kernel = np.ones((3, 3), np.uint8)
+
+        # Counters
+        self.frames_total = 0
+        self.frames_skipped = 0
+        self.frames_partial = 0
+        self.consecutive_skips = 0
+
+    def _prepare(self, frame):
+        """Downscaled, blurred greyscale copy of the frame used for comparison."""
+        height, width = frame.shape[:2]
+        scale = min(1.0, self.work_width / float(width))
+        small = cv2.resize(frame, (0, 0), fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        gray = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+        return cv2.GaussianBlur(gray, (5, 5), 0), scale
+
+    def _motion_mask(self, gray):
+        """Binary mask of pixels that changed since the reference frame."""
+        if self.method == "mog2":
+            return self.subtractor.apply(gray, learningRate=0)  # Read-only; the model learns in accept()
+
+        if self.reference is None or self.reference.shape != gray.shape:
+            return None
+        diff = cv2.absdiff(gray, self.reference)
+        _, mask = cv2.threshold(diff, self.sensitivity, 255, cv2.THRESH_BINARY)
+        return mask
+
+    def _regions(self, mask, scale, height, width):
+        """Bounding boxes (full-frame coordinates) around the changed areas."""
+        mask = cv2.dilate(mask, self.kernel, iterations=2)
+        contours, _ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+
+        regions = []
+        for contour in contours:
+            x, y, w, h = cv2.boundingRect(contour)
+            pad_x, pad_y = int(w * self.region_margin) + 2, int(h * self.region_margin) + 2
+            regions.append((
+                max(0, int((y - pad_y) / scale)),
+                min(width, int((x + w + pad_x) / scale)),
+                min(height, int((y + h + pad_y) / scale)),
+                max(0, int((x - pad_x) / scale)),
+            ))
+        return regions
+
+    def check(self, frame):
+        """
+        Analyses a BGR frame and returns `(run_detection, regions)`.
+        See the class docstring for the meaning of the return values.
+        """
+        self.frames_total += 1
+        height, width = frame.shape[:2]
+        gray, scale = self._prepare(frame)
+        mask = self._motion_mask(gray)
+
+        # First frame, or too many skips in a row → full detection
+        if mask is None or self.consecutive_skips >= self.max_skipped_frames:
+            self._pending = gray
+            return True, None
+
+        changed = cv2.countNonZero(mask) / float(mask.size)
+
+        # Effectively unchanged → skip the detector
+        if changed < self.min_changed_area:
+            self.frames_skipped += 1
+            self.consecutive_skips += 1
+            self._pending = None
+            if self.subtractor is not None:
+                self.subtractor.apply(gray)  # A static frame is background
+            return False, []
+
+        self._pending = gray
+
+        # Large change → full frame is cheaper than many crops
+        if changed >= self.full_frame_area:
+            return True, None
+
+        self.frames_partial += 1
+        return True, self._regions(mask, scale, height, width)
+
+    def accept(self):
+        """Detection ran on the last frame `check()` let through: it becomes the new reference."""
+        if self._pending is None:
+            return
+        if self.subtractor is not None:
+            self.subtractor.apply(self._pending)
+        else:
+            self.reference = self._pending
+        self._pending = None
+        self.consecutive_skips = 0
+
+    @property
+    def skip_ratio(self):
+        """Fraction of frames on which detection was skipped."""
+        return self.frames_skipped / self.frames_total if self.frames_total else 0.0
+
+    def stats(self):
+        """Counters suitable for logging or sending to the dashboard."""
+        return {
+            "frames_total": self.frames_total,
+            "frames_skipped": self.frames_skipped,
+            "frames_partial": self.frames_partial,
+            "skip_ratio": round(self.skip_ratio, 3),
+        }
+
+
+def get_motion_gate():
+    """Returns a new MotionGate for one live session, or None when gating is disabled."""
+    return MotionGate() if MOTION_GATE_ENABLED else None
@@ -22,21 +22,25 @@ import os  # Interacts with the operating system (not directly used here, can be
 import cv2  # OpenCV for capturing video from webcam and image processing
 import json  # To handle encoding data stored as JSON in the database
 import numpy as np  # Used to calculate distances between face encodings
-import sqlite3  # To connect to the SQLite database storing student data
 import face_recognition  # Main library for face detection and face encoding
 import base64  # (Later used) for encoding images to send over sockets
+import queue  # Non-blocking reads of worker results
+import multiprocessing  # Recognition worker processes
+import threading  # Face-login kiosk thread and per-session stop events
+import contextlib  # No app context in headless edge mode
+import time  # Login request timing
+from concurrent.futures import Future, TimeoutError as FutureTimeout  # Login results handed back to requests
 from datetime import datetime  # Get current timestamps for attendance records
 from flask_socketio import SocketIO  # Enable WebSocket communication for real-time updates
-
-# DATABASE SETUP
-DATABASE = "attendance_system.db"  # SQLite database path
-
-def connect_db():
-    """
-    Establishes a connection to the SQLite database.
-    Returns a connection object that can be used to execute queries.
-    """
-    return sqlite3.connect(DATABASE)
+from face_detectors import (get_detector, get_live_detector, create_detector,  # Pluggable face detector backends
+                            detect_in_regions, TiledDetector, FACE_DETECTOR_BACKEND)
+from motion_gate import get_motion_gate  # Skips detection on frames where nothing moved
+from camera_capture import LatestFrameGrabber, LatencyTracker  # Newest-frame camera reads + latency stats
+from frame_ring import SharedFrameRing  # Zero-copy frame handoff to worker processes
+from face_gallery import FaceGallery, load_gallery, FACE_GALLERY_PATH  # Shared memory-mapped gallery of known encodings
+from face_login import encode_uploaded_image, FACE_LOGIN_BUDGET  # Browser-uploaded login images, encoded in a worker pool
+from data_access import connect_db  # Pooled connections to the SQLite database (shared with the web app)
+from attendance_writer import submit_attendance, MARK_PRESENT, OPEN_SESSION, CLOSE_SESSION  # Group-committed attendance writes
 
 def recognize_student_face():
     """
@@ -50,6 +54,9 @@ def recognize_student_face():
     - Compares the encoding with stored encodings in the SQLite DB.
     - Returns the best matching student or None if no match is found.
 
+    In kiosk mode (FACE_LOGIN_KIOSK=1) the camera stays open and the models
+    stay loaded; the request is handed to the FaceLoginKiosk instead.
+
     Returns:
         dict with student name and enrollment if matched,
         else None.
@@ -57,6 +64,9 @@ def recognize_student_face():
 
     print("📷 DEBUG: Starting Facial Recognition...")
 
+    if FACE_LOGIN_KIOSK:
+        return get_login_kiosk().recognize()
+
     cam = cv2.VideoCapture(0)  # Open the webcam (device 0)
 
     if not cam.isOpened():
@@ -77,11 +87,24 @@ def recognize_student_face():
 
     print("✅ Camera successfully captured an image.")
 
+    return recognize_login_image(img)
+
+
+def recognize_login_image(img):
+    """
+    Identifies the student in one BGR image (the face-login part of
+    `recognize_student_face()` once a frame has been captured).
+
+    Returns:
+        dict with student name and enrollment if matched,
+        else None.
+    """
+
     # Convert image to RGB format for face_recognition
     rgb_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
 
-    # Detect face locations using HOG model (faster, works offline)
-    face_locations = face_recognition.face_locations(rgb_img, model="hog")
+    # Detect face locations with the deployment's detector backend (HOG by default)
+    face_locations = get_detector().detect(rgb_img)
 
     if len(face_locations) == 0:
         print("❌ No face detected in the frame!")
@@ -106,9 +129,11 @@ def recognize_student_face():
         students = cursor.fetchall()
 
     best_match = None
-    best_distance = 0.6  # Threshold for matching faces
+    best_distance = FACE_LOGIN_TOLERANCE  # Threshold for matching faces
 
     # Loop through each student and compare their encoding
+    detected_encoding = detected_encoding.astype(np.float32)
+
     for student_id, name, enrollment, encoding_str in students:
         try:
             stored_encodings = json.loads(encoding_str)  # Load stringified encoding
@@ -117,16 +142,16 @@ def recognize_student_face():
                 print(f"⚠️ No valid encodings for {name}. Skipping.")
                 continue
 
-            for stored_encoding in stored_encodings:
-                stored_encoding = np.array(stored_encoding, dtype=np.float64)
+            # All samples of this student at once, in float32
+            stored_encodings = np.asarray(stored_encodings, dtype=np.float32).reshape(-1, 128)
 
-                # Compute distance between stored and detected encoding
-                distance = np.linalg.norm(stored_encoding - detected_encoding)
+            # Compute distance between every stored sample and the detected encoding
+            distance = float(np.linalg.norm(stored_encodings - detected_encoding, axis=1).min())
 
-                # If it's a better match (i.e., closer), store it
-                if distance < best_distance:
-                    best_match = {"Enrollment": enrollment, "Name": name}
-                    best_distance = distance
+            # If it's a better match (i.e., closer), store it
+            if distance < best_distance:
+                best_match = {"Enrollment": enrollment, "Name": name}
+                best_distance = distance
 
         except json.JSONDecodeError:
             print(f"❌ Error decoding encodings for {name}. Skipping.")
@@ -141,6 +166,111 @@ def recognize_student_face():
     return None
 
 
+# FACE LOGIN KIOSK
+
+# Keep the login camera open and the models warm (one camera per login host)
+FACE_LOGIN_KIOSK = os.getenv("FACE_LOGIN_KIOSK", "0") == "1"
+FACE_LOGIN_TIMEOUT = float(os.getenv("FACE_LOGIN_TIMEOUT", "5"))  # Seconds a login request may wait
+FACE_LOGIN_MAX_PENDING = int(os.getenv("FACE_LOGIN_MAX_PENDING", "8"))  # Queued logins before "busy"
+
+login_kiosk = None  # Created on first use or by get_login_kiosk() at startup
+login_kiosk_lock = threading.Lock()
+
+
+class FaceLoginKiosk:
+    """
+    Face login with a camera that stays open.
+
+    Opening the camera for every login costs initialization and auto-exposure
+    settling (often more than a second), and the first login also loads dlib's
+    models. The kiosk keeps a LatestFrameGrabber running, warms up the detector
+    and encoder once, and serves logins one at a time from a queue on its own
+    thread, so concurrent requests never fight over the device.
+
+    Each request is answered with a frame captured *after* it was queued, so a
+    student is never logged in from a picture of the previous person.
+    """
+
+    def __init__(self, source=0, width=1280, height=720, max_pending=FACE_LOGIN_MAX_PENDING):
+        self.grabber = LatestFrameGrabber(source, width=width, height=height).start()
+        self.detector = create_detector(FACE_DETECTOR_BACKEND)  # Its own: only the kiosk thread uses it
+        self.requests = queue.Queue(maxsize=max_pending)
+
+        self._warm_up()
+
+        self._thread = threading.Thread(target=self._serve, name="face-login-kiosk", daemon=True)
+        self._thread.start()
+
+    def _warm_up(self):
+        """Runs the detector and encoder once and waits for the camera's first frame."""
+        start = time.perf_counter()
+        blank = np.zeros((720, 1280, 3), dtype=np.uint8)
+        self.detector.detect(blank)
+        face_recognition.face_encodings(blank, [(200, 500, 500, 200)])
+
+        frame, _, _ = self.grabber.read_latest(timeout=3.0, newer_than=0)
+        if frame is None:
+            print("⚠️ Login kiosk: camera delivered no frame during warm-up.")
+        print(f"✅ Login kiosk ready in {time.perf_counter() - start:.2f}s (detector: {self.detector.name})")
+
+    def recognize(self, timeout=FACE_LOGIN_TIMEOUT):
+        """
+        Queues a login and waits for its result.
+
+        Returns the same dict as `recognize_student_face()`, or None if no one
+        was recognized, the kiosk is busy, or `timeout` seconds passed.
+        """
+        future = Future()
+        try:
+            # The result must come from a frame newer than this one
+            self.requests.put_nowait((self.grabber.seq, future))
+        except queue.Full:
+            print("⚠️ Login kiosk busy: too many pending face logins.")
+            return None
+
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeout:
+            future.cancel()  # The kiosk thread skips it if it has not started yet
+            print("❌ Face login timed out.")
+            return None
+
+    def _serve(self):
+        """Kiosk thread: answers queued logins one at a time."""
+        while True:
+            seen_seq, future = self.requests.get()
+            if future is None:  # Shutdown sentinel
+                break
+            if not future.set_running_or_notify_cancel():
+                continue  # The request gave up while waiting
+
+            try:
+                frame, _, _ = self.grabber.read_latest(timeout=2.0, newer_than=seen_seq)
+                if frame is None:
+                    print("❌ Login kiosk: no frame from the camera.")
+                    future.set_result(None)
+                else:
+                    future.set_result(recognize_login_image(frame))
+            except Exception as e:
+                future.set_exception(e)
+
+    def close(self):
+        """Stops the kiosk thread and releases the camera."""
+        self.requests.put((None, None))
+        self._thread.join(timeout=2)
+        self.grabber.release()
+
+
+def get_login_kiosk():
+    """Returns the process-wide login kiosk, starting it (camera + models) on first use."""
+    global login_kiosk
+
+    with login_kiosk_lock:
+        if login_kiosk is None:
+            login_kiosk = FaceLoginKiosk()
+        return login_kiosk
+
+
 # WEBSOCKET SETUP
 
 # This enables Flask to communicate with clients in real-time (e.g., stream video frames).
@@ -149,23 +279,293 @@ socketio = SocketIO(cors_allowed_origins="*")
 
 # LOAD STORED FACE ENCODINGS FROM FILE
 
-# We read the pre-saved face encodings from a JSON file for use in live detection
-with open("face_recognition_model.json", "r") as f:
-    model_data = json.load(f)
+# The pre-saved face encodings are memory-mapped from the shared gallery file
+# (built from face_recognition_model.json on first use), so every worker process
+# on this host shares one copy. The gallery keeps them as float32 (or float16 /
+# int8, see FACE_GALLERY_DTYPE) together with the student each sample belongs to.
+known_gallery = load_gallery(FACE_GALLERY_PATH, "face_recognition_model.json")
+print(f"🧠 Face gallery loaded: {len(known_gallery)} samples, version {known_gallery.version} ({known_gallery.mode})")
+
+# Kept for older callers: the stored vectors and the enrollment ID per student
+known_face_encodings = known_gallery.vectors
+known_face_enrollments = known_gallery.enrollments
+
+
+def refresh_known_gallery():
+    """Re-maps the gallery if a newer version was published (e.g. after a registration)."""
+    global known_gallery, known_face_encodings, known_face_enrollments
+
+    if not known_gallery.is_stale(FACE_GALLERY_PATH):
+        return
+    known_gallery = FaceGallery.from_gallery_file(FACE_GALLERY_PATH)
+    known_face_encodings = known_gallery.vectors
+    known_face_enrollments = known_gallery.enrollments
+    print(f"🔄 Face gallery reloaded: version {known_gallery.version}, {len(known_gallery)} samples")
+
+
+GALLERY_REFRESH_INTERVAL = 10  # Seconds between checks for a newer gallery version
+last_gallery_check = 0.0
+
 
-# The encodings are stored as lists of vectors (128-d), we convert them to NumPy arrays
-known_face_encodings = np.array([np.array(enc_list) for enc_list in model_data["encodings"]]).reshape(-1, 128)
+def maybe_refresh_known_gallery():
+    """Checks for a newer gallery at most every GALLERY_REFRESH_INTERVAL seconds."""
+    global last_gallery_check
 
-# Also load the list of student enrollment IDs associated with the encodings
-known_face_enrollments = model_data["enrollments"]
+    if time.time() - last_gallery_check > GALLERY_REFRESH_INTERVAL:
+        last_gallery_check = time.time()
+        refresh_known_gallery()
+
+
+# Distance threshold for face login (camera-based and uploaded pictures)
+FACE_LOGIN_TOLERANCE = float(os.getenv("FACE_LOGIN_TOLERANCE", "0.6"))
+
+
+def recognize_uploaded_face(image_bytes, budget=FACE_LOGIN_BUDGET):
+    """
+    Face login from an image captured by the browser.
+
+    The image is decoded and encoded in the face-login worker pool (see
+    face_login.py) and the encoding is matched against the cached gallery,
+    so no camera or database scan is involved.
+
+    Returns:
+        dict with the enrollment and match distance if matched, else None.
+        Raises face_login.FaceLoginError for unusable uploads, when busy,
+        or when the time budget runs out.
+    """
+    # Newly registered students become visible without a restart
+    maybe_refresh_known_gallery()
+
+    encoding = encode_uploaded_image(image_bytes, budget)
+    if encoding is None:
+        print("❌ No face detected in the uploaded image!")
+        return None
+
+    enrollment, distance = known_gallery.match(encoding, tolerance=FACE_LOGIN_TOLERANCE)
+    if enrollment is None:
+        print(f"❌ No match found! (closest distance {distance:.3f})")
+        return None
+
+    print(f"✅ Recognized uploaded face: {enrollment} (distance {distance:.3f})")
+    return {"Enrollment": enrollment, "Distance": distance}
 
 
 # GLOBAL CAMERA INSTANCE FOR LIVE VIDEO (used later)
 cam = None  # Stores OpenCV camera reference for streaming
-stop_flag = False  # Flag used to stop streaming threads
 background_task = None  # Placeholder for the async task/thread
- 
-def recognize_faces_live(app, socketio, class_id, professor_id):
+
+# Number of recognition worker processes for live sessions (0 = recognize in the session thread)
+RECOGNITION_WORKERS = int(os.getenv("RECOGNITION_WORKERS", "0"))
+
+# Distance threshold for live attendance (stricter than login: many faces, no retries);
+# tune per classroom with benchmarks/recognition_sweep.py
+FACE_LIVE_TOLERANCE = float(os.getenv("FACE_LIVE_TOLERANCE", "0.4"))
+
+
+def match_face_encodings(face_encodings, tolerance=None):
+    """
+    Matches detected face encodings against the loaded gallery.
+
+    Returns:
+        list of enrollments, one per face that matched a known student.
+    """
+    tolerance = FACE_LIVE_TOLERANCE if tolerance is None else tolerance
+    recognized_students = []  # 📋 List to store enrollments of recognized students
+
+    # Loop through each detected face and find the closest known sample
+    for face_encoding in face_encodings:
+        enrollment, _ = known_gallery.match(face_encoding, tolerance=tolerance)
+        if enrollment is not None:
+            recognized_students.append(enrollment)
+
+    return recognized_students
+
+
+def recognize_frame(detector, rgb_frame, regions=None):
+    """
+    Detects, encodes and matches all faces in one RGB frame.
+
+    If `regions` is given (changed areas reported by the motion gate), detection
+    only runs inside those regions. The tiled detector already skips unchanged
+    tiles on its own, so it always gets the full frame.
+
+    Returns:
+        list of recognized enrollments.
+    """
+    if regions and not isinstance(detector, TiledDetector):
+        face_locations = detect_in_regions(detector, rgb_frame, regions)
+    else:
+        face_locations = detector.detect(rgb_frame)
+
+    # Get encodings for all detected faces
+    face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+
+    # Registrations and synced gallery deltas take effect during a running session
+    maybe_refresh_known_gallery()
+    return match_face_encodings(face_encodings)
+
+
+def _recognition_worker(ring_name, slots, frame_shape, tasks, results):
+    """
+    Worker process loop: recognizes frames handed over through the shared ring.
+
+    Each task is `(slot, seq, captured_at, regions)`. The frame is read through a
+    zero-copy view of the ring; if the capture side has already overwritten the
+    slot the task is dropped. Results are `(seq, captured_at, enrollments, seconds)`,
+    where `seconds` is how long detection and encoding took.
+    """
+    ring = SharedFrameRing.attach(ring_name, slots, frame_shape)
+    detector = get_live_detector()
+
+    while True:
+        task = tasks.get()
+        if task is None:  # Shutdown sentinel
+            break
+
+        slot, seq, captured_at, regions = task
+        if not ring.is_current(slot, seq):
+            continue  # Frame was overwritten before we got to it
+
+        # The RGB conversion is the worker's private copy of the frame
+        rgb_frame = cv2.cvtColor(ring.view(slot), cv2.COLOR_BGR2RGB)
+        if not ring.is_current(slot, seq):
+            continue  # Overwritten while we were reading it
+
+        start = time.perf_counter()
+        enrollments = recognize_frame(detector, rgb_frame, regions)
+        results.put((seq, captured_at, enrollments, time.perf_counter() - start))
+
+    if hasattr(detector, "close"):
+        detector.close()
+    ring.close()
+
+
+class RecognitionWorkerPool:
+    """
+    Spreads live recognition across worker processes.
+
+    Frames are written into a SharedFrameRing and workers only receive the slot
+    index and sequence number, so a 1280x720 frame is copied once (into the
+    ring) instead of being pickled through a queue. The task queue is bounded:
+    when every worker is busy new frames are dropped, which is the right
+    behaviour for a live camera.
+
+    The ring's slots have the shape of the session's first frame. A camera
+    that later changes resolution (a network camera renegotiating, a webcam
+    reconnecting) has its frames scaled to that shape, motion regions included.
+    """
+
+    def __init__(self, workers, frame_shape):
+        ctx = multiprocessing.get_context("spawn")  # Safe alongside the grabber / server threads
+
+        # Frames in flight: queued tasks + one per worker, plus headroom
+        slots = workers * 3 + 2
+        self.frame_shape = tuple(frame_shape)
+        self.ring = SharedFrameRing.create(slots, frame_shape)
+        self.tasks = ctx.Queue(maxsize=workers * 2)
+        self.results = ctx.Queue()
+        self.processes = [
+            ctx.Process(
+                target=_recognition_worker,
+                args=(self.ring.name, slots, frame_shape, self.tasks, self.results),
+                daemon=True,
+            )
+            for _ in range(workers)
+        ]
+        for process in self.processes:
+            process.start()
+
+        self.frames_submitted = 0
+        self.frames_dropped = 0
+        self.frames_resized = 0
+        self._last_foreign_shape = None
+        self.detection_seconds = []  # Per-frame recognition cost since the last take_detection_seconds()
+        print(f"🧵 Started {workers} recognition workers ({slots} shared frame slots)")
+
+    def submit(self, frame, captured_at, regions=None):
+        """Queues a frame for recognition. Returns False if all workers are busy."""
+        if self.tasks.full():
+            self.frames_dropped += 1
+            return False
+
+        if frame.shape != self.frame_shape:
+            frame, regions = self._fit_to_ring(frame, regions)
+
+        slot, seq = self.ring.write(frame)
+        try:
+            self.tasks.put_nowait((slot, seq, captured_at, regions))
+        except queue.Full:
+            self.frames_dropped += 1
+            return False
+
+        self.frames_submitted += 1
+        return True
+
+    def _fit_to_ring(self, frame, regions):
+        """Scales a frame of another resolution (and its motion regions) to the ring's slot shape."""
+        if frame.shape != self._last_foreign_shape:
+            self._last_foreign_shape = frame.shape
+            print(f"⚠️ Camera resolution changed to {frame.shape[1]}x{frame.shape[0]}; "
+                  f"scaling frames to {self.frame_shape[1]}x{self.frame_shape[0]} for the workers")
+        height, width = self.frame_shape[:2]
+        scale_y, scale_x = height / frame.shape[0], width / frame.shape[1]
+        frame = cv2.resize(frame, (width, height), interpolation=cv2.INTER_AREA)
+        if regions:
+            regions = [
+                (int(top * scale_y), int(right * scale_x), int(bottom * scale_y), int(left * scale_x))
+                for top, right, bottom, left in regions
+            ]
+        self.frames_resized += 1
+        return frame, regions
+
+    def collect(self):
+        """Returns `(captured_at, enrollments)` for every frame finished since the last call."""
+        finished = []
+        while True:
+            try:
+                _, captured_at, enrollments, seconds = self.results.get_nowait()
+            except queue.Empty:
+                break
+            finished.append((captured_at, enrollments))
+            self.detection_seconds.append(seconds)
+        return finished
+
+    def take_detection_seconds(self):
+        """Returns (and forgets) how long each frame collected so far took to recognize."""
+        seconds, self.detection_seconds = self.detection_seconds, []
+        return seconds
+
+    def close(self):
+        """Stops the workers and frees the shared memory."""
+        for _ in self.processes:
+            self.tasks.put(None)
+        for process in self.processes:
+            process.join(timeout=5)
+            if process.is_alive():
+                process.terminate()
+        self.ring.close()
+
+    def stats(self):
+        return {"frames_submitted": self.frames_submitted, "frames_dropped": self.frames_dropped,
+                "frames_resized": self.frames_resized}
+
+
+def _latency_on_commit(tracker, captured):
+    """Future callback (runs on the writer thread): records capture → commit for each captured_at."""
+    def record(future):
+        if future.exception() is None:
+            for captured_at in captured:
+                tracker.record(captured_at)
+    return record
+
+
+def live_room(class_id):
+    """SocketIO room of a class's dashboards: live frames of a class are only sent there."""
+    return f"class-{class_id}"
+
+
+def recognize_faces_live(app, socketio, class_id, professor_id, camera=None, on_recognized=None, ticket=None,
+                         stop_event=None):
     """
     Real-Time Face Recognition for Classroom Attendance
 
@@ -183,110 +583,231 @@ def recognize_faces_live(app, socketio, class_id, professor_id):
     - socketio: Flask-SocketIO instance for real-time communication.
     - class_id: ID of the current class session (used to tag attendance).
     - professor_id: ID of the professor (used for record tracking).
+    - camera: optional LatestFrameGrabber opened by the caller, or any source
+      with the same read_latest()/isOpened()/release() methods (e.g. a
+      NetworkFrameSource fed over HTTP). If omitted, a grabber on device 0
+      is opened here.
+    - on_recognized: optional callback receiving `[(captured_at, enrollments), ...]`
+      for every frame with recognized students. When given, it replaces the
+      database write (used by the headless edge runner, which sends results
+      to the central server). `app` and `socketio` may then be None.
+    - ticket: optional SessionTicket from the session scheduler
+      (session_scheduler.py). Detection and dashboard previews are paced to
+      the rates the scheduler allows, measured detection times are reported
+      back to it, and the ticket is released when the session ends.
+    - stop_event: optional threading.Event that ends this session when set.
+      Defaults to the ticket's stop event (`ticket.stop()`), so stopping one
+      session never stops the others.
+
+    Frames are read through a LatestFrameGrabber, so a slow recognition pass
+    always continues with the newest frame instead of a buffered stale one.
+    Capture-to-processing and capture-to-attendance latencies are tracked and
+    sent to the dashboard with each frame.
+
+    With RECOGNITION_WORKERS > 0, recognition runs in a RecognitionWorkerPool
+    and frames are handed over through shared memory; this thread only
+    captures, gates, previews and writes attendance.
 
     The function runs until either:
     - The 'q' key is pressed
-    - A global stop flag is triggered (`stop_flag = True`)
+    - The session's stop event is set, or its camera / frame source is released
+
+    Several sessions can run at once: the stop event and the set of students
+    recognized so far belong to the session, and its dashboard frames go to
+    the class's SocketIO room (`live_room(class_id)`) only.
 
     Requirements:
     - The global `known_face_encodings` and `known_face_enrollments` must be loaded before calling this.
-    - The global `cam` and `SESSION_RECOGNIZED_STUDENTS` are used and managed here.
+    - The global `cam` (the local webcam) is used and managed here.
 
     Returns:
     - None. It sends data via WebSocket and updates the database.
     """
 
-    # Make variables global so we can share them between threads
-    global cam, stop_flag, SESSION_RECOGNIZED_STUDENTS
+    # Only the local webcam is shared between threads
+    global cam
 
-    # Reset the stop flag to make sure the loop runs
-    stop_flag = False
+    # This session's own state: how it is stopped, and who was recognized so far
+    if stop_event is None:
+        stop_event = ticket.stop_event if ticket is not None else threading.Event()
+    session_recognized = set()
+    session_id = ticket.ticket_id if ticket is not None else None
 
-    # Activate Flask app context to interact with DB and emit events
-    with app.app_context():
+    # Pick up students registered since the gallery was mapped
+    refresh_known_gallery()
 
-        # 📸 Open the webcam if it's not already active
-        if cam is None:
-            cam = cv2.VideoCapture(0)
+    # Activate Flask app context to interact with DB and emit events (headless edge mode has none)
+    with app.app_context() if app is not None else contextlib.nullcontext():
 
-        if not cam.isOpened():
+        # 📸 Use the caller's camera (a local grabber or a network frame source), or open
+        # the webcam if it's not already active. Only the webcam is kept in the global `cam`,
+        # so several sessions with their own sources can run side by side.
+        if camera is None:
+            if cam is None:
+                cam = LatestFrameGrabber(0).start()
+            camera = cam
+
+        if not camera.isOpened():
             print("❌ Camera failed to open.")
+            if ticket is not None:
+                ticket.release()
             return
 
-        print("📸 Starting Live Attendance...")
-
-        # Infinite loop — runs until user quits or stop_flag is True
-        while cam is not None:
-            if stop_flag:  # 🚨 External flag to stop the loop
-                print("🛑 Stop flag detected, force quitting...")
-                break
+        # Load the configured detector once, not on every frame (tiled for 4K cameras).
+        # In worker mode each worker process loads its own detector instead.
+        detector = get_live_detector() if RECOGNITION_WORKERS <= 0 else None
+        worker_pool = None  # Started on the first frame, once the frame size is known
 
-            # Read a frame from the webcam
-            ret, frame = cam.read()
-            if not ret or frame is None:
-                continue  # Skip if frame wasn't captured properly
+        # Motion gate (None when disabled) — skips detection while the class is static
+        motion_gate = get_motion_gate()
 
-            # Convert frame to RGB (required by face_recognition)
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+        # Latency from frame capture → recognition start, and capture → attendance committed
+        # (edge mode: → handed to the uploader)
+        frame_age = LatencyTracker()
+        mark_latency = LatencyTracker()
+        last_write = None  # Future of the latest queued attendance write
 
-            # Detect all face locations in the frame
-            face_locations = face_recognition.face_locations(rgb_frame)
+        # The class meets today: record the session (headless edge nodes report through ingest instead)
+        if on_recognized is None:
+            submit_attendance(OPEN_SESSION, (class_id, datetime.now().strftime("%Y-%m-%d"),
+                                             datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
 
-            # Get encodings for all detected faces
-            face_encodings = face_recognition.face_encodings(rgb_frame, face_locations)
+        print("📸 Starting Live Attendance...")
 
-            recognized_students = []  # 📋 List to store enrollments of recognized students
+        # Infinite loop — runs until user quits, the camera is released or the session is stopped
+        while True:
+            if stop_event.is_set():  # 🚨 This session was stopped
+                print(f"🛑 Stop requested for the session of class {class_id}, quitting...")
+                break
 
-            # Loop through each detected face
-            for face_encoding, face_location in zip(face_encodings, face_locations):
-                # Compare with known encodings (returns list of True/False)
-                matches = face_recognition.compare_faces(
-                    known_face_encodings, face_encoding, tolerance=0.4
-                )
+            # Grab the newest frame (older buffered frames are dropped by the grabber)
+            frame, captured_at, _ = camera.read_latest()
+            if frame is None:
+                if not camera.isOpened():
+                    break  # Camera was released by stop_attendance()
+                continue  # Skip if frame wasn't captured properly
 
-                # Measure how close the face is to each known face
-                face_distances = face_recognition.face_distance(known_face_encodings, face_encoding)
+            frame_age.record(captured_at)
 
-                # Find the closest matching known face
-                best_match_index = np.argmin(face_distances) if face_distances.size > 0 else None
+            # Ask the motion gate whether anything changed since the last analysed frame
+            # (read-only: the gate only moves on once detection really ran, see accept() below)
+            run_detection, motion_regions = motion_gate.check(frame) if motion_gate else (True, None)
 
-                # If we have a good match...
-                if best_match_index is not None and matches[best_match_index]:
-                    # Each student may have 20 encodings → figure out which student it is
-                    student_index = best_match_index // 20
+            # Under load the scheduler lowers this session's detection rate
+            if run_detection and ticket is not None and not ticket.should_detect():
+                run_detection = False
 
-                    # Get the student's enrollment number
-                    if student_index < len(known_face_enrollments):
-                        enrollment = known_face_enrollments[student_index]
-                        recognized_students.append(enrollment)
+            pipeline_stats = {
+                "motion": motion_gate.stats() if motion_gate else None,
+                "frame_age": frame_age.summary(),
+                "mark_latency": mark_latency.summary(),
+            }
+            if ticket is not None:
+                pipeline_stats["scheduler"] = {"detect_fps": round(ticket.detect_fps, 2),
+                                               "preview_fps": round(ticket.preview_fps, 2)}
+
+            if motion_gate and motion_gate.frames_total % 100 == 0:
+                print(f"🎞️ Pipeline stats: {pipeline_stats}")
+
+            if not run_detection:
+                # Nothing moved → skip detection and encoding, only pick up finished worker results
+                results = worker_pool.collect() if worker_pool is not None else []
+            elif RECOGNITION_WORKERS > 0:
+                # Hand the frame to the worker processes and pick up finished results
+                if worker_pool is None:
+                    worker_pool = RecognitionWorkerPool(RECOGNITION_WORKERS, frame.shape)
+                if worker_pool.submit(frame, captured_at, motion_regions) and motion_gate:
+                    motion_gate.accept()  # Dropped frames leave the change pending for the next frame
+                results = worker_pool.collect()
+            else:
+                # Convert frame to RGB (required by face_recognition) and recognize in this thread
+                detect_start = time.perf_counter()
+                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
+                results = [(captured_at, recognize_frame(detector, rgb_frame, motion_regions))]
+                if motion_gate:
+                    motion_gate.accept()
+                if ticket is not None:
+                    ticket.record_detection(time.perf_counter() - detect_start)
+
+            # Report the workers' measured detection cost to the scheduler
+            if ticket is not None and worker_pool is not None:
+                for seconds in worker_pool.take_detection_seconds():
+                    ticket.record_detection(seconds)
+
+            recognized_students = [enrollment for _, enrollments in results for enrollment in enrollments]
 
             # Send the current video frame and recognized students to the frontend
-            send_frame_to_frontend(app, socketio, frame, recognized_students, class_id)
+            if socketio is not None and (ticket is None or ticket.should_preview()):
+                send_frame_to_frontend(app, socketio, frame, recognized_students, class_id, pipeline_stats,
+                                       session_recognized=session_recognized, session_id=session_id)
 
             # Skip DB updates if nobody is recognized
             if not recognized_students:
                 print("⚠️ [DEBUG] No students recognized in this frame. Skipping attendance update.")
                 continue
 
-            # Save attendance in the database
-            print(f"📝 Saving attendance for class {class_id}")
-            mark_attendance_in_db(class_id, professor_id, recognized_students)
-
-            # Compute recognition accuracy for debugging
-            accuracy = compute_recognition_accuracy(class_id, recognized_students)
-            print(f"✅ Facial Recognition Accuracy for class {class_id}: {accuracy:.2f}%")
-
-            # Exit if user presses 'q' or if stop_flag was externally set
-            if cv2.waitKey(1) & 0xFF == ord('q') or stop_flag:
-                print("🛑 Stop flag triggered, breaking loop...")
+            captured = [result_captured_at for result_captured_at, enrollments in results if enrollments]
+            if on_recognized is not None:
+                # Edge mode: hand the results to the caller (queued for upload to the server)
+                on_recognized(results)
+                for result_captured_at in captured:
+                    mark_latency.record(result_captured_at)
+            else:
+                # Save attendance in the database
+                print(f"📝 Saving attendance for class {class_id}")
+                write = mark_attendance_in_db(class_id, professor_id, recognized_students,
+                                              session_recognized=session_recognized)
+                if write is not None:
+                    last_write = write
+                    # The write is only queued here: the latency ends when its group commits
+                    write.add_done_callback(_latency_on_commit(mark_latency, captured))
+
+            if on_recognized is None:
+                # Compute recognition accuracy for debugging
+                accuracy = compute_recognition_accuracy(class_id, recognized_students)
+                print(f"✅ Facial Recognition Accuracy for class {class_id}: {accuracy:.2f}%")
+
+            # Exit if user presses 'q' or if the session was stopped
+            if cv2.waitKey(1) & 0xFF == ord('q') or stop_event.is_set():
+                print("🛑 Stop requested, breaking loop...")
                 break    
 
         # Clean up resources after exiting the loop
         print("🛑 Stopping Live Attendance...")
-        if cam:
-            cam.release()  # 📷 Turn off the webcam
+        camera.release()  # 📷 Turn off the webcam (or close the network frame source)
+        if cam is camera:
             cam = None
-            print("✅ Camera released.")
+        print("✅ Camera released.")
+
+        if motion_gate:
+            print(f"🎞️ Motion gate summary: {motion_gate.stats()}")
+        print(f"⏱️ Capture → attendance committed latency: {mark_latency.summary()}")
+
+        # Stop recognition workers / tile workers
+        if worker_pool is not None:
+            print(f"🧵 Worker pool summary: {worker_pool.stats()}")
+            worker_pool.close()
+
+        if hasattr(detector, "close"):
+            detector.close()
+
+        # Hand this session's capacity to the next queued session
+        if ticket is not None:
+            print(f"🚦 Scheduler: {ticket.detections} detections, {ticket.detections_skipped} paced out")
+            ticket.release()
+
+        # Close the class session; it only counts as stopped once everything it marked is committed
+        if on_recognized is None:
+            try:
+                mark_attendance_in_db(class_id, professor_id, [], session_end=True,
+                                      session_recognized=session_recognized)
+            except Exception as e:
+                print(f"❌ Closing the class session failed: {e}")
+        elif last_write is not None:
+            try:
+                last_write.result(timeout=30)
+            except Exception as e:
+                print(f"❌ Last attendance write of the session failed: {e}")
 
         print("✅ Background task fully stopped.")
 
@@ -302,7 +823,7 @@ def compute_recognition_accuracy(class_id, recognized_students):
     It helps assess how many present students were correctly identified by the system.
     """
     
-    with sqlite3.connect("attendance_system.db") as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
         
         # Get the ground-truth set of students enrolled in the class
@@ -320,7 +841,8 @@ def compute_recognition_accuracy(class_id, recognized_students):
         return accuracy
 
 
-def send_frame_to_frontend(app, socketio, frame, recognized_students, class_id):
+def send_frame_to_frontend(app, socketio, frame, recognized_students, class_id, stats=None,
+                           session_recognized=None, session_id=None):
     """
     Send Encoded Video Frame & Attendance Data to Frontend (Dashboard)
 
@@ -328,38 +850,43 @@ def send_frame_to_frontend(app, socketio, frame, recognized_students, class_id):
     - The list of students enrolled
     - The ones recognized in this session
     - Their total absences
+    - Optional pipeline counters (e.g. the motion gate's skipped-frame ratio)
 
     This allows the professor's dashboard to display real-time visual and attendance updates.
-    """
 
-    global SESSION_RECOGNIZED_STUDENTS
+    `session_recognized` is the calling session's set of students recognized so far
+    (updated here); the frame is sent to the class's room only, tagged with the
+    class and session, so dashboards of other classes never receive it.
+    """
 
-    with sqlite3.connect(DATABASE) as conn:
+    with connect_db() as conn:
         cursor = conn.cursor()
 
-        # Fetch all students enrolled in this class
-        cursor.execute("SELECT enrollment, student_name FROM student_classes WHERE class_id = ?", (class_id,))
-        enrolled_students = {row[0]: row[1] for row in cursor.fetchall()}  # {enrollment: name}
+        # Fetch all students enrolled in this class with their absence count (over all classes)
+        cursor.execute("""
+            SELECT s.enrollment, s.name,
+                   (SELECT COALESCE(SUM(absent), 0) FROM attendance_summary WHERE student_id = e.student_id)
+            FROM class_enrollments e
+            JOIN students s ON s.id = e.student_id
+            WHERE e.class_id = ?
+        """, (class_id,))
+        rows = cursor.fetchall()
+        enrolled_students = {row[0]: row[1] for row in rows}  # {enrollment: name}
+        absences = {row[0]: row[2] for row in rows}  # {enrollment: absences}
 
         # Get the name of the class
         cursor.execute("SELECT class_name FROM classrooms WHERE id = ?", (class_id,))
         class_name = cursor.fetchone()
         class_name = class_name[0] if class_name else "Unknown Class"
 
-        # Get count of absences for each student
-        absences = {}
-        for enrollment in enrolled_students.keys():
-            cursor.execute("""
-                SELECT COUNT(*) FROM attendance WHERE enrollment = ? AND status = 'Absent'
-            """, (enrollment,))
-            absences[enrollment] = cursor.fetchone()[0]
-
     # Convert webcam frame to base64 so it can be sent via WebSocket
     _, buffer = cv2.imencode('.jpg', frame)
     encoded_frame = base64.b64encode(buffer).decode('utf-8')
 
     # Track students recognized during the session
-    SESSION_RECOGNIZED_STUDENTS.update(recognized_students)
+    if session_recognized is None:
+        session_recognized = set()
+    session_recognized.update(recognized_students)
 
     # Build attendance data for each student
     students_list = []
@@ -367,130 +894,81 @@ def send_frame_to_frontend(app, socketio, frame, recognized_students, class_id):
         students_list.append({
             "enrollment": enrollment,
             "name": student_name,
-            "status": "Present" if enrollment in SESSION_RECOGNIZED_STUDENTS else "Absent",
-            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S") if enrollment in SESSION_RECOGNIZED_STUDENTS else "N/A",
+            "status": "Present" if enrollment in session_recognized else "Absent",
+            "time": datetime.now().strftime("%Y-%m-%d %H:%M:%S") if enrollment in session_recognized else "N/A",
             "class": class_name,
             "class_id": class_id,
             "absences": absences.get(enrollment, 0)
         })
 
     # Debug Output
-    print(f" [DEBUG] Updated SESSION_RECOGNIZED_STUDENTS: {SESSION_RECOGNIZED_STUDENTS}")
+    print(f" [DEBUG] Recognized in the session of class {class_id}: {session_recognized}")
     print(f" [DEBUG] Sending to UI → {students_list}")
 
-    # Emit event to frontend dashboard
+    # Emit event to the dashboards of this class only
     socketio.emit("video_frame", {
         "image": encoded_frame,
-        "students": students_list
-    })
+        "students": students_list,
+        "stats": stats,
+        "class_id": class_id,
+        "session_id": session_id
+    }, to=live_room(class_id))
 
 
-SESSION_RECOGNIZED_STUDENTS = set()
-def mark_attendance_in_db(class_id, professor_id, recognized_students, session_end=False):
+def mark_attendance_in_db(class_id, professor_id, recognized_students, session_end=False, session_recognized=None):
     """
     Mark Attendance in Database (Live + End-of-Session)
 
     This function does 2 main things:
     1. Marks recognized students as 'Present' during live attendance
-    2. If `session_end=True`, it marks all other enrolled students as 'Absent'
+    2. If `session_end=True`, it closes today's class session (class_sessions)
+
+    Absent students are not written: an enrolled student without a Present row
+    for a session is absent (see the attendance_summary and session_attendance
+    views in migrations.py). Writes go through the attendance writer
+    (attendance_writer.py), which commits them together with other classrooms' writes.
 
     Parameters:
     - class_id: Class session ID
     - professor_id: ID of professor taking attendance
     - recognized_students: List of enrollments recognized in the current frame
     - session_end (bool): If True, it closes the session and finalizes attendance
-    """
-
-    global SESSION_RECOGNIZED_STUDENTS  
+    - session_recognized: the live session's set of students recognized so far (updated here)
 
-    with sqlite3.connect("attendance_system.db") as conn:
-        cursor = conn.cursor()
-        now_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        today_date = datetime.now().strftime("%Y-%m-%d")
+    Returns:
+    - Future of the last queued write (None if nothing was written); `.result()`
+      waits until this call's writes are committed
+    """
 
-        # Get all students enrolled in the class
-        cursor.execute("SELECT enrollment FROM student_classes WHERE class_id = ?", (class_id,))
-        enrolled_students = {row[0] for row in cursor.fetchall()}
-        print(f" [DEBUG] Enrolled students in class {class_id}: {enrolled_students}")
+    now_timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    today_date = datetime.now().strftime("%Y-%m-%d")
 
-        # Check attendance already recorded today
-        cursor.execute("""
-            SELECT enrollment, status, time_recognized FROM attendance 
-            WHERE class_id = ? AND date = ?
-        """, (class_id, today_date))
-        existing_attendance = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
-        print(f" [DEBUG] Existing attendance for class {class_id}: {existing_attendance}")
-
-        # Update session tracker
-        SESSION_RECOGNIZED_STUDENTS.update(recognized_students)
-
-        # Step 1: Mark recognized students as Present
-        for student in recognized_students:
-            if student in enrolled_students:
-                prev_status, prev_time = existing_attendance.get(student, ("Absent", None))
-
-                if prev_status == "Present":
-                    # Update timestamp if already marked Present
-                    print(f"✅ [INFO] Student {student} is already Present. Updating timestamp.")
-                    cursor.execute("""
-                        UPDATE attendance 
-                        SET time_recognized = ?
-                        WHERE class_id = ? AND enrollment = ? AND date = ?;
-                    """, (now_timestamp, class_id, student, today_date))
-                else:
-                    # 🆕 Mark student as Present
-                    print(f"✅ [UPDATE] Marking student {student} as Present in DB.")
-                    cursor.execute("""
-                        INSERT INTO attendance (class_id, enrollment, date, status, time_recognized, professor_id, absences)
-                        VALUES (?, ?, ?, 'Present', ?, ?, 0)
-                        ON CONFLICT(class_id, enrollment, date) 
-                        DO UPDATE SET 
-                            status = 'Present',
-                            time_recognized = excluded.time_recognized;
-                    """, (class_id, student, today_date, now_timestamp, professor_id))
-
-                # Update memory
-                existing_attendance[student] = ("Present", now_timestamp)
-
-        # Step 2: If session ended, mark unrecognized students as Absent
-        if session_end:
-            print(f"⚠️ [DEBUG] SESSION_END TRIGGERED - Checking for Absent students!")
-
-            cursor.execute("""
-                SELECT enrollment, status FROM attendance 
-                WHERE class_id = ? AND date = ?
-            """, (class_id, today_date))
-            final_existing_attendance = {row[0]: row[1] for row in cursor.fetchall()}
-
-            absent_students = {
-                student for student in enrolled_students 
-                if student not in SESSION_RECOGNIZED_STUDENTS and final_existing_attendance.get(student) != "Present"
-            }
+    # Update session tracker
+    if session_recognized is None:
+        session_recognized = set()
+    session_recognized.update(recognized_students)
 
-            print(f"🚨 [DEBUG] Students that will be marked Absent: {absent_students}")
+    # Writes go to the attendance writer (group commit); events are applied in submission order
+    future = None
 
-            for student in absent_students:
-                previous_status = final_existing_attendance.get(student, "Never marked before")
+    # Step 1: Mark recognized students as Present (enrolled ones only), one batch per frame.
+    # Already Present → only the timestamp moves forward.
+    present_rows = [(class_id, student, today_date, now_timestamp, professor_id)
+                    for student in set(recognized_students)]
+    if present_rows:
+        future = submit_attendance(MARK_PRESENT, present_rows, many=True)
+        print(f"✅ [UPDATE] Queued {len(present_rows)} recognized students as Present in class {class_id}.")
 
-                if previous_status == "Present":
-                    print(f"🚨 [ERROR] Student {student} was already Present but is being changed to Absent! THIS SHOULD NOT HAPPEN!")
+    # Step 2: If session ended, close today's session — from now on it counts towards
+    # every enrolled student's sessions, and those not Present are absent
+    if session_end:
+        print(f"⚠️ [DEBUG] SESSION_END TRIGGERED - Closing the class session!")
 
-                # Insert Absent record or increment absences
-                print(f"❌ [UPDATE] Marking student {student} as Absent. Previous status: {previous_status}.")
-                cursor.execute("""
-                    INSERT INTO attendance (class_id, enrollment, date, status, time_recognized, professor_id, absences)
-                    VALUES (?, ?, ?, 'Absent', NULL, ?, 1)
-                    ON CONFLICT(class_id, enrollment, date) 
-                    DO UPDATE SET 
-                        absences = attendance.absences + 1;
-                """, (class_id, student, today_date, professor_id))
+        future = submit_attendance(CLOSE_SESSION, (now_timestamp, class_id, today_date), flush=True)
 
-        # Final debug snapshot of attendance
-        cursor.execute("""
-            SELECT enrollment, status, time_recognized FROM attendance 
-            WHERE class_id = ? AND date = ?
-        """, (class_id, today_date))
-        updated_attendance = {row[0]: (row[1], row[2]) for row in cursor.fetchall()}
-        print(f" [DEBUG] Final attendance for class {class_id}: {updated_attendance}")
+        # Finalizing is rare and the caller expects the result: wait for the commit
+        future.result()
+        print(f"❌ [UPDATE] Closed the session of class {class_id}; "
+              f"{len(session_recognized)} students were recognized.")
 
-        conn.commit()
+    return future
@@ -0,0 +1,339 @@
+"""
+session_scheduler.py
+CPU-Aware Admission Control for Live Attendance Sessions
+
+Purpose:
+Every live session runs face detection on this host. Nothing used to stop
+professors from starting more sessions than the CPU can process, and when
+too many ran, every session's frame rate collapsed together. The
+SessionScheduler sits in front of `start_attendance()` and the network
+camera sessions: it knows the host's recognition capacity and decides,
+per request, whether a session can run.
+
+🔧 Key Features:
+- Capacity in detections per second = CPU cores ÷ measured seconds per
+  detection (an average over what running sessions report; a configured
+  estimate until the first measurements come in).
+- Admission: a session is admitted only if every running session can still
+  get at least SCHEDULER_MIN_FPS detections per second (one session is
+  always allowed, even on a host too slow for that rate).
+- Isolation: sessions run side by side only when they share nothing the
+  recognition loop keeps per class or per device. Each session holds
+  exclusive keys — always its class (one class session row, one dashboard
+  room per class), plus whatever the caller adds (the server's webcam) —
+  and waits while a running session holds one of them.
+- Degradation: admitted sessions share the capacity. When the fair share
+  drops below SCHEDULER_TARGET_FPS, each session's detection frequency and
+  its dashboard preview rate are lowered together.
+- Over capacity (or while a conflicting session runs), new sessions are
+  queued (up to SCHEDULER_MAX_QUEUED) and start automatically when a
+  running session ends, or are rejected with a clear status.
+
+Configuration (environment variables):
+- SCHEDULER_MIN_FPS → guaranteed detections/s per session (default 2)
+- SCHEDULER_TARGET_FPS → detections/s a session gets when there is room (default 8)
+- SCHEDULER_PREVIEW_FPS → dashboard preview rate when not overloaded (default 15)
+- SCHEDULER_MAX_QUEUED → sessions allowed to wait for capacity (default 4, 0 = reject)
+- SCHEDULER_DETECT_SECONDS → initial estimate of CPU seconds per detection (default 0.25)
+- SCHEDULER_CORES → CPU cores available for recognition (default: all)
+"""
+
+# IMPORTS
+import os  # Core count and configuration
+import time  # Pacing and timestamps
+import uuid  # Ticket ids
+import threading  # Scheduler lock
+
+
+# SCHEDULER CONFIGURATION
+SCHEDULER_MIN_FPS = float(os.getenv("SCHEDULER_MIN_FPS", "2"))
+SCHEDULER_TARGET_FPS = float(os.getenv("SCHEDULER_TARGET_FPS", "8"))
+SCHEDULER_PREVIEW_FPS = float(os.getenv("SCHEDULER_PREVIEW_FPS", "15"))
+SCHEDULER_MAX_QUEUED = int(os.getenv("SCHEDULER_MAX_QUEUED", "4"))
+SCHEDULER_DETECT_SECONDS = float(os.getenv("SCHEDULER_DETECT_SECONDS", "0.25"))
+SCHEDULER_CORES = int(os.getenv("SCHEDULER_CORES", str(os.cpu_count() or 1)))
+
+MIN_PREVIEW_FPS = 2.0  # Dashboard preview never drops below this
+
+
+class SessionTicket:
+    """
+    One live session's admission. States: "queued", "running", "rejected", "finished".
+
+    The recognition loop asks the ticket before each detection and preview
+    (`should_detect()`, `should_preview()`), reports how long detections
+    took (`record_detection()`), and calls `release()` when it ends.
+    `stop()` asks this session's loop (and no other) to end.
+    """
+
+    def __init__(self, scheduler, class_id, professor_id, start, exclusive=()):
+        self.ticket_id = uuid.uuid4().hex
+        self.scheduler = scheduler
+        self.class_id = class_id
+        self.professor_id = professor_id
+        self.start = start  # Called with the ticket once admitted
+        # Resources no other running session may hold at the same time
+        self.exclusive = frozenset(exclusive) | {("class", str(class_id))}
+        self.state = "queued"
+        self.reason = None
+        self.requested_at = time.time()
+        self.stop_event = threading.Event()  # Set by stop(); checked by the recognition loop
+
+        # Current allowances (set by the scheduler)
+        self.detect_fps = SCHEDULER_TARGET_FPS
+        self.preview_fps = SCHEDULER_PREVIEW_FPS
+
+        self._next_detect = 0.0
+        self._next_preview = 0.0
+        self.detections = 0
+        self.detections_skipped = 0
+
+    def should_detect(self, now=None):
+        """True if this frame may run detection under the current detection rate."""
+        now = time.monotonic() if now is None else now
+        if now < self._next_detect:
+            self.detections_skipped += 1
+            return False
+        self._next_detect = max(now, self._next_detect) + 1.0 / self.detect_fps
+        self.detections += 1
+        return True
+
+    def should_preview(self, now=None):
+        """True if this frame should be sent to the dashboard under the current preview rate."""
+        now = time.monotonic() if now is None else now
+        if now < self._next_preview:
+            return False
+        self._next_preview = max(now, self._next_preview) + 1.0 / self.preview_fps
+        return True
+
+    def record_detection(self, seconds):
+        """Reports the CPU time one detection + encoding pass took."""
+        self.scheduler.record_detection(seconds)
+
+    def stop(self):
+        """Asks this session's recognition loop to end (a queued session just leaves the queue)."""
+        self.stop_event.set()
+        if self.state == "queued":
+            self.release()
+
+    def release(self):
+        """Ends the session and hands its capacity to the next queued session."""
+        self.scheduler.release(self)
+
+    def status(self):
+        status = {
+            "ticket_id": self.ticket_id,
+            "class_id": self.class_id,
+            "status": self.state,
+            "detect_fps": round(self.detect_fps, 2),
+            "preview_fps": round(self.preview_fps, 2),
+        }
+        if self.state == "queued":
+            status["position"] = self.scheduler.queue_position(self)
+        if self.reason:
+            status["reason"] = self.reason
+        return status
+
+
+class SessionScheduler:
+    """Admits, queues or rejects live sessions based on the host's detection capacity."""
+
+    def __init__(self, cores=SCHEDULER_CORES, min_fps=SCHEDULER_MIN_FPS, target_fps=SCHEDULER_TARGET_FPS,
+                 preview_fps=SCHEDULER_PREVIEW_FPS, max_queued=SCHEDULER_MAX_QUEUED,
+                 detect_seconds=SCHEDULER_DETECT_SECONDS):
+        self.cores = cores
+        self.min_fps = min_fps
+        self.target_fps = target_fps
+        self.preview_fps = preview_fps
+        self.max_queued = max_queued
+        self.detect_seconds = detect_seconds  # Moving average of reported detection cost
+        self.initial_detect_seconds = detect_seconds  # Configured estimate the average decays back to
+
+        self._lock = threading.RLock()
+        self.running = []
+        self.queued = []
+        self.tickets = {}  # ticket_id → ticket (running, queued and recently finished)
+
+    # Capacity
+
+    def capacity_fps(self):
+        """Detections per second this host can sustain."""
+        return self.cores / max(self.detect_seconds, 1e-3)
+
+    def max_sessions(self):
+        """
+        Sessions that fit while each still gets the guaranteed minimum rate.
+        Never 0: on a host too slow for even one session at that rate (cnn, 4K
+        on few cores) one session still runs, degraded, instead of all waiting.
+        """
+        return max(1, int(self.capacity_fps() // self.min_fps))
+
+    def record_detection(self, seconds):
+        """Exponential moving average of detection cost; re-balances and starts sessions that now fit."""
+        with self._lock:
+            self.detect_seconds = 0.95 * self.detect_seconds + 0.05 * seconds
+            to_launch = self._promote()
+            self._rebalance()
+        for ticket in to_launch:
+            self._launch(ticket)
+
+    def _rebalance(self):
+        """Gives every running session its share of the capacity (lock held)."""
+        if not self.running:
+            return
+        share = self.capacity_fps() / len(self.running)
+        detect_fps = max(min(self.target_fps, share), self.min_fps)
+        load = detect_fps / self.target_fps  # 1.0 = not overloaded
+        preview_fps = max(self.preview_fps * load, MIN_PREVIEW_FPS)
+        for ticket in self.running:
+            ticket.detect_fps = detect_fps
+            ticket.preview_fps = preview_fps
+
+    # Admission
+
+    def request(self, class_id, professor_id, start, exclusive=()):
+        """
+        Asks to run a live session. `start(ticket)` launches it once admitted
+        (right away, or later when capacity frees up and no running session
+        holds the class or one of the `exclusive` keys, e.g. ("camera", 0)).
+
+        Returns the ticket; its `state` is "running", "queued" or "rejected".
+        """
+        ticket = SessionTicket(self, class_id, professor_id, start, exclusive)
+        with self._lock:
+            self.tickets[ticket.ticket_id] = ticket
+
+            # Queued tickets never fit (they would have been promoted), so this one
+            # only runs right away if it fits; a full queue rejects it otherwise
+            if len(self.queued) >= self.max_queued and not self._fits(ticket):
+                ticket.state = "rejected"
+                if self._conflict(ticket):
+                    ticket.reason = (f"Class {class_id} (or its camera) is already in a live session "
+                                     f"and {len(self.queued)} sessions are waiting. Try again later.")
+                else:
+                    ticket.reason = (f"Server at capacity: {len(self.running)} live sessions running and "
+                                     f"{len(self.queued)} waiting. Try again later.")
+                print(f"⛔ Session for class {class_id} rejected: {ticket.reason}")
+                return ticket
+
+            self.queued.append(ticket)
+            to_launch = self._promote()
+            if ticket.state == "queued":
+                waiting_for = f"capacity, {self.capacity_fps():.1f} detections/s"
+                if self._conflict(ticket):
+                    waiting_for = "a running session of this class or camera"
+                print(f"⏳ Session for class {class_id} queued (position {self.queued.index(ticket) + 1}, "
+                      f"{len(self.running)} running, waiting for {waiting_for})")
+
+        for admitted in to_launch:
+            self._launch(admitted)
+        return ticket
+
+    def _conflict(self, ticket):
+        """The running session holding one of the ticket's exclusive keys, if any (lock held)."""
+        for running in self.running:
+            if running.exclusive & ticket.exclusive:
+                return running
+        return None
+
+    def _fits(self, ticket):
+        """True if the ticket could run now: spare capacity and no conflicting session (lock held)."""
+        return len(self.running) < self.max_sessions() and self._conflict(ticket) is None
+
+    def _admit(self, ticket):
+        """Marks a ticket running and re-balances (lock held)."""
+        ticket.state = "running"
+        self.running.append(ticket)
+        self._rebalance()
+        print(f"✅ Session for class {ticket.class_id} admitted: {ticket.detect_fps:.1f} detections/s, "
+              f"{len(self.running)}/{self.max_sessions()} sessions")
+
+    def _promote(self):
+        """
+        Admits queued sessions in order while capacity lasts; a session whose
+        class or camera is busy keeps its place and the ones behind it may
+        start. Returns them for launching (lock held).
+        """
+        admitted = []
+        for ticket in list(self.queued):
+            if len(self.running) >= self.max_sessions():
+                break
+            if self._conflict(ticket) is None:
+                self.queued.remove(ticket)
+                self._admit(ticket)
+                admitted.append(ticket)
+        return admitted
+
+    def _launch(self, ticket):
+        """Starts an admitted session outside the lock; frees its slot if starting fails."""
+        try:
+            ticket.start(ticket)
+        except Exception as e:
+            ticket.reason = f"Failed to start: {e}"
+            print(f"❌ Session for class {ticket.class_id} failed to start: {e}")
+            self.release(ticket)
+
+    def release(self, ticket):
+        """Removes a finished session and starts queued sessions that now fit."""
+        with self._lock:
+            if ticket in self.running:
+                self.running.remove(ticket)
+            elif ticket in self.queued:
+                self.queued.remove(ticket)
+            else:
+                return
+            ticket.state = "finished"
+
+            # Only running sessions report detection costs: when the host goes idle, move the
+            # average halfway back to the configured estimate so one slow session (or camera)
+            # does not hold the queue back for good
+            if not self.running:
+                self.detect_seconds = (self.detect_seconds + self.initial_detect_seconds) / 2
+
+            to_launch = self._promote()
+            self._rebalance()
+
+            # Forget old finished tickets
+            for ticket_id, old in list(self.tickets.items()):
+                if old.state in ("finished", "rejected") and time.time() - old.requested_at > 3600:
+                    del self.tickets[ticket_id]
+
+        for next_ticket in to_launch:
+            self._launch(next_ticket)
+
+    # Status
+
+    def queue_position(self, ticket):
+        with self._lock:
+            return self.queued.index(ticket) + 1 if ticket in self.queued else None
+
+    def get_ticket(self, ticket_id):
+        with self._lock:
+            return self.tickets.get(ticket_id)
+
+    def find_ticket(self, class_id=None, key=None):
+        """
+        The running (else the first queued) ticket of a class, if any.
+        `key` only considers tickets holding that exclusive key, e.g. ("camera", 0).
+        """
+        with self._lock:
+            for ticket in self.running + self.queued:
+                if class_id is not None and str(ticket.class_id) != str(class_id):
+                    continue
+                if key is None or key in ticket.exclusive:
+                    return ticket
+        return None
+
+    def stats(self):
+        with self._lock:
+            return {
+                "capacity_fps": round(self.capacity_fps(), 1),
+                "detect_seconds": round(self.detect_seconds, 3),
+                "max_sessions": self.max_sessions(),
+                "running": [t.status() for t in self.running],
+                "queued": [t.status() for t in self.queued],
+            }
+
+
+# Process-wide scheduler used by the attendance routes
+session_scheduler = SessionScheduler()